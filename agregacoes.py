@@ -0,0 +1,261 @@
+"""
+Agregações por escola usadas pelo dashboard
+
+Funções puras sobre o DataFrame de microdados (um aluno por linha), sem
+dependência do Streamlit, para que possam ser reaproveitadas em scripts.
+As tabelas por escola são indexadas por CO_ESCOLA, já que o nome da escola
+se repete entre municípios.
+"""
+import numpy as np
+import pandas as pd
+
+CHAVES_ESCOLA = ['CO_ESCOLA', 'NOME_ESCOLA', 'NO_MUNICIPIO_ESC', 'TP_DEPENDENCIA_ADM_ESC', 'DEPENDENCIA_NOME']
+
+TIPOS_CHAVES = {
+    'CO_ESCOLA': 'Int64',
+    'NOME_ESCOLA': 'string',
+    'NO_MUNICIPIO_ESC': 'string',
+    'TP_DEPENDENCIA_ADM_ESC': 'Int64',
+    'DEPENDENCIA_NOME': 'string',
+}
+
+COLUNAS_MEDIAS = {
+    'NU_NOTA_CN': 'Nota_CN',
+    'NU_NOTA_CH': 'Nota_CH',
+    'NU_NOTA_LC': 'Nota_LC',
+    'NU_NOTA_MT': 'Nota_MT',
+    'NU_NOTA_REDACAO': 'Nota_Redacao',
+    'SCORE_OBJETIVA': 'SCORE_OBJETIVA',
+    'SCORE_FINAL': 'SCORE_FINAL',
+}
+
+# Colunas dos microdados lidas para as agregações (as chaves, sem a dependência nomeada, e as notas)
+COLUNAS_MICRODADOS = CHAVES_ESCOLA[:4] + list(COLUNAS_MEDIAS)
+
+DEPENDENCIAS = {
+    1: 'Federal',
+    2: 'Estadual',
+    3: 'Municipal',
+    4: 'Privada'
+}
+
+# Tipos compactos dos microdados mantidos em memória (compartilhados entre as
+# sessões do dashboard): texto repetido como categoria, dependência em um byte
+# e notas em float32. O float32 não representa a maioria dos centésimos
+# exatamente (512.37 vira 512.3699951...), mas até 1000 pontos o erro fica
+# abaixo de 0,0001, muito menos que meio centésimo: `somas_por_escola` volta
+# ao centésimo com np.rint antes de somar em inteiros, e as médias não mudam.
+#
+# As tabelas por escola não são compactadas: têm uma linha por escola (algumas
+# centenas a poucos milhares), então a economia seria desprezível; as médias
+# com uma casa decimal ficariam com resíduos de float32 na exibição e na
+# exportação, e os nomes em `string` alimentam os índices de busca e filtros.
+TIPOS_COMPACTOS = {
+    'NOME_ESCOLA': 'category',
+    'NO_MUNICIPIO_ESC': 'category',
+    'DEPENDENCIA_NOME': 'category',
+    'TP_DEPENDENCIA_ADM_ESC': 'Int8',
+    **{origem: 'float32' for origem in COLUNAS_MEDIAS},
+}
+
+# Texto do município ausente nos pares (nome, município) sem CO_ESCOLA
+MUNICIPIO_AUSENTE = '<NA>'
+
+# Notas com no máximo duas casas decimais: somadas em centésimos de ponto
+ESCALA_NOTAS = 100
+
+# Opções de N oferecidas no dashboard para o ranking dos melhores alunos
+OPCOES_TOP_N = [5, 10, 20]
+TOP_N_PADRAO = 10
+
+
+def categoria_desempenho(scores):
+    """
+    Classifica scores em faixas de desempenho (vetorizado)
+    """
+    scores = np.asarray(scores, dtype=float)
+    return np.select(
+        [scores >= 650, scores >= 600, scores >= 550, scores >= 500],
+        ['Excelente', 'Muito Bom', 'Bom', 'Regular'],
+        default='Baixo'
+    )
+
+
+def preparar_microdados(df):
+    """
+    Mantém os alunos com escola e score válidos, nomeia a dependência e
+    garante o CO_ESCOLA (ponto de partida de todas as agregações)
+    """
+    df_clean = df.dropna(subset=['NOME_ESCOLA', 'SCORE_FINAL']).copy()
+    df_clean['DEPENDENCIA_NOME'] = df_clean['TP_DEPENDENCIA_ADM_ESC'].map(DEPENDENCIAS)
+    return preencher_codigo_escola(df_clean)
+
+
+def compactar_microdados(df):
+    """
+    Converte as colunas presentes para TIPOS_COMPACTOS; as agregações dão o
+    mesmo resultado com os tipos originais ou compactos
+    """
+    tipos = {coluna: tipo for coluna, tipo in TIPOS_COMPACTOS.items() if coluna in df.columns}
+    return df.astype(tipos)
+
+
+def memoria_mb(df):
+    """
+    Memória ocupada pelo DataFrame em MB, incluindo o conteúdo dos textos
+    """
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+
+def preencher_codigo_escola(df):
+    """
+    Garante um CO_ESCOLA para todas as linhas.
+
+    Arquivos sem o código (ou com lacunas) recebem códigos negativos estáveis
+    por par (nome da escola, município), que nunca colidem com os do INEP.
+    """
+    ausentes = df['CO_ESCOLA'].isna()
+    if not ausentes.any():
+        return df
+    df = df.copy()
+    municipios = df.loc[ausentes, 'NO_MUNICIPIO_ESC'].astype(str).fillna(MUNICIPIO_AUSENTE)
+    pares = df.loc[ausentes, 'NOME_ESCOLA'].astype(str) + '|' + municipios
+    codigos, _ = pd.factorize(pares, sort=True)
+    df.loc[ausentes, 'CO_ESCOLA'] = -(codigos + 1)
+    return df
+
+
+def somas_por_escola(df):
+    """
+    Soma e contagem de cada nota por escola, agrupadas por CHAVES_ESCOLA.
+
+    As notas têm no máximo duas casas decimais e são somadas em centésimos
+    de ponto: somas de inteiros são exatas em qualquer ordem, de modo que
+    todos os backends (backends.py) chegam às mesmas médias.
+    """
+    centesimos = {
+        origem: np.rint(df[origem].to_numpy(dtype=float, na_value=np.nan) * ESCALA_NOTAS)
+        for origem in COLUNAS_MEDIAS
+    }
+    somas = df[CHAVES_ESCOLA].assign(**centesimos).groupby(CHAVES_ESCOLA, observed=True).agg(
+        **{f'{origem}_soma': (origem, 'sum') for origem in COLUNAS_MEDIAS},
+        **{f'{origem}_n': (origem, 'count') for origem in COLUNAS_MEDIAS}
+    )
+    return somas.reset_index()
+
+
+def media_arredondada(soma, contagem):
+    """
+    Média com uma casa decimal a partir da soma em centésimos (vetorizado).
+
+    O arredondamento é feito em aritmética inteira, metade para o par, como
+    `round(1)` faria sobre a média exata; sem alunos, a média é NaN.
+    """
+    soma = np.asarray(soma, dtype=np.int64)
+    contagem = np.asarray(contagem, dtype=np.int64)
+    divisor = np.maximum(contagem, 1) * (ESCALA_NOTAS // 10)
+    decimos, resto = np.divmod(soma, divisor)
+    decimos += (2 * resto > divisor) | ((2 * resto == divisor) & (decimos % 2 == 1))
+    return np.where(contagem > 0, decimos / 10, np.nan)
+
+
+def _agregar_por_escola(somas, nome_contagem):
+    """
+    Calcula as médias por escola e o número de alunos considerados
+    """
+    somas = somas.sort_values(CHAVES_ESCOLA, ignore_index=True)
+    stats = somas[CHAVES_ESCOLA].astype(TIPOS_CHAVES)
+    for origem, destino in COLUNAS_MEDIAS.items():
+        stats[destino] = media_arredondada(somas[f'{origem}_soma'].fillna(0), somas[f'{origem}_n'])
+    stats[nome_contagem] = somas['SCORE_FINAL_n'].astype(np.int64)
+    return stats.rename(columns={'NO_MUNICIPIO_ESC': 'Municipio'})
+
+
+def _classificar(stats, coluna_classificacao, coluna_categoria):
+    """
+    Ordena pelo Score Final, adiciona classificação e categoria de desempenho
+    e indexa a tabela por CO_ESCOLA
+    """
+    stats = stats.sort_values('SCORE_FINAL', ascending=False).reset_index(drop=True)
+    stats[coluna_classificacao] = stats.index + 1
+    stats[coluna_categoria] = categoria_desempenho(stats['SCORE_FINAL'])
+    return stats.set_index('CO_ESCOLA')
+
+
+def estatisticas_escolas(df, min_participantes=5):
+    """
+    Médias por escola considerando todos os alunos
+    """
+    return concluir_estatisticas_escolas(somas_por_escola(df), min_participantes)
+
+
+def concluir_estatisticas_escolas(somas, min_participantes=5):
+    """
+    Tabela geral a partir das somas por escola (de qualquer backend)
+    """
+    stats = _agregar_por_escola(somas, 'Participantes')
+    stats = stats[stats['Participantes'] >= min_participantes]
+    return _classificar(stats, 'Classificacao', 'Categoria_Desempenho')
+
+
+def selecionar_top_n(df, n, chave='CO_ESCOLA', coluna='SCORE_FINAL'):
+    """
+    Seleciona os N maiores valores de `coluna` em cada grupo de `chave`.
+
+    Em vez de mascarar o DataFrame inteiro para cada escola, ordena uma única
+    vez por (grupo, score decrescente) e mantém as linhas cuja posição dentro
+    do grupo é menor que N. Empates são resolvidos pela ordem original das
+    linhas, como em `nlargest(keep='first')`.
+    """
+    if n < 1:
+        raise ValueError("n deve ser pelo menos 1")
+
+    codigos, _ = pd.factorize(df[chave], sort=False)
+    scores = df[coluna].to_numpy(dtype=float, na_value=np.nan)
+
+    # lexsort é estável: ordena pela última chave e desempata pelas anteriores
+    ordem = np.lexsort((-scores, codigos))
+    codigos_ordenados = codigos[ordem]
+
+    # Posição de cada linha dentro do seu grupo (cumcount vetorizado)
+    inicio_grupo = np.r_[True, codigos_ordenados[1:] != codigos_ordenados[:-1]]
+    indices_inicio = np.flatnonzero(inicio_grupo)
+    tamanhos = np.diff(np.r_[indices_inicio, len(ordem)])
+    posicao = np.arange(len(ordem)) - np.repeat(indices_inicio, tamanhos)
+
+    manter = ordem[(posicao < n) & (codigos_ordenados >= 0) & ~np.isnan(scores[ordem])]
+    return df.iloc[np.sort(manter)]
+
+
+def estatisticas_top_n(df, n=TOP_N_PADRAO, min_alunos=3):
+    """
+    Médias por escola considerando apenas os N melhores alunos de cada uma
+    """
+    return concluir_estatisticas_top_n(somas_por_escola(selecionar_top_n(df, n)), n, min_alunos)
+
+
+def concluir_estatisticas_top_n(somas, n=TOP_N_PADRAO, min_alunos=3):
+    """
+    Tabela dos N melhores alunos a partir das somas por escola dos alunos
+    selecionados
+    """
+    stats = _agregar_por_escola(somas, 'Top_Alunos_Considerados')
+
+    # Exige uma amostra mínima, sem exceder o próprio N escolhido
+    stats = stats[stats['Top_Alunos_Considerados'] >= min(min_alunos, n)]
+    return _classificar(stats, 'Classificacao_TopN', 'Categoria_Desempenho_TopN')
+
+
+def tabela_comparacao(escolas, escolas_top_n):
+    """
+    Junta as médias gerais e as dos N melhores alunos pelo índice CO_ESCOLA.
+
+    Uma única junção indexada substitui as buscas por nome escola a escola;
+    a ordem segue a tabela geral (classificação pelo Score Final).
+    """
+    comparacao = escolas[['NOME_ESCOLA', 'Municipio', 'DEPENDENCIA_NOME', 'SCORE_FINAL']].join(
+        escolas_top_n[['SCORE_FINAL']].rename(columns={'SCORE_FINAL': 'SCORE_FINAL_TOPN'}),
+        how='inner'
+    )
+    comparacao['Diferenca'] = (comparacao['SCORE_FINAL_TOPN'] - comparacao['SCORE_FINAL']).round(1)
+    return comparacao
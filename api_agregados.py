@@ -0,0 +1,443 @@
+"""
+Serviço HTTP local com os agregados por escola, em JSON ou Arrow
+
+Um único processo calcula a tabela geral, as tabelas dos N melhores alunos e
+os rankings filtrados, e os serve a todos os dashboards, notebooks e scripts
+da máquina. As tabelas são montadas uma vez por versão dos dados (prefixo do
+SHA-256 do CSV, ver `ingestao.preparar_ano`), lidas dos artefatos do
+`materializar.py` ou agregadas pelo backend configurado; pedidos simultâneos
+da mesma tabela esperam pelo mesmo cálculo. As respostas já serializadas
+ficam em um cache LRU em memória.
+
+Cada resposta traz um ETag derivado da versão dos dados e dos parâmetros
+normalizados: um cliente que reenvia o ETag em `If-None-Match` recebe 304 sem
+corpo enquanto os dados não mudarem.
+
+Endpoints (formato=json, padrão, ou formato=arrow, um stream Arrow IPC):
+    GET /anos
+    GET /escolas?ano=2024
+    GET /top_n?ano=2024&n=10
+    GET /ranking?ano=2024&municipio=NATAL&dependencia=Estadual&minimo=10&limite=50
+    GET /ranking?ano=2024&tabela=top_n&n=10&dependencia=Privada
+
+No `/ranking`, `municipio`, `dependencia` e `escola` (CO_ESCOLA) podem se
+repetir; `minimo` é o mínimo de participantes (só na tabela geral) e
+`limite`/`deslocamento` paginam o resultado, na ordem da classificação.
+
+O dashboard usa o serviço como fonte das tabelas por escola quando a variável
+ENEM_API_URL está definida (por exemplo, http://127.0.0.1:8765).
+
+Uso:
+    python api_agregados.py
+    python api_agregados.py --porta 8765 --backend duckdb
+"""
+import argparse
+import functools
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib.util import find_spec
+
+import pandas as pd
+
+import agregacoes
+import backends
+import filtros
+import ingestao
+import materializar
+import segundo_plano
+
+VARIAVEL_URL = 'ENEM_API_URL'
+ENDERECO_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8765
+
+# Incrementar sempre que o conteúdo ou o formato das respostas mudarem (invalida os ETags)
+VERSAO_API = 1
+
+# Respostas serializadas mantidas em memória
+CAPACIDADE_RESPOSTAS = 256
+
+LIMITE_PADRAO = 100
+MAXIMO_TOP_N = 100
+
+TIPOS = {
+    'json': 'application/json; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+class ErroRequisicao(ValueError):
+    """
+    Parâmetro inválido ou recurso inexistente, com o status HTTP da resposta
+    """
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def formatos_disponiveis():
+    """
+    Formatos de resposta cujas dependências estão instaladas
+    """
+    return [formato for formato in TIPOS if formato != 'arrow' or find_spec('pyarrow') is not None]
+
+
+def serializar(df, formato):
+    """
+    Bytes da tabela (indexada por CO_ESCOLA) no formato pedido
+    """
+    if formato == 'json':
+        return df.reset_index().to_json(orient='records', force_ascii=False).encode('utf-8')
+    import pyarrow as pa
+
+    tabela = pa.Table.from_pandas(df, preserve_index=True)
+    buffer = io.BytesIO()
+    with pa.ipc.new_stream(buffer, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return buffer.getvalue()
+
+
+def desserializar(corpo, formato):
+    """
+    Tabela indexada por CO_ESCOLA a partir dos bytes de `serializar`
+    """
+    if formato == 'json':
+        return pd.read_json(io.BytesIO(corpo), orient='records', dtype=False).set_index('CO_ESCOLA')
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(corpo).read_all().to_pandas()
+
+
+def calcular_etag(versao, chave):
+    """
+    ETag da resposta: versão dos dados e resumo dos parâmetros normalizados
+    """
+    resumo = hashlib.sha256(repr((VERSAO_API, chave)).encode('utf-8')).hexdigest()[:16]
+    return f'"{versao}-{resumo}"'
+
+
+class ServicoAgregados:
+    """
+    Tabelas por escola e respostas serializadas, compartilhadas entre as
+    requisições (cada handler roda em uma thread)
+    """
+
+    def __init__(self, backend=None, capacidade=CAPACIDADE_RESPOSTAS):
+        self.backend = backend or backends.criar()
+        # Tabelas e índices por chave: pedidos simultâneos esperam pelo mesmo cálculo
+        self._tarefas = segundo_plano.TarefasSegundoPlano(trabalhadores=1)
+        self._respostas = OrderedDict()
+        self._capacidade = capacidade
+        self._trava = threading.Lock()
+
+    def _versao(self, ano):
+        if ano not in ingestao.ARQUIVOS_POR_ANO:
+            raise ErroRequisicao(f"Ano sem dados: {ano}", status=404)
+        try:
+            return ingestao.preparar_ano(ano)
+        except FileNotFoundError as erro:
+            raise ErroRequisicao(str(erro), status=404) from erro
+
+    def _calcular_tabela(self, ano, versao, tabela):
+        materializada = materializar.carregar_tabela(ano, versao, tabela)
+        if materializada is not None:
+            return materializada
+        if tabela == 'escolas':
+            return self.backend.estatisticas_escolas(ano, min_participantes=materializar.MIN_PARTICIPANTES)
+        n = int(tabela[len('top'):])
+        return self.backend.estatisticas_top_n(ano, n, min_alunos=materializar.MIN_ALUNOS_TOP_N)
+
+    def tabela(self, ano, versao, tabela):
+        """
+        Tabela geral ('escolas') ou dos N melhores ('topN') do ano, calculada
+        uma vez por versão dos dados
+        """
+        return self._tarefas.resultado(('tabela', ano, versao, tabela), self._calcular_tabela, ano, versao, tabela)
+
+    def _calcular_indice(self, ano, versao, tabela):
+        df = self.tabela(ano, versao, tabela)
+        limiar = 'Participantes' if 'Participantes' in df.columns else None
+        return filtros.IndiceFiltros(df, ['CO_ESCOLA', 'DEPENDENCIA_NOME', 'Municipio'], limiar=limiar)
+
+    def indice(self, ano, versao, tabela):
+        return self._tarefas.resultado(('indice', ano, versao, tabela), self._calcular_indice, ano, versao, tabela)
+
+    def _anos(self):
+        linhas = []
+        for ano in ingestao.anos_disponiveis():
+            linhas.append({'ano': ano, 'versao': self._versao(ano)})
+        return linhas
+
+    def _consulta(self, caminho, parametros):
+        """
+        Normaliza a requisição: (versão dos dados, chave da resposta, função
+        que monta a tabela); erros de parâmetro viram ErroRequisicao
+        """
+        if caminho == '/anos':
+            anos = self._anos()
+            versao = hashlib.sha256(json.dumps(anos).encode('utf-8')).hexdigest()[:12]
+            return versao, ('anos',), lambda: anos
+
+        if caminho not in ('/escolas', '/top_n', '/ranking'):
+            raise ErroRequisicao(f"Endpoint desconhecido: {caminho}", status=404)
+        ano = _inteiro(parametros, 'ano')
+        versao = self._versao(ano)
+
+        nome = 'top_n' if caminho == '/top_n' else _texto(parametros, 'tabela', 'escolas')
+        if nome == 'escolas':
+            tabela = 'escolas'
+        elif nome == 'top_n':
+            n = _inteiro(parametros, 'n', agregacoes.TOP_N_PADRAO)
+            if not 1 <= n <= MAXIMO_TOP_N:
+                raise ErroRequisicao(f"n deve estar entre 1 e {MAXIMO_TOP_N}")
+            tabela = f'top{n}'
+        else:
+            raise ErroRequisicao(f"Tabela desconhecida: {nome} (opções: escolas, top_n)")
+
+        if caminho != '/ranking':
+            return versao, (tabela, ano), lambda: self.tabela(ano, versao, tabela)
+
+        indice = self.indice(ano, versao, tabela)
+        selecao = {
+            'CO_ESCOLA': _inteiros(parametros, 'escola') or None,
+            'DEPENDENCIA_NOME': parametros.get('dependencia') or None,
+            'Municipio': parametros.get('municipio') or None,
+        }
+        minimo = _inteiro(parametros, 'minimo', None)
+        limite = _inteiro(parametros, 'limite', LIMITE_PADRAO)
+        deslocamento = _inteiro(parametros, 'deslocamento', 0)
+        if limite < 0 or deslocamento < 0:
+            raise ErroRequisicao("limite e deslocamento não podem ser negativos")
+        # Filtros equivalentes (ordem, categorias repetidas) têm a mesma chave
+        chave = (tabela, ano, indice.chave(selecao, minimo), limite, deslocamento)
+
+        def montar():
+            posicoes = indice.resolver(selecao, minimo)
+            return self.tabela(ano, versao, tabela).iloc[posicoes[deslocamento:deslocamento + limite]]
+
+        return versao, chave, montar
+
+    def responder(self, caminho, parametros, formato='json', etag_cliente=None):
+        """
+        (status, ETag, tipo, corpo) da requisição; corpo vazio em 304
+        """
+        if formato not in formatos_disponiveis():
+            raise ErroRequisicao(f"Formato indisponível: {formato} (opções: {', '.join(formatos_disponiveis())})",
+                                 status=406)
+        versao, chave, montar = self._consulta(caminho, parametros)
+        etag = calcular_etag(versao, chave + (formato,))
+        if etag_cliente is not None and etag in [valor.strip() for valor in etag_cliente.split(',')]:
+            return 304, etag, TIPOS[formato], b''
+
+        with self._trava:
+            corpo = self._respostas.get(etag)
+            if corpo is not None:
+                self._respostas.move_to_end(etag)
+        if corpo is None:
+            resultado = montar()
+            if isinstance(resultado, pd.DataFrame):
+                corpo = serializar(resultado, formato)
+            elif formato == 'json':
+                corpo = json.dumps(resultado, ensure_ascii=False).encode('utf-8')
+            else:
+                raise ErroRequisicao(f"{caminho} só está disponível em JSON", status=406)
+            with self._trava:
+                self._respostas[etag] = corpo
+                while len(self._respostas) > self._capacidade:
+                    self._respostas.popitem(last=False)
+        return 200, etag, TIPOS[formato], corpo
+
+
+def _texto(parametros, nome, padrao=None):
+    valores = parametros.get(nome)
+    return valores[-1] if valores else padrao
+
+
+def _inteiro(parametros, nome, padrao=ErroRequisicao):
+    valor = _texto(parametros, nome)
+    if valor is None:
+        if padrao is ErroRequisicao:
+            raise ErroRequisicao(f"Parâmetro obrigatório: {nome}")
+        return padrao
+    try:
+        return int(valor)
+    except ValueError:
+        raise ErroRequisicao(f"Parâmetro {nome} deve ser inteiro: {valor}") from None
+
+
+def _inteiros(parametros, nome):
+    try:
+        return [int(valor) for valor in parametros.get(nome, [])]
+    except ValueError:
+        raise ErroRequisicao(f"Parâmetro {nome} deve ser inteiro") from None
+
+
+class ManipuladorAgregados(BaseHTTPRequestHandler):
+    """
+    Handler HTTP/1.1 (conexões persistentes) do ServicoAgregados do servidor
+    """
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalhos e corpo saem em escritas separadas: sem o Nagle, respostas
+    # pequenas não esperam o ACK atrasado do cliente (~40 ms)
+    disable_nagle_algorithm = True
+    silencioso = True
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        parametros = urllib.parse.parse_qs(url.query)
+        formato = _texto(parametros, 'formato')
+        if formato is None:
+            formato = 'arrow' if TIPOS['arrow'] in self.headers.get('Accept', '') else 'json'
+        try:
+            status, etag, tipo, corpo = self.server.servico.responder(
+                url.path, parametros, formato, self.headers.get('If-None-Match')
+            )
+        except ErroRequisicao as erro:
+            self._enviar(erro.status, TIPOS['json'], json.dumps({'erro': str(erro)}, ensure_ascii=False).encode('utf-8'))
+        except Exception as erro:
+            self._enviar(500, TIPOS['json'], json.dumps({'erro': f"{type(erro).__name__}: {erro}"}).encode('utf-8'))
+        else:
+            self._enviar(status, tipo, corpo, etag)
+
+    def _enviar(self, status, tipo, corpo, etag=None):
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            # O cliente pode guardar a resposta, mas revalida a cada uso
+            self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        if not self.silencioso:
+            super().log_message(formato, *args)
+
+
+class ServidorAgregados(ThreadingHTTPServer):
+    """
+    Uma thread por conexão; a fila de conexões maior que a padrão (5) evita
+    que clientes simultâneos esperem a retransmissão do SYN (~1 s)
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def criar_servidor(endereco=ENDERECO_PADRAO, porta=PORTA_PADRAO, backend=None):
+    """
+    Servidor do ServicoAgregados (porta 0 escolhe uma porta livre)
+    """
+    servidor = ServidorAgregados((endereco, porta), ManipuladorAgregados)
+    servidor.servico = ServicoAgregados(backend)
+    return servidor
+
+
+def url_configurada():
+    """
+    URL do serviço definida em ENEM_API_URL (None se não houver)
+    """
+    return os.environ.get(VARIAVEL_URL, '').strip().rstrip('/') or None
+
+
+class ClienteAgregados:
+    """
+    Cliente do serviço com ETags: respostas já recebidas são revalidadas com
+    `If-None-Match` e reaproveitadas quando o servidor responde 304
+    """
+
+    def __init__(self, url=None, formato=None, tempo_limite=300):
+        self.url = (url or url_configurada() or f'http://{ENDERECO_PADRAO}:{PORTA_PADRAO}').rstrip('/')
+        self.formato = formato or ('arrow' if 'arrow' in formatos_disponiveis() else 'json')
+        self.tempo_limite = tempo_limite
+        self._respostas = {}
+        self._trava = threading.Lock()
+
+    def _obter(self, caminho, parametros, formato=None):
+        formato = formato or self.formato
+        consulta = urllib.parse.urlencode({**parametros, 'formato': formato}, doseq=True)
+        url = f'{self.url}{caminho}?{consulta}'
+        with self._trava:
+            guardada = self._respostas.get(url)
+        requisicao = urllib.request.Request(url)
+        if guardada is not None:
+            requisicao.add_header('If-None-Match', guardada[0])
+        try:
+            with urllib.request.urlopen(requisicao, timeout=self.tempo_limite) as resposta:
+                corpo = resposta.read()
+                etag = resposta.headers.get('ETag')
+        except urllib.error.HTTPError as erro:
+            if erro.code == 304 and guardada is not None:
+                return guardada[1]
+            mensagem = erro.read().decode('utf-8', errors='replace')
+            raise RuntimeError(f"Serviço de agregados respondeu {erro.code}: {mensagem}") from None
+        resultado = json.loads(corpo) if caminho == '/anos' else desserializar(corpo, formato)
+        if etag is not None:
+            with self._trava:
+                self._respostas[url] = (etag, resultado)
+        return resultado
+
+    def anos(self):
+        return self._obter('/anos', {}, formato='json')
+
+    def escolas(self, ano):
+        return self._obter('/escolas', {'ano': ano})
+
+    def top_n(self, ano, n):
+        return self._obter('/top_n', {'ano': ano, 'n': n})
+
+    def ranking(self, ano, tabela='escolas', n=None, municipios=(), dependencias=(), escolas=(),
+                minimo=None, limite=LIMITE_PADRAO, deslocamento=0):
+        parametros = {'ano': ano, 'tabela': tabela, 'municipio': list(municipios),
+                      'dependencia': list(dependencias), 'escola': list(escolas),
+                      'limite': limite, 'deslocamento': deslocamento}
+        if n is not None:
+            parametros['n'] = n
+        if minimo is not None:
+            parametros['minimo'] = minimo
+        return self._obter('/ranking', parametros)
+
+
+@functools.lru_cache(maxsize=None)
+def cliente(url):
+    """
+    Cliente compartilhado por URL, com as respostas já recebidas
+    """
+    return ClienteAgregados(url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endereco', default=ENDERECO_PADRAO,
+                        help="Endereço de escuta (padrão: só a máquina local)")
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--backend', choices=list(backends.BACKENDS),
+                        help="Motor das agregações dos anos sem tabela materializada")
+    parser.add_argument('--verboso', action='store_true',
+                        help="Registra cada requisição no terminal")
+    args = parser.parse_args()
+
+    ManipuladorAgregados.silencioso = not args.verboso
+    servidor = criar_servidor(args.endereco, args.porta, backends.criar(args.backend))
+    endereco, porta = servidor.server_address[:2]
+    print(f"🌐 Agregados em http://{endereco}:{porta} (ENEM_API_URL=http://{endereco}:{porta})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+Backends de consulta para as agregações por escola
+
+A tabela geral e as tabelas dos N melhores alunos podem ser calculadas por
+três motores sobre a partição Parquet do ano (`data-cache/resultados/`):
+
+- `pandas`: o caminho original, com os microdados inteiros em memória;
+- `polars`: plano lazy multi-thread (`scan_parquet`), que lê só as colunas
+  usadas e executa no engine de streaming quando possível;
+- `duckdb`: SQL embarcado direto sobre o arquivo Parquet, fora da memória do
+  Python.
+
+Cada backend só produz as somas (em centésimos) e contagens por escola; as
+médias, a classificação e a categoria são calculadas por `agregacoes` a
+partir delas, de modo que os resultados são idênticos entre os motores. O
+backend é escolhido pela variável de ambiente ENEM_BACKEND (padrão: pandas).
+"""
+import functools
+import os
+import warnings
+from importlib.util import find_spec
+
+import agregacoes
+import ingestao
+
+VARIAVEL_BACKEND = 'ENEM_BACKEND'
+BACKEND_PADRAO = 'pandas'
+
+# Nome do backend -> módulo necessário
+MODULOS = {
+    'pandas': 'pandas',
+    'polars': 'polars',
+    'duckdb': 'duckdb',
+}
+
+
+def disponiveis():
+    """
+    Backends cujos módulos estão instalados
+    """
+    return [nome for nome, modulo in MODULOS.items() if find_spec(modulo) is not None]
+
+
+def backend_configurado():
+    """
+    Nome do backend definido em ENEM_BACKEND, ou o padrão se não estiver
+    instalado
+    """
+    nome = os.environ.get(VARIAVEL_BACKEND, BACKEND_PADRAO).strip().lower() or BACKEND_PADRAO
+    if nome not in MODULOS:
+        raise ValueError(f"Backend desconhecido em {VARIAVEL_BACKEND}: {nome} (opções: {', '.join(MODULOS)})")
+    if nome not in disponiveis():
+        warnings.warn(f"Backend {nome} não instalado; usando {BACKEND_PADRAO}")
+        return BACKEND_PADRAO
+    return nome
+
+
+def caminho_parquet(ano, diretorio_dataset=ingestao.DIRETORIO_DATASET):
+    """
+    Arquivo Parquet do ano, materializado a partir do CSV se preciso
+    """
+    ingestao.preparar_ano(ano, diretorio_dataset)
+    return os.path.join(ingestao.caminho_particao(ano, diretorio_dataset), 'dados.parquet')
+
+
+class Backend:
+    """
+    Interface comum: as subclasses implementam `somas_escolas` e
+    `somas_top_n`, no formato de `agregacoes.somas_por_escola`
+    """
+    nome = None
+
+    def __init__(self, diretorio_dataset=ingestao.DIRETORIO_DATASET):
+        self.diretorio_dataset = diretorio_dataset
+
+    def somas_escolas(self, ano):
+        raise NotImplementedError
+
+    def somas_top_n(self, ano, n):
+        raise NotImplementedError
+
+    def estatisticas_escolas(self, ano, min_participantes=5):
+        """
+        Médias por escola considerando todos os alunos
+        """
+        return agregacoes.concluir_estatisticas_escolas(self.somas_escolas(ano), min_participantes)
+
+    def estatisticas_top_n(self, ano, n=agregacoes.TOP_N_PADRAO, min_alunos=3):
+        """
+        Médias por escola considerando apenas os N melhores alunos de cada uma
+        """
+        if n < 1:
+            raise ValueError("n deve ser pelo menos 1")
+        return agregacoes.concluir_estatisticas_top_n(self.somas_top_n(ano, n), n, min_alunos)
+
+
+@functools.lru_cache(maxsize=1)
+def _microdados(ano, versao, diretorio_dataset):
+    microdados = agregacoes.preparar_microdados(ingestao.carregar_ano(
+        ano, colunas=agregacoes.COLUNAS_MICRODADOS, diretorio_dataset=diretorio_dataset
+    ))
+    return agregacoes.compactar_microdados(microdados)
+
+
+class BackendPandas(Backend):
+    """
+    Microdados inteiros em memória, agregados com `agregacoes`.
+
+    `carregar_microdados(ano)` permite reaproveitar microdados já carregados
+    (por exemplo, do cache do Streamlit); sem ele, o último ano lido fica em
+    memória para as tabelas seguintes.
+    """
+    nome = 'pandas'
+
+    def __init__(self, diretorio_dataset=ingestao.DIRETORIO_DATASET, carregar_microdados=None):
+        super().__init__(diretorio_dataset)
+        self._carregar = carregar_microdados
+
+    def microdados(self, ano):
+        if self._carregar is not None:
+            return self._carregar(ano)
+        versao = ingestao.preparar_ano(ano, self.diretorio_dataset)
+        return _microdados(ano, versao, self.diretorio_dataset)
+
+    def somas_escolas(self, ano):
+        return agregacoes.somas_por_escola(self.microdados(ano))
+
+    def somas_top_n(self, ano, n):
+        return agregacoes.somas_por_escola(agregacoes.selecionar_top_n(self.microdados(ano), n))
+
+
+class BackendPolars(Backend):
+    """
+    Plano lazy do Polars sobre a partição Parquet (multi-thread)
+    """
+    nome = 'polars'
+
+    def __init__(self, diretorio_dataset=ingestao.DIRETORIO_DATASET):
+        super().__init__(diretorio_dataset)
+        import polars
+        self._pl = polars
+
+    def _alunos(self, ano):
+        """
+        Equivalente lazy de `agregacoes.preparar_microdados`, com a posição
+        original de cada linha para desempatar o Top N
+        """
+        pl = self._pl
+        alunos = (
+            pl.scan_parquet(caminho_parquet(ano, self.diretorio_dataset))
+            .select(agregacoes.COLUNAS_MICRODADOS)
+            .with_row_index('_linha')
+            .with_columns([pl.col(coluna).fill_nan(None) for coluna in agregacoes.COLUNAS_MEDIAS])
+            .filter(pl.col('NOME_ESCOLA').is_not_null() & pl.col('SCORE_FINAL').is_not_null())
+        )
+
+        # Códigos negativos por (nome, município) ordenado, como em preencher_codigo_escola
+        par = pl.concat_str(
+            [pl.col('NOME_ESCOLA'), pl.col('NO_MUNICIPIO_ESC').fill_null(agregacoes.MUNICIPIO_AUSENTE)],
+            separator='|'
+        )
+        substituto = -pl.when(pl.col('CO_ESCOLA').is_null()).then(par).rank('dense').cast(pl.Int64)
+        return alunos.with_columns(
+            CO_ESCOLA=pl.coalesce(pl.col('CO_ESCOLA').cast(pl.Int64), substituto),
+            DEPENDENCIA_NOME=pl.col('TP_DEPENDENCIA_ADM_ESC').replace_strict(
+                agregacoes.DEPENDENCIAS, default=None, return_dtype=pl.String
+            ),
+        )
+
+    def _somas(self, alunos):
+        pl = self._pl
+        # groupby do pandas descarta grupos com chave ausente
+        chaves_validas = pl.all_horizontal([pl.col(chave).is_not_null() for chave in agregacoes.CHAVES_ESCOLA])
+        somas = alunos.filter(chaves_validas).group_by(agregacoes.CHAVES_ESCOLA).agg(
+            [(pl.col(origem) * agregacoes.ESCALA_NOTAS).round(0).sum().alias(f'{origem}_soma')
+             for origem in agregacoes.COLUNAS_MEDIAS]
+            + [pl.col(origem).count().alias(f'{origem}_n') for origem in agregacoes.COLUNAS_MEDIAS]
+        )
+        return somas.collect(engine='streaming').to_pandas()
+
+    def somas_escolas(self, ano):
+        return self._somas(self._alunos(ano))
+
+    def somas_top_n(self, ano, n):
+        pl = self._pl
+        # Posição dentro da escola por score decrescente, empates pela ordem do arquivo
+        selecionados = (
+            self._alunos(ano)
+            .sort(['CO_ESCOLA', 'SCORE_FINAL', '_linha'], descending=[False, True, False])
+            .filter(pl.int_range(pl.len()).over('CO_ESCOLA') < n)
+        )
+        return self._somas(selecionados)
+
+
+class BackendDuckDB(Backend):
+    """
+    SQL do DuckDB embarcado, lendo a partição Parquet diretamente
+    """
+    nome = 'duckdb'
+
+    def __init__(self, diretorio_dataset=ingestao.DIRETORIO_DATASET):
+        super().__init__(diretorio_dataset)
+        import duckdb
+        self._duckdb = duckdb
+
+    def _sql_alunos(self, ano):
+        """
+        Equivalente em SQL de `agregacoes.preparar_microdados`
+        """
+        caminho = caminho_parquet(ano, self.diretorio_dataset).replace("'", "''")
+        dependencia = ' '.join(
+            f"WHEN {codigo} THEN '{nome}'" for codigo, nome in agregacoes.DEPENDENCIAS.items()
+        )
+        notas = ', '.join(
+            f"NULLIF({origem}, 'NaN'::DOUBLE) AS {origem}" for origem in agregacoes.COLUNAS_MEDIAS
+        )
+        par = f"NOME_ESCOLA || '|' || COALESCE(NO_MUNICIPIO_ESC, '{agregacoes.MUNICIPIO_AUSENTE}')"
+        return f"""
+            base AS (
+                SELECT file_row_number AS _linha, CAST(CO_ESCOLA AS BIGINT) AS CO_ESCOLA, NOME_ESCOLA,
+                       NO_MUNICIPIO_ESC, TP_DEPENDENCIA_ADM_ESC,
+                       CASE TP_DEPENDENCIA_ADM_ESC {dependencia} END AS DEPENDENCIA_NOME, {notas}
+                FROM read_parquet('{caminho}', file_row_number = true)
+                WHERE NOME_ESCOLA IS NOT NULL AND SCORE_FINAL IS NOT NULL AND NOT isnan(SCORE_FINAL)
+            ),
+            substitutos AS (
+                SELECT par, -ROW_NUMBER() OVER (ORDER BY par) AS codigo
+                FROM (SELECT DISTINCT {par} AS par FROM base WHERE CO_ESCOLA IS NULL)
+            ),
+            alunos AS (
+                SELECT base.* REPLACE (COALESCE(base.CO_ESCOLA, substitutos.codigo) AS CO_ESCOLA)
+                FROM base LEFT JOIN substitutos
+                  ON CASE WHEN base.CO_ESCOLA IS NULL THEN {par} END = substitutos.par
+            )
+        """
+
+    def _somas(self, ctes, origem):
+        chaves = ', '.join(agregacoes.CHAVES_ESCOLA)
+        chaves_validas = ' AND '.join(f'{chave} IS NOT NULL' for chave in agregacoes.CHAVES_ESCOLA)
+        somas = ', '.join(
+            f'SUM(ROUND({coluna} * {agregacoes.ESCALA_NOTAS})) AS {coluna}_soma'
+            for coluna in agregacoes.COLUNAS_MEDIAS
+        )
+        contagens = ', '.join(f'COUNT({coluna}) AS {coluna}_n' for coluna in agregacoes.COLUNAS_MEDIAS)
+        consulta = f"""
+            WITH {ctes}
+            SELECT {chaves}, {somas}, {contagens}
+            FROM {origem}
+            WHERE {chaves_validas}
+            GROUP BY {chaves}
+        """
+        with self._duckdb.connect() as conexao:
+            return conexao.sql(consulta).df()
+
+    def somas_escolas(self, ano):
+        return self._somas(self._sql_alunos(ano), 'alunos')
+
+    def somas_top_n(self, ano, n):
+        # Empates pela ordem do arquivo, como em nlargest(keep='first')
+        ctes = self._sql_alunos(ano) + f""",
+            selecionados AS (
+                SELECT * FROM alunos
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY CO_ESCOLA ORDER BY SCORE_FINAL DESC, _linha) <= {int(n)}
+            )
+        """
+        return self._somas(ctes, 'selecionados')
+
+
+BACKENDS = {
+    'pandas': BackendPandas,
+    'polars': BackendPolars,
+    'duckdb': BackendDuckDB,
+}
+
+
+def criar(nome=None, **opcoes):
+    """
+    Instancia o backend pelo nome (padrão: o configurado em ENEM_BACKEND)
+    """
+    nome = nome or backend_configurado()
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {nome} (opções: {', '.join(BACKENDS)})")
+    return BACKENDS[nome](**opcoes)
@@ -0,0 +1,138 @@
+"""
+Teste de carga do serviço de agregados (api_agregados.py)
+
+Sobe uma instância local em uma porta livre (ou usa --url) e dispara
+requisições de vários clientes simultâneos, cada um com uma conexão HTTP/1.1
+persistente, em cenários típicos: tabela geral em JSON e em Arrow, tabela dos
+N melhores, rankings filtrados e revalidação com ETag (304). Mostra
+requisições por segundo e as latências p50/p95 de cada cenário.
+
+Uso:
+    python benchmark_api.py
+    python benchmark_api.py --clientes 8 --requisicoes 200 --ano 2024
+    python benchmark_api.py --url http://127.0.0.1:8765
+"""
+import argparse
+import http.client
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import api_agregados
+import ingestao
+
+
+def cenarios(ano, n):
+    """
+    (nome, caminho com a consulta, revalidar com ETag) de cada cenário
+    """
+    return [
+        ('escolas_json', f'/escolas?ano={ano}', False),
+        ('escolas_arrow', f'/escolas?ano={ano}&formato=arrow', False),
+        (f'top{n}_json', f'/top_n?ano={ano}&n={n}', False),
+        ('ranking_filtrado', f'/ranking?ano={ano}&dependencia=Estadual&dependencia=Municipal&minimo=20&limite=50', False),
+        ('ranking_paginas', f'/ranking?ano={ano}&limite=20&deslocamento={{pagina}}', False),
+        ('escolas_etag_304', f'/escolas?ano={ano}', True),
+    ]
+
+
+def _cliente(url, caminho, revalidar, requisicoes, inicio):
+    """
+    Latências (s) das requisições de um cliente, em uma conexão persistente
+    """
+    partes = urllib.parse.urlsplit(url)
+    conexao = http.client.HTTPConnection(partes.hostname, partes.port, timeout=300)
+    etag = None
+    if revalidar:
+        conexao.request('GET', caminho)
+        resposta = conexao.getresponse()
+        resposta.read()
+        etag = resposta.getheader('ETag')
+
+    latencias = []
+    for requisicao in range(requisicoes):
+        cabecalhos = {'If-None-Match': etag} if etag else {}
+        # Páginas diferentes a cada requisição (fora do cache de respostas na primeira volta)
+        consulta = caminho.replace('{pagina}', str(20 * ((inicio + requisicao) % 25)))
+        antes = time.perf_counter()
+        conexao.request('GET', consulta, headers=cabecalhos)
+        resposta = conexao.getresponse()
+        resposta.read()
+        latencias.append(time.perf_counter() - antes)
+        esperado = 304 if revalidar else 200
+        if resposta.status != esperado:
+            raise RuntimeError(f"{consulta}: status {resposta.status} (esperado {esperado})")
+    conexao.close()
+    return latencias
+
+
+def medir(url, caminho, revalidar, clientes, requisicoes):
+    """
+    Requisições por segundo e latências (ms) com `clientes` simultâneos
+    """
+    # Aquecimento: a primeira requisição monta a tabela e a resposta no servidor
+    _cliente(url, caminho.replace('{pagina}', '0'), False, 1, 0)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as executor:
+        partes = list(executor.map(
+            lambda cliente: _cliente(url, caminho, revalidar, requisicoes, cliente * requisicoes),
+            range(clientes),
+        ))
+    duracao = time.perf_counter() - inicio
+    latencias = np.concatenate(partes) * 1000
+    return {
+        'requisicoes': len(latencias),
+        'req_s': len(latencias) / duracao,
+        'p50_ms': float(np.percentile(latencias, 50)),
+        'p95_ms': float(np.percentile(latencias, 95)),
+        'max_ms': float(latencias.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="Serviço já em execução (padrão: sobe uma instância local)")
+    parser.add_argument('--ano', type=int,
+                        help="Ano consultado (padrão: o mais recente disponível)")
+    parser.add_argument('--n', type=int, default=10,
+                        help="N da tabela dos melhores alunos")
+    parser.add_argument('--clientes', type=int, default=8,
+                        help="Clientes simultâneos")
+    parser.add_argument('--requisicoes', type=int, default=100,
+                        help="Requisições por cliente em cada cenário")
+    args = parser.parse_args()
+
+    anos = ingestao.anos_disponiveis()
+    if args.ano is None and not anos:
+        print("❌ Nenhum arquivo de resultados encontrado em data-raw/.", file=sys.stderr)
+        return 1
+    ano = args.ano or anos[-1]
+
+    servidor = None
+    url = args.url
+    if url is None:
+        servidor = api_agregados.criar_servidor(porta=0)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f'http://{servidor.server_address[0]}:{servidor.server_address[1]}'
+
+    print(f"🌐 {url} — ano {ano}, {args.clientes} clientes x {args.requisicoes} requisições por cenário\n")
+    print(f"{'cenário':<20} {'req/s':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'máx (ms)':>10}")
+    try:
+        for nome, caminho, revalidar in cenarios(ano, args.n):
+            resultado = medir(url, caminho, revalidar, args.clientes, args.requisicoes)
+            print(f"{nome:<20} {resultado['req_s']:>10,.0f} {resultado['p50_ms']:>10.2f} "
+                  f"{resultado['p95_ms']:>10.2f} {resultado['max_ms']:>10.2f}")
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+            servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
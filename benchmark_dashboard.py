@@ -0,0 +1,235 @@
+"""
+Benchmark dos caminhos de dados do dashboard em vários fatores de escala
+
+Gera arquivos sintéticos (gerar_dados_sinteticos.py) do tamanho do RN até o
+tamanho nacional e mede cada etapa que o dashboard executa: parse do CSV,
+leitura da partição Parquet, preparação e compactação dos microdados
+(com a memória da tabela antes e depois), agregações por escola
+e Top N, índice e resolução de filtros, busca por nome, histogramas por
+aluno e construção das figuras (com o tamanho do JSON enviado). Para cada etapa registra o menor tempo entre as repetições e o pico
+de memória alocada pelo Python e pelo NumPy (tracemalloc, medido numa
+execução à parte; buffers internos do pyarrow não entram na conta).
+
+Os resultados podem ser gravados como linha de base e comparados nas
+próximas execuções; etapas mais lentas que a linha de base além da
+tolerância são apontadas e o script termina com código 1.
+
+Uso:
+    python benchmark_dashboard.py
+    python benchmark_dashboard.py --escalas 1 10 143 --salvar-linha-de-base
+    python benchmark_dashboard.py --comparar --tolerancia 1.3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import agregacoes
+import busca
+import figuras
+import histogramas
+import filtros
+import gerar_dados_sinteticos
+import ingestao
+import regressao
+
+DIRETORIO_BENCHMARK = os.path.join(ingestao.DIRETORIO_CACHE, 'benchmark')
+LINHA_DE_BASE = os.path.join(DIRETORIO_BENCHMARK, 'linha_de_base.json')
+
+# Diferenças abaixo deste valor (em segundos) são tratadas como ruído
+TOLERANCIA_ABSOLUTA = 0.02
+
+CONSULTAS_FILTRO = 200
+CONSULTAS_BUSCA = ['sao', 'jose', 'e e', 'colegio santa', 'unidade 2', 'xyz']
+
+
+def arquivo_sintetico(ano, escala, semente=0):
+    """
+    Caminho do arquivo sintético da escala, gerado só na primeira vez
+    """
+    diretorio = os.path.join(DIRETORIO_BENCHMARK, 'sinteticos')
+    caminho = os.path.join(diretorio, f'RESULTADOS_{ano}_RN_x{escala:g}_s{semente}.csv')
+    if not os.path.exists(caminho):
+        linhas = int(gerar_dados_sinteticos.LINHAS_RN * escala)
+        print(f"   gerando {linhas:,} linhas sintéticas em {caminho}...")
+        gerar_dados_sinteticos.gerar_arquivo(caminho, ano, linhas, semente=semente)
+    return caminho
+
+
+def medir(funcao, repeticoes):
+    """
+    Retorna (resultado, menor tempo em segundos, pico de memória em MB)
+    """
+    tracemalloc.start()
+    resultado = funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return resultado, min(tempos), pico / 1024 / 1024
+
+
+def _resolver_filtros(indice, escolas, rng):
+    """
+    Combinações aleatórias dos filtros da barra lateral, como nas interações
+    """
+    dependencias = indice.valores('DEPENDENCIA_NOME')
+    municipios = indice.valores('Municipio')
+    maximo = int(indice.maximo_limiar())
+    combinacoes = [
+        {
+            'CO_ESCOLA': [escolas[rng.integers(len(escolas))]] if rng.random() < 0.1 else None,
+            'DEPENDENCIA_NOME': list(rng.choice(dependencias, rng.integers(1, len(dependencias) + 1), replace=False)),
+            'Municipio': [municipios[rng.integers(len(municipios))]] if rng.random() < 0.5 else None,
+            'minimo': int(rng.integers(1, max(2, maximo // 4))),
+        }
+        for _ in range(CONSULTAS_FILTRO)
+    ]
+
+    def executar():
+        for combinacao in combinacoes:
+            filtros_selecionados = dict(combinacao)
+            minimo = filtros_selecionados.pop('minimo')
+            indice.resolver(filtros_selecionados, minimo=minimo)
+    return executar
+
+
+def _construir_figuras(tabela, tabela_top_n, distribuicao):
+    tendencias = regressao.tendencias_participantes(tabela)
+    comparacao = agregacoes.tabela_comparacao(tabela, tabela_top_n)
+    return [
+        figuras.figura_ranking(tabela),
+        figuras.figura_radar(tabela),
+        figuras.figura_box(tabela),
+        figuras.figura_scatter(tabela),
+        figuras.figura_scatter_participantes(tabela, tendencias),
+        figuras.figura_comparacao(comparacao, agregacoes.TOP_N_PADRAO),
+        figuras.figura_comparacao_todas(comparacao, agregacoes.TOP_N_PADRAO),
+        figuras.figura_distribuicao_alunos(distribuicao, histogramas.LARGURA_FAIXA),
+    ]
+
+
+def executar_escala(ano, escala, repeticoes, semente=0):
+    """
+    Mede todas as etapas para um fator de escala
+    """
+    caminho = arquivo_sintetico(ano, escala, semente)
+    caminho_parquet = os.path.join(DIRETORIO_BENCHMARK, f'escala_{escala:g}.parquet')
+    resultados = {}
+
+    def registrar(etapa, funcao, repeticoes=repeticoes):
+        resultado, segundos, pico = medir(funcao, repeticoes)
+        resultados[etapa] = {'segundos': segundos, 'pico_mb': pico}
+        print(f"   {etapa:<24} {segundos:>10.4f} s {pico:>10.1f} MB")
+        return resultado
+
+    bruto = registrar('parse_csv', lambda: ingestao.ler_csv_resultados(caminho, ano), repeticoes=1)
+    registrar('gravar_parquet', lambda: bruto.to_parquet(caminho_parquet, index=False), repeticoes=1)
+    bruto = registrar('ler_parquet', lambda: pd.read_parquet(caminho_parquet))
+    microdados = registrar('preparar_microdados', lambda: agregacoes.preparar_microdados(bruto))
+    compactos = registrar('compactar_microdados', lambda: agregacoes.compactar_microdados(microdados))
+    memoria = {'antes_mb': agregacoes.memoria_mb(microdados), 'depois_mb': agregacoes.memoria_mb(compactos)}
+    print(f"   {'microdados em memória':<24} {memoria['antes_mb']:>8.1f} MB -> {memoria['depois_mb']:.1f} MB")
+    # O dashboard agrega os microdados compactos
+    microdados = compactos
+    escolas = registrar('estatisticas_escolas', lambda: agregacoes.estatisticas_escolas(microdados))
+    escolas_top_n = registrar(
+        'estatisticas_top_n',
+        lambda: agregacoes.estatisticas_top_n(microdados, agregacoes.TOP_N_PADRAO)
+    )
+    indice = registrar(
+        'indice_filtros',
+        lambda: filtros.IndiceFiltros(escolas, ['CO_ESCOLA', 'DEPENDENCIA_NOME', 'Municipio'], limiar='Participantes')
+    )
+    rng = np.random.default_rng(semente)
+    registrar('resolver_filtros', _resolver_filtros(indice, escolas.index.to_numpy(), rng))
+    indice_busca = registrar('indice_busca', lambda: busca.IndiceBusca(escolas['NOME_ESCOLA']))
+    registrar('buscar', lambda: [indice_busca.buscar(consulta) for consulta in CONSULTAS_BUSCA])
+    histogramas_notas = registrar('histogramas_notas', lambda: histogramas.HistogramasNotas(microdados))
+    distribuicao = registrar('distribuicao_alunos', lambda: histogramas_notas.distribuicao(escolas.index))
+    figuras_prontas = registrar('figuras', lambda: _construir_figuras(escolas, escolas_top_n, distribuicao))
+    # Bytes enviados ao navegador: constante com o número de alunos e limitado pela decimação
+    payload_kb = sum(len(figura.to_json()) for figura in figuras_prontas) / 1024
+    print(f"   {'figuras (JSON)':<24} {payload_kb:>8.0f} KB")
+
+    os.remove(caminho_parquet)
+    return {'linhas': len(bruto), 'escolas': len(escolas), 'memoria_microdados': memoria,
+            'payload_figuras_kb': payload_kb, 'etapas': resultados}
+
+
+def comparar(resultados, linha_de_base, tolerancia):
+    """
+    Lista as etapas mais lentas que a linha de base além da tolerância
+    """
+    regressoes = []
+    for escala, medicao in resultados.items():
+        base = linha_de_base.get(escala)
+        if base is None:
+            continue
+        for etapa, atual in medicao['etapas'].items():
+            anterior = base['etapas'].get(etapa)
+            if anterior is None:
+                continue
+            limite = max(anterior['segundos'] * tolerancia, anterior['segundos'] + TOLERANCIA_ABSOLUTA)
+            if atual['segundos'] > limite:
+                regressoes.append((escala, etapa, anterior['segundos'], atual['segundos']))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', type=float, nargs='+', default=[1, 10],
+                        help="Fatores de escala (1 = RN, ~143 = Brasil)")
+    parser.add_argument('--ano', type=int, default=2024,
+                        help="Esquema dos arquivos sintéticos (2024: 42 colunas; 2022/2023: 76)")
+    parser.add_argument('--repeticoes', type=int, default=3,
+                        help="Repetições por etapa (vale o menor tempo)")
+    parser.add_argument('--linha-de-base', default=LINHA_DE_BASE,
+                        help="Arquivo JSON da linha de base")
+    parser.add_argument('--salvar-linha-de-base', action='store_true',
+                        help="Grava os resultados como nova linha de base")
+    parser.add_argument('--comparar', action='store_true',
+                        help="Compara com a linha de base e falha se houver regressão")
+    parser.add_argument('--tolerancia', type=float, default=1.5,
+                        help="Razão máxima aceita entre o tempo atual e o da linha de base")
+    args = parser.parse_args()
+
+    os.makedirs(DIRETORIO_BENCHMARK, exist_ok=True)
+    resultados = {}
+    for escala in args.escalas:
+        print(f"\n📏 Escala {escala:g}")
+        resultados[f'{escala:g}'] = executar_escala(args.ano, escala, args.repeticoes)
+
+    if args.comparar:
+        try:
+            with open(args.linha_de_base, encoding='utf-8') as arquivo:
+                linha_de_base = json.load(arquivo)
+        except (OSError, ValueError):
+            print(f"❌ Linha de base não encontrada: {args.linha_de_base}", file=sys.stderr)
+            return 1
+        regressoes = comparar(resultados, linha_de_base, args.tolerancia)
+        for escala, etapa, anterior, atual in regressoes:
+            print(f"⚠️  escala {escala}, {etapa}: {anterior:.4f} s -> {atual:.4f} s ({atual / anterior:.2f}x)")
+        if regressoes:
+            return 1
+        print("\n✅ Nenhuma regressão em relação à linha de base")
+
+    if args.salvar_linha_de_base:
+        os.makedirs(os.path.dirname(args.linha_de_base) or '.', exist_ok=True)
+        with open(args.linha_de_base, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+        print(f"\n💾 Linha de base gravada em {args.linha_de_base}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
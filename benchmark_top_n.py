@@ -0,0 +1,96 @@
+"""
+Benchmark da seleção dos N melhores alunos por escola
+
+Compara o laço antigo (uma máscara por escola + nlargest) com a seleção
+vetorizada de agregacoes.selecionar_top_n e mostra como o tempo cresce com o
+número de linhas, até o tamanho nacional (~4 milhões de participantes).
+
+Uso:
+    python benchmark_top_n.py
+    python benchmark_top_n.py --tamanhos 28000 1000000 4000000 --n 10
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import agregacoes
+
+# Proporção aproximada de escolas por participante nos dados reais
+PARTICIPANTES_POR_ESCOLA = 200
+
+# Acima deste tamanho o laço antigo leva tempo demais para valer a comparação
+LIMITE_LACO_ANTIGO = 300_000
+
+
+def gerar_frame(linhas, semente=0):
+    """
+    Gera um DataFrame sintético só com as colunas usadas na seleção
+    """
+    rng = np.random.default_rng(semente)
+    n_escolas = max(1, linhas // PARTICIPANTES_POR_ESCOLA)
+    escolas = rng.integers(0, n_escolas, linhas)
+    nomes = np.array([f"ESCOLA {i:06d}" for i in range(n_escolas)], dtype=object)
+    return pd.DataFrame({
+        'NOME_ESCOLA': nomes[escolas],
+        'SCORE_FINAL': rng.normal(520, 80, linhas).round(2),
+    })
+
+
+def top_n_laco(df, n):
+    """
+    Implementação anterior: uma máscara sobre o DataFrame inteiro por escola
+    """
+    partes = []
+    for escola in df['NOME_ESCOLA'].unique():
+        partes.append(df[df['NOME_ESCOLA'] == escola].nlargest(n, 'SCORE_FINAL'))
+    return pd.concat(partes)
+
+
+def cronometrar(funcao, *args, repeticoes=3):
+    """
+    Retorna o menor tempo (em segundos) entre as repetições
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(*args)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', type=int, nargs='+',
+                        default=[28_000, 250_000, 1_000_000, 4_000_000],
+                        help="Números de linhas a testar")
+    parser.add_argument('--n', type=int, default=agregacoes.TOP_N_PADRAO,
+                        help="Alunos por escola")
+    args = parser.parse_args()
+
+    print(f"{'Linhas':>12} {'Escolas':>9} {'Vetorizado (s)':>15} {'ns/linha':>9} {'Laço (s)':>10} {'Ganho':>7}")
+    custos = []
+    for linhas in args.tamanhos:
+        df = gerar_frame(linhas)
+        n_escolas = df['NOME_ESCOLA'].nunique()
+
+        tempo_vetorizado = cronometrar(agregacoes.selecionar_top_n, df, args.n)
+        custo = tempo_vetorizado / linhas * 1e9
+        custos.append(custo)
+
+        if linhas <= LIMITE_LACO_ANTIGO:
+            tempo_laco = cronometrar(top_n_laco, df, args.n, repeticoes=1)
+            coluna_laco = f"{tempo_laco:>10.3f} {tempo_laco / tempo_vetorizado:>6.0f}x"
+        else:
+            coluna_laco = f"{'-':>10} {'-':>7}"
+
+        print(f"{linhas:>12,} {n_escolas:>9,} {tempo_vetorizado:>15.3f} {custo:>9.0f} {coluna_laco}")
+
+    # Com custo linear, o tempo por linha fica aproximadamente constante
+    if len(custos) > 1:
+        print(f"\nVariação do custo por linha (maior/menor): {max(custos) / min(custos):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
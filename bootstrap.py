@@ -0,0 +1,153 @@
+"""
+Intervalos de confiança por bootstrap para a média e a classificação das escolas
+
+A reamostragem é feita em lote: os alunos ficam ordenados por escola e, para
+um bloco de escolas, cada réplica sorteia uma matriz de índices (réplicas x
+alunos do bloco) dentro do intervalo de cada escola; as médias saem de uma
+redução segmentada (`np.add.reduceat`) ao longo das linhas. Não há laço por
+escola, e os blocos podem ser distribuídos por um pool de processos.
+Os processos são criados por um servidor próprio ('forkserver', ou 'spawn'
+onde ele não existe), e não por fork do processo atual: o bootstrap roda em
+threads do dashboard e do serviço de agregados, e um fork no meio de outras
+threads pode herdar travas ocupadas. Cada processo recebe só as notas e os
+tamanhos do seu bloco.
+
+Cada bloco usa uma semente derivada da semente geral e da sua posição, de modo
+que o resultado não depende do número de processos. A classificação de cada
+réplica é calculada sobre todas as escolas, e seus percentis formam o
+intervalo da classificação.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+REPLICACOES = 1000
+NIVEL = 0.95
+
+# Alunos por bloco de escolas e elementos por matriz de índices (limitam a memória)
+ALUNOS_POR_BLOCO = 50_000
+MAXIMO_ELEMENTOS = 8_000_000
+
+# A partir deste número de alunos os blocos são distribuídos entre processos
+LIMIAR_PARALELO = 500_000
+
+# Início dos processos do pool (sem fork de um processo com várias threads)
+METODO_PROCESSOS = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+COLUNAS = ['IC_Inferior', 'IC_Superior', 'Classificacao_Min', 'Classificacao_Max']
+
+
+def medias_bootstrap(valores, tamanhos, replicacoes, semente):
+    """
+    Médias de `replicacoes` reamostragens de cada escola, em float32.
+
+    `valores` traz as notas ordenadas por escola e `tamanhos` o número de
+    alunos de cada uma; o resultado tem forma (réplicas, escolas).
+    """
+    tamanhos = np.asarray(tamanhos, dtype=np.int64)
+    inicios = np.r_[0, np.cumsum(tamanhos)[:-1]]
+    base = np.repeat(inicios, tamanhos)
+    limites = np.repeat(tamanhos, tamanhos)
+    rng = np.random.default_rng(semente)
+
+    medias = np.empty((replicacoes, len(tamanhos)), dtype=np.float32)
+    por_lote = max(1, MAXIMO_ELEMENTOS // max(len(valores), 1))
+    for inicio in range(0, replicacoes, por_lote):
+        fim = min(inicio + por_lote, replicacoes)
+        # Índice sorteado de cada posição: início da escola + inteiro em [0, n)
+        # (uniforme em [0, 1) vezes n, truncado: mais rápido que integers com limites variáveis)
+        sorteios = rng.random((fim - inicio, len(valores)))
+        sorteios *= limites
+        indices = base + sorteios.astype(np.int64)
+        medias[inicio:fim] = np.add.reduceat(valores[indices], inicios, axis=1) / tamanhos
+    return medias
+
+
+def _blocos(tamanhos, alunos_por_bloco=ALUNOS_POR_BLOCO):
+    """
+    Fatias de escolas consecutivas com cerca de `alunos_por_bloco` alunos
+    """
+    acumulado = np.cumsum(tamanhos)
+    cortes = np.searchsorted(acumulado, np.arange(alunos_por_bloco, acumulado[-1], alunos_por_bloco), side='right')
+    limites = np.unique(np.r_[0, cortes, len(tamanhos)])
+    return list(zip(limites[:-1], limites[1:]))
+
+
+def _classificacoes(medias):
+    """
+    Classificação (1 = maior média) de cada escola em cada réplica
+    """
+    classificacoes = np.empty(medias.shape, dtype=np.int32)
+    posicoes = np.arange(1, medias.shape[1] + 1, dtype=np.int32)
+    passo = max(1, MAXIMO_ELEMENTOS // max(medias.shape[1], 1))
+    for inicio in range(0, medias.shape[0], passo):
+        ordem = np.argsort(-medias[inicio:inicio + passo], axis=1, kind='stable')
+        np.put_along_axis(classificacoes[inicio:inicio + passo], ordem, posicoes, axis=1)
+    return classificacoes
+
+
+def intervalos(valores, codigos, quantidade, replicacoes=REPLICACOES, nivel=NIVEL, semente=0, processos=None):
+    """
+    Intervalos de confiança da média e da classificação de cada escola.
+
+    `codigos` indica a escola (0 a quantidade - 1) de cada valor; escolas sem
+    alunos ficam com intervalos nulos. Com `processos=None`, usa um pool de
+    processos só a partir de LIMIAR_PARALELO alunos.
+    """
+    valores = np.asarray(valores, dtype=float)
+    codigos = np.asarray(codigos, dtype=np.int64)
+    validos = (codigos >= 0) & ~np.isnan(valores)
+    ordem = np.argsort(codigos[validos], kind='stable')
+    valores_ordenados = valores[validos][ordem]
+    tamanhos_todos = np.bincount(codigos[validos], minlength=quantidade)
+    com_alunos = np.flatnonzero(tamanhos_todos)
+    tamanhos = tamanhos_todos[com_alunos]
+
+    resultado = pd.DataFrame(np.nan, index=np.arange(quantidade), columns=COLUNAS)
+    if len(tamanhos) == 0:
+        return resultado
+
+    blocos = _blocos(tamanhos)
+    inicios = np.r_[0, np.cumsum(tamanhos)]
+    sementes = np.random.SeedSequence(semente).spawn(len(blocos))
+    tarefas = [
+        (valores_ordenados[inicios[primeira]:inicios[ultima]], tamanhos[primeira:ultima], replicacoes, semente_bloco)
+        for (primeira, ultima), semente_bloco in zip(blocos, sementes)
+    ]
+
+    if processos is None:
+        processos = os.cpu_count() if len(valores_ordenados) >= LIMIAR_PARALELO else 1
+    if processos > 1 and len(tarefas) > 1:
+        contexto = multiprocessing.get_context(METODO_PROCESSOS)
+        with ProcessPoolExecutor(max_workers=min(processos, len(tarefas)), mp_context=contexto) as executor:
+            partes = list(executor.map(medias_bootstrap, *zip(*tarefas)))
+    else:
+        partes = [medias_bootstrap(*tarefa) for tarefa in tarefas]
+    medias = np.concatenate(partes, axis=1)
+
+    alfa = (1 - nivel) / 2
+    limites_media = np.quantile(medias, [alfa, 1 - alfa], axis=0)
+    limites_classificacao = np.quantile(_classificacoes(medias), [alfa, 1 - alfa], axis=0, method='nearest')
+
+    resultado.loc[com_alunos, 'IC_Inferior'] = np.round(limites_media[0], 1)
+    resultado.loc[com_alunos, 'IC_Superior'] = np.round(limites_media[1], 1)
+    resultado.loc[com_alunos, 'Classificacao_Min'] = limites_classificacao[0]
+    resultado.loc[com_alunos, 'Classificacao_Max'] = limites_classificacao[1]
+    return resultado.astype({'Classificacao_Min': 'Int64', 'Classificacao_Max': 'Int64'})
+
+
+def intervalos_escolas(microdados, escolas, coluna='SCORE_FINAL', **opcoes):
+    """
+    Intervalos das escolas da tabela (indexada por CO_ESCOLA) a partir dos
+    alunos; o resultado é indexado por CO_ESCOLA para `escolas.join`
+    """
+    codigos_escolas = escolas.index.unique()
+    codigos = codigos_escolas.get_indexer(microdados['CO_ESCOLA'])
+    # Notas com até duas casas: o arredondamento desfaz a conversão de float32 dos microdados compactos
+    valores = np.round(microdados[coluna].to_numpy(dtype=float, na_value=np.nan), 2)
+    resultado = intervalos(valores, codigos, len(codigos_escolas), **opcoes)
+    resultado.index = codigos_escolas
+    return resultado
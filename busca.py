@@ -0,0 +1,158 @@
+"""
+Índice de busca por nome de escola, sem diferenciar acentos e maiúsculas
+
+Os nomes são normalizados uma vez (NFKD, sem acentos, casefold) e cada um é
+quebrado em trigramas; o índice guarda, para cada trigrama, as posições das
+linhas que o contêm. Uma consulta intersecta as listas dos seus trigramas e só
+confere por substring os poucos candidatos que sobram, em vez de varrer a
+tabela inteira com regex a cada tecla. Consultas com menos de três letras usam
+um array ordenado de palavras e buscam por prefixo.
+"""
+import difflib
+import unicodedata
+
+import numpy as np
+
+
+def normalizar(texto):
+    """
+    Remove acentos, converte para minúsculas (casefold) e colapsa espaços
+    """
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.casefold().split())
+
+
+def trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceBusca:
+    """
+    Busca por prefixo e substring com ranking e limite de resultados
+    """
+
+    def __init__(self, nomes):
+        self.nomes = [str(nome) for nome in nomes]
+        self.normalizados = [normalizar(nome) for nome in self.nomes]
+
+        postings = {}
+        for posicao, nome in enumerate(self.normalizados):
+            for trigrama in trigramas(nome):
+                postings.setdefault(trigrama, []).append(posicao)
+        self._postings = {t: np.array(p, dtype=np.int32) for t, p in postings.items()}
+
+        # Palavras ordenadas para consultas curtas (prefixo via searchsorted)
+        pares = sorted(
+            (palavra, posicao)
+            for posicao, nome in enumerate(self.normalizados)
+            for palavra in set(nome.split())
+        )
+        self._palavras = np.array([palavra for palavra, _ in pares], dtype=object)
+        self._posicoes_palavras = np.array([posicao for _, posicao in pares], dtype=np.int32)
+
+    def _candidatos(self, consulta):
+        """
+        Posições que podem conter a consulta
+        """
+        if len(consulta) < 3:
+            # Curta demais para trigramas: nomes com alguma palavra começando pela consulta
+            inicio = np.searchsorted(self._palavras, consulta, side='left')
+            fim = np.searchsorted(self._palavras, consulta + '\uffff', side='left')
+            return np.unique(self._posicoes_palavras[inicio:fim])
+
+        listas = []
+        for trigrama in trigramas(consulta):
+            lista = self._postings.get(trigrama)
+            if lista is None:
+                return np.empty(0, dtype=np.int32)
+            listas.append(lista)
+        listas.sort(key=len)
+        candidatos = listas[0]
+        for lista in listas[1:]:
+            candidatos = np.intersect1d(candidatos, lista, assume_unique=True)
+        return candidatos
+
+    def buscar(self, consulta, limite=50, permitidas=None):
+        """
+        Retorna as posições dos nomes que contêm a consulta, das melhores para as piores.
+
+        A ordem é: nome igual à consulta, nome começando pela consulta, palavra
+        começando pela consulta e, por fim, qualquer ocorrência; empates ficam
+        com a ocorrência mais à esquerda e o nome mais curto. `permitidas`
+        restringe o resultado a um conjunto de posições (por exemplo, as linhas
+        que passaram pelos filtros da barra lateral).
+        """
+        consulta = normalizar(consulta)
+        if not consulta:
+            return np.empty(0, dtype=np.int32)
+
+        candidatos = self._candidatos(consulta)
+        if permitidas is not None:
+            candidatos = candidatos[np.isin(candidatos, permitidas)]
+
+        encontrados = []
+        for posicao in candidatos:
+            nome = self.normalizados[posicao]
+            onde = nome.find(consulta)
+            if onde < 0:
+                continue
+            if nome == consulta:
+                classe = 0
+            elif onde == 0:
+                classe = 1
+            elif nome[onde - 1] == ' ':
+                classe = 2
+            else:
+                classe = 3
+            encontrados.append((classe, onde, len(nome), int(posicao)))
+
+        encontrados.sort()
+        return np.array([posicao for *_, posicao in encontrados[:limite]], dtype=np.int32)
+
+    def sugerir(self, consulta, limite=3, corte=0.6, permitidas=None):
+        """
+        Sugestões do tipo "você quis dizer" para consultas sem resultado.
+
+        Os nomes que mais compartilham trigramas com a consulta são comparados
+        com difflib, palavra a palavra, e os mais parecidos são devolvidos.
+        """
+        consulta = normalizar(consulta)
+        listas = [self._postings[t] for t in trigramas(consulta) if t in self._postings]
+        if not listas:
+            return []
+
+        contagem = np.bincount(np.concatenate(listas), minlength=len(self.nomes))
+        if permitidas is not None:
+            fora = np.ones(len(contagem), dtype=bool)
+            fora[permitidas] = False
+            contagem[fora] = 0
+        finalistas = np.argsort(-contagem, kind='stable')[:50]
+
+        pontuados = []
+        for posicao in finalistas:
+            if contagem[posicao] == 0:
+                break
+            nome = self.normalizados[posicao]
+            semelhanca = max(
+                difflib.SequenceMatcher(None, consulta, trecho).ratio()
+                for trecho in [nome] + _janelas(nome, len(consulta.split()))
+            )
+            if semelhanca >= corte:
+                pontuados.append((-semelhanca, self.nomes[posicao]))
+
+        sugestoes = []
+        for _, nome in sorted(pontuados):
+            if nome not in sugestoes:
+                sugestoes.append(nome)
+            if len(sugestoes) == limite:
+                break
+        return sugestoes
+
+
+def _janelas(nome, tamanho):
+    """
+    Sequências de `tamanho` palavras consecutivas do nome
+    """
+    palavras = nome.split()
+    return [' '.join(palavras[i:i + tamanho]) for i in range(len(palavras) - tamanho + 1)]
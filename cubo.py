@@ -0,0 +1,155 @@
+"""
+Cubo de agregados estado -> município -> dependência -> escola
+
+Montado em uma única passagem pelos alunos: para cada escola (grupo de
+CHAVES_ESCOLA) guarda, por nota, a contagem, a soma e a soma dos quadrados em
+centésimos de ponto (inteiros, como em `agregacoes.somas_por_escola`), de modo
+que médias e variâncias de qualquer conjunto de escolas se combinam de forma
+exata e ponderada pelos alunos.
+
+As escolas de cada célula município x dependência (e da linha "todos os
+municípios") ficam ordenadas por número de participantes, com somas
+acumuladas; uma consulta com mínimo de participantes é uma busca binária e
+uma subtração por célula, independente do número de alunos e de escolas.
+"""
+import numpy as np
+import pandas as pd
+
+import agregacoes
+
+# Medidas guardadas por nota
+MEDIDAS = ['alunos', 'soma', 'soma_quadrados']
+
+# Colunas do resumo de `consultar` e das linhas de `detalhar`
+COLUNAS_RESUMO = ['escolas', 'alunos', 'media', 'desvio']
+
+
+class CuboDesempenho:
+    """
+    Contagem, soma e soma dos quadrados das notas por escola, município e
+    dependência
+    """
+
+    def __init__(self, microdados):
+        grupos = microdados.groupby(agregacoes.CHAVES_ESCOLA, sort=True, observed=True).ngroup().to_numpy()
+        validos = grupos >= 0
+        ordem = np.argsort(grupos[validos], kind='stable')
+        grupos_ordenados = grupos[validos][ordem]
+        inicios = np.flatnonzero(np.r_[True, grupos_ordenados[1:] != grupos_ordenados[:-1]])
+
+        # Escolas (uma linha por grupo), na ordem do groupby
+        chaves = microdados.loc[validos, agregacoes.CHAVES_ESCOLA].iloc[ordem[inicios]]
+        self.escolas = chaves.astype(agregacoes.TIPOS_CHAVES).rename(
+            columns={'NO_MUNICIPIO_ESC': 'Municipio'}
+        ).reset_index(drop=True)
+
+        # Somas inteiras por escola: (medida, nota, escola)
+        self.notas = list(agregacoes.COLUNAS_MEDIAS)
+        totais = np.zeros((len(MEDIDAS), len(self.notas), len(self.escolas)), dtype=np.int64)
+        for posicao, nota in enumerate(self.notas):
+            valores = microdados.loc[validos, nota].to_numpy(dtype=float, na_value=np.nan)[ordem]
+            presentes = ~np.isnan(valores)
+            centesimos = np.where(presentes, np.rint(valores * agregacoes.ESCALA_NOTAS), 0).astype(np.int64)
+            totais[0, posicao] = np.add.reduceat(presentes.astype(np.int64), inicios)
+            totais[1, posicao] = np.add.reduceat(centesimos, inicios)
+            totais[2, posicao] = np.add.reduceat(centesimos * centesimos, inicios)
+        self._totais_escola = totais
+        participantes = totais[0, self.notas.index('SCORE_FINAL')]
+        self.escolas['Participantes'] = participantes
+
+        self.municipios = sorted(self.escolas['Municipio'].unique())
+        self.dependencias = [nome for nome in agregacoes.DEPENDENCIAS.values()
+                             if nome in set(self.escolas['DEPENDENCIA_NOME'])]
+        self._posicao_municipio = {nome: posicao for posicao, nome in enumerate(self.municipios)}
+        self._posicao_dependencia = {nome: posicao for posicao, nome in enumerate(self.dependencias)}
+        municipio = self.escolas['Municipio'].map(self._posicao_municipio).to_numpy()
+        dependencia = self.escolas['DEPENDENCIA_NOME'].map(self._posicao_dependencia).to_numpy()
+
+        # Cada escola entra na célula do seu município e na linha "todos" (índice len(municipios))
+        quantidade_dependencias = len(self.dependencias)
+        celulas = np.r_[municipio * quantidade_dependencias + dependencia,
+                        len(self.municipios) * quantidade_dependencias + dependencia]
+        escolas_celulas = np.r_[np.arange(len(self.escolas)), np.arange(len(self.escolas))]
+        ordem_celulas = np.lexsort((-participantes[escolas_celulas], celulas))
+
+        self._escolas_celulas = escolas_celulas[ordem_celulas]
+        self._participantes_negativos = -participantes[self._escolas_celulas]
+        self._limites = np.searchsorted(
+            celulas[ordem_celulas], np.arange((len(self.municipios) + 1) * quantidade_dependencias + 1)
+        )
+        acumulados = np.cumsum(totais[:, :, self._escolas_celulas], axis=2)
+        self._acumulados = np.concatenate(
+            [np.zeros(acumulados.shape[:2] + (1,), dtype=np.int64), acumulados], axis=2
+        )
+        self._por_codigo = pd.Series(np.arange(len(self.escolas)), index=self.escolas['CO_ESCOLA'])
+
+    def _celula(self, municipio, dependencia):
+        linha = len(self.municipios) if municipio is None else self._posicao_municipio[municipio]
+        return linha * len(self.dependencias) + self._posicao_dependencia[dependencia]
+
+    def _somar(self, municipios, dependencias, minimo):
+        """
+        Totais (medida, nota) e número de escolas das células selecionadas
+        """
+        totais = np.zeros((len(MEDIDAS), len(self.notas)), dtype=np.int64)
+        escolas = 0
+        for municipio in (municipios if municipios is not None else [None]):
+            if municipio is not None and municipio not in self._posicao_municipio:
+                continue
+            for dependencia in (dependencias if dependencias is not None else self.dependencias):
+                if dependencia not in self._posicao_dependencia:
+                    continue
+                celula = self._celula(municipio, dependencia)
+                inicio, fim = self._limites[celula], self._limites[celula + 1]
+                # Escolas da célula com pelo menos `minimo` participantes: prefixo da ordem
+                quantidade = np.searchsorted(self._participantes_negativos[inicio:fim], -minimo, side='right')
+                totais += self._acumulados[:, :, inicio + quantidade] - self._acumulados[:, :, inicio]
+                escolas += int(quantidade)
+        return totais, escolas
+
+    def _resumo(self, totais, escolas, nota):
+        alunos, soma, soma_quadrados = (int(valor) for valor in totais[:, self.notas.index(nota)])
+        escala = agregacoes.ESCALA_NOTAS
+        media = soma / alunos / escala if alunos else np.nan
+        if alunos > 1:
+            # Variância amostral com as somas inteiras exatas
+            variancia = (soma_quadrados * alunos - soma * soma) / (alunos * (alunos - 1)) / escala ** 2
+            desvio = float(np.sqrt(max(variancia, 0.0)))
+        else:
+            desvio = np.nan
+        return {'escolas': escolas, 'alunos': alunos, 'media': media, 'desvio': desvio}
+
+    def consultar(self, municipios=None, dependencias=None, minimo=1, nota='SCORE_FINAL'):
+        """
+        Escolas, alunos, média e desvio padrão (por aluno) da nota nas escolas
+        dos municípios e dependências (todos, se None) com pelo menos
+        `minimo` participantes. Listas vazias não restringem, como nos
+        filtros da barra lateral (`filtros.IndiceFiltros.resolver`).
+        """
+        totais, escolas = self._somar(municipios or None, dependencias or None, minimo)
+        return self._resumo(totais, escolas, nota)
+
+    def consultar_escolas(self, codigos, nota='SCORE_FINAL'):
+        """
+        Mesmo resumo de `consultar` para escolas escolhidas por CO_ESCOLA
+        """
+        posicoes = self._por_codigo.reindex(codigos).dropna().astype(np.int64).to_numpy()
+        totais = self._totais_escola[:, :, posicoes].sum(axis=2)
+        return self._resumo(totais, len(posicoes), nota)
+
+    def detalhar(self, municipio=None, dependencias=None, minimo=1, nota='SCORE_FINAL'):
+        """
+        Próximo nível da hierarquia: um resumo por município (sem município
+        escolhido) ou por dependência (dentro do município)
+        """
+        dependencias = list(dependencias) if dependencias else self.dependencias
+        if municipio is None:
+            linhas = {nome: self.consultar([nome], dependencias, minimo, nota) for nome in self.municipios}
+            nivel = 'Município'
+        else:
+            linhas = {nome: self.consultar([municipio], [nome], minimo, nota) for nome in dependencias}
+            nivel = 'Dependência'
+        if not linhas:
+            return pd.DataFrame(columns=[nivel] + COLUNAS_RESUMO)
+        tabela = pd.DataFrame.from_dict(linhas, orient='index', columns=COLUNAS_RESUMO).rename_axis(nivel).reset_index()
+        return tabela[tabela['alunos'] > 0].reset_index(drop=True)
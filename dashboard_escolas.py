@@ -1,193 +1,523 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import numpy as np
+
+import agregacoes
+import api_agregados
+import backends
+import bootstrap
+import busca
+import cubo
+import exportacao
+import figuras
+import filtros
+import histogramas
+import ingestao
+import instrumentacao
+import materializar
+import paginacao
+import percentis
+import regressao
+import segundo_plano
+import socioeconomico
+import trajetorias
+import validar_dados_rn
 
 # Configuração da página
 st.set_page_config(
-    page_title="Dashboard ENEM 2024 - Escolas do RN",
+    page_title="Dashboard ENEM - Escolas do RN",
     page_icon="📊",
     layout="wide",
     initial_sidebar_state="expanded"
 )
 
-@st.cache_data
-def carregar_dados():
+@st.cache_resource
+def tarefas_segundo_plano():
     """
-    Carrega e processa os dados do ENEM 2024
+    Pool de tarefas em segundo plano compartilhado entre as sessões: cargas e
+    agregações pesadas rodam ao mesmo tempo, e cada resultado fica registrado
+    pela chave da tarefa
     """
-    try:
-        # Carrega os dados
-        df = pd.read_csv('data-raw/RESULTADOS_2024_RN.csv', sep=';', encoding='latin-1')
-        
-        # Filtra apenas registros com nome da escola e scores válidos
-        df_clean = df.dropna(subset=['NOME_ESCOLA', 'SCORE_FINAL'])
-        
-        # Mapear dependência administrativa para nomes legíveis
-        dep_map = {
-            1: 'Federal',
-            2: 'Estadual', 
-            3: 'Municipal',
-            4: 'Privada'
-        }
-        df_clean = df_clean.copy()  # Criar cópia explícita para evitar warning
-        df_clean['DEPENDENCIA_NOME'] = df_clean['TP_DEPENDENCIA_ADM_ESC'].map(dep_map)
-        
-        # Agrupa por escola
-        escola_stats = df_clean.groupby(['NOME_ESCOLA', 'NO_MUNICIPIO_ESC', 'TP_DEPENDENCIA_ADM_ESC', 'DEPENDENCIA_NOME']).agg({
-            'NU_NOTA_CN': 'mean',
-            'NU_NOTA_CH': 'mean', 
-            'NU_NOTA_LC': 'mean',
-            'NU_NOTA_MT': 'mean',
-            'NU_NOTA_REDACAO': 'mean',
-            'SCORE_OBJETIVA': 'mean',
-            'SCORE_FINAL': 'mean',
-            'CO_ESCOLA': 'count'
-        }).round(1).reset_index()
-        
-        # Renomeia as colunas
-        escola_stats.columns = ['NOME_ESCOLA', 'Municipio', 'TP_DEPENDENCIA_ADM_ESC', 'DEPENDENCIA_NOME', 
-                               'Nota_CN', 'Nota_CH', 'Nota_LC', 'Nota_MT', 'Nota_Redacao', 
-                               'SCORE_OBJETIVA', 'SCORE_FINAL', 'Participantes']
-        
-        # Filtra escolas com pelo menos 10 participantes
-        escola_stats = escola_stats[escola_stats['Participantes'] >= 5]
-        
-        # Renomeia colunas para exibição mais limpa
-        escola_stats = escola_stats.rename(columns={
-            'NU_NOTA_CN': 'Nota_CN',
-            'NU_NOTA_CH': 'Nota_CH',
-            'NU_NOTA_LC': 'Nota_LC', 
-            'NU_NOTA_MT': 'Nota_MT',
-            'NU_NOTA_REDACAO': 'Nota_Redacao',
-            'CO_ESCOLA': 'Participantes'
-        })
-        
-        # Cria classificação baseada no Score Final
-        escola_stats = escola_stats.sort_values('SCORE_FINAL', ascending=False).reset_index(drop=True)
-        escola_stats['Classificacao'] = escola_stats.index + 1
-        
-        # Adiciona categoria de desempenho
-        def categoria_desempenho(score):
-            if score >= 650: return 'Excelente'
-            elif score >= 600: return 'Muito Bom'
-            elif score >= 550: return 'Bom'
-            elif score >= 500: return 'Regular'
-            else: return 'Baixo'
-        
-        escola_stats['Categoria_Desempenho'] = escola_stats['SCORE_FINAL'].apply(categoria_desempenho)
-        
-        return escola_stats
-        
-    except Exception as e:
-        st.error(f"Erro ao carregar dados: {e}")
-        return None
+    return segundo_plano.TarefasSegundoPlano()
+
+def carregar_microdados(ano, versao):
+    """
+    Carrega os microdados de um ano do ENEM uma única vez para todas as agregações
+    (tarefa em segundo plano; a versão dos dados entra na chave da tarefa).
+    
+    O mesmo DataFrame, em tipos compactos, é compartilhado por todas as sessões
+    sem cópia: quem o usa só lê (com o copy-on-write do pandas, tabelas
+    derivadas nunca escrevem nele).
+    """
+    # Lê só a partição do ano e as colunas usadas, sem refazer o parse do CSV
+    df = ingestao.carregar_ano(ano, colunas=agregacoes.COLUNAS_MICRODADOS)
+    
+    # Alunos com escola e score válidos, dependência nomeada e CO_ESCOLA garantido
+    microdados = agregacoes.preparar_microdados(df)
+    with instrumentacao.etapa('compactar_microdados') as registro:
+        registro['antes_mb'] = agregacoes.memoria_mb(microdados)
+        microdados = agregacoes.compactar_microdados(microdados)
+        registro['depois_mb'] = agregacoes.memoria_mb(microdados)
+        registro['linhas'] = len(microdados)
+    return microdados
+
+def microdados_ano(tarefas, ano, versao):
+    """
+    Microdados do ano para as tarefas que dependem deles (carregados uma única vez)
+    """
+    return tarefas.resultado(('microdados', ano, versao), carregar_microdados, ano, versao)
+
+def backend_agregacoes(tarefas, versao):
+    """
+    Backend de consulta definido em ENEM_BACKEND; o pandas reaproveita os
+    microdados já carregados, os demais leem a partição Parquet diretamente
+    """
+    nome = backends.backend_configurado()
+    if nome == 'pandas':
+        return backends.BackendPandas(carregar_microdados=lambda ano: microdados_ano(tarefas, ano, versao))
+    return backends.criar(nome)
+
+def carregar_dados(tarefas, ano, versao):
+    """
+    Carrega e processa os dados do ENEM do ano selecionado (tabela única,
+    compartilhada entre as sessões sem cópia)
+    """
+    # Com ENEM_API_URL, a tabela vem do serviço de agregados (um cálculo para todos os processos)
+    url_api = api_agregados.url_configurada()
+    if url_api:
+        return api_agregados.cliente(url_api).escolas(ano)
+    
+    # Tabela pré-calculada por materializar.py (lida por memory-map, sem refazer o groupby)
+    escolas = materializar.carregar_tabela(ano, versao, 'escolas')
+    if escolas is not None:
+        return escolas
+    
+    # Agrupa por escola, mantendo escolas com pelo menos 5 participantes
+    backend = backend_agregacoes(tarefas, versao)
+    return backend.estatisticas_escolas(ano, min_participantes=materializar.MIN_PARTICIPANTES)
+
+def carregar_dados_top_n(tarefas, ano, versao, n):
+    """
+    Carrega e processa os dados considerando apenas os N melhores alunos por escola
+    (cada combinação de ano e N é uma tarefa própria)
+    """
+    url_api = api_agregados.url_configurada()
+    if url_api:
+        return api_agregados.cliente(url_api).top_n(ano, n)
+    
+    # N materializados offline não precisam dos microdados
+    escolas_top_n = materializar.carregar_tabela(ano, versao, f'top{n}')
+    if escolas_top_n is not None:
+        return escolas_top_n
+    
+    # Seleção dos N melhores em uma única ordenação, sem laço por escola
+    # (no pandas, com os mesmos microdados da análise geral)
+    backend = backend_agregacoes(tarefas, versao)
+    return backend.estatisticas_top_n(ano, n, min_alunos=materializar.MIN_ALUNOS_TOP_N)
+
+@instrumentacao.cronometrar(cacheada=True)
+@st.cache_resource
+@instrumentacao.execucao_real
+def indice_filtros(ano, versao, tabela, _df):
+    """
+    Índice de filtros de uma tabela por escola, construído uma vez por dataset
+    (`tabela` identifica a tabela na chave do cache; o DataFrame não é hasheado)
+    """
+    limiar = 'Participantes' if 'Participantes' in _df.columns else None
+    return filtros.IndiceFiltros(_df, ['CO_ESCOLA', 'DEPENDENCIA_NOME', 'Municipio'], limiar=limiar)
+
+# Colunas das tabelas detalhadas -> nomes exibidos
+COLUNAS_TABELA_GERAL = {
+    'Classificacao': 'Classificação', 'NOME_ESCOLA': 'Nome da Escola', 'Municipio': 'Município',
+    'DEPENDENCIA_NOME': 'Dependência', 'Nota_CN': 'CN', 'Nota_CH': 'CH', 'Nota_LC': 'LC',
+    'Nota_MT': 'MT', 'Nota_Redacao': 'Redação', 'SCORE_OBJETIVA': 'Score Objetiva',
+    'SCORE_FINAL': 'Score Final', 'IC_Inferior': 'IC 95% (mín.)', 'IC_Superior': 'IC 95% (máx.)',
+    'Classificacao_Min': 'Classificação (melhor)', 'Classificacao_Max': 'Classificação (pior)',
+    'Participantes': 'Participantes', 'Categoria_Desempenho': 'Categoria'
+}
+COLUNAS_TABELA_TOP_N = {
+    'Classificacao_TopN': 'Classificação Top N', 'NOME_ESCOLA': 'Nome da Escola', 'Municipio': 'Município',
+    'DEPENDENCIA_NOME': 'Dependência', 'Nota_CN': 'CN', 'Nota_CH': 'CH', 'Nota_LC': 'LC',
+    'Nota_MT': 'MT', 'Nota_Redacao': 'Redação', 'SCORE_OBJETIVA': 'Score Objetiva',
+    'SCORE_FINAL': 'Score Final', 'Top_Alunos_Considerados': 'Alunos Top N',
+    'Categoria_Desempenho_TopN': 'Categoria'
+}
+
+@instrumentacao.cronometrar(cacheada=True)
+@st.cache_resource
+@instrumentacao.execucao_real
+def tabela_exibicao(ano, versao, tabela, colunas, _df):
+    """
+    Tabela completa com os nomes de exibição e as ordens das colunas (pré-calculadas
+    sob demanda), montada uma vez por dataset
+    """
+    colunas = dict(colunas)
+    exibicao = _df[list(colunas)].rename(columns=colunas).reset_index(drop=True)
+    return exibicao, paginacao.OrdenacaoTabela(exibicao)
+
+def paginar(ordenacao, colunas, posicoes, chave, relevancia=False):
+    """
+    Controles de ordenação e página; retorna só as posições da página visível
+    """
+    opcoes = (['Relevância da busca'] if relevancia else []) + list(colunas)
+    col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
+    coluna = col1.selectbox("Ordenar por:", opcoes, key=f"{chave}_coluna")
+    sentido = col2.selectbox("Ordem:", ['Crescente', 'Decrescente'], key=f"{chave}_sentido")
+    tamanho = col3.selectbox(
+        "Linhas por página:",
+        paginacao.TAMANHOS_PAGINA,
+        index=paginacao.TAMANHOS_PAGINA.index(paginacao.TAMANHO_PAGINA_PADRAO),
+        key=f"{chave}_tamanho"
+    )
+    paginas = paginacao.total_paginas(len(posicoes), tamanho)
+    # A chave inclui o total de páginas: quando ele muda, a página volta para 1
+    pagina = int(col4.number_input(
+        f"Página (de {paginas}):", min_value=1, max_value=paginas, value=1, step=1,
+        key=f"{chave}_pagina_{paginas}"
+    ))
+    
+    if coluna == 'Relevância da busca':
+        ordenadas = posicoes if sentido == 'Crescente' else posicoes[::-1]
+    else:
+        ordenadas = ordenacao.ordenar(posicoes, coluna, crescente=(sentido == 'Crescente'))
+    
+    visiveis, inicio, fim = paginacao.fatiar(ordenadas, pagina, tamanho)
+    if len(posicoes):
+        st.caption(f"Mostrando {inicio + 1}–{fim} de {len(posicoes)} escolas")
+    return visiveis
+
+@instrumentacao.cronometrar(cacheada=True)
+@st.cache_resource
+@instrumentacao.execucao_real
+def opcoes_escolas(ano, versao, _df):
+    """
+    Códigos das escolas ordenados pelo rótulo exibido no filtro (nome e município)
+    """
+    rotulos = (_df['NOME_ESCOLA'] + ' — ' + _df['Municipio']).to_dict()
+    return sorted(rotulos, key=rotulos.get), rotulos
+
+@instrumentacao.cronometrar(cacheada=True)
+@st.cache_resource
+@instrumentacao.execucao_real
+def indice_busca(ano, versao, tabela, _df):
+    """
+    Índice de busca por nome de escola, construído uma vez por tabela
+    """
+    return busca.IndiceBusca(_df['NOME_ESCOLA'])
 
-@st.cache_data
-def carregar_dados_top10():
+def intervalos_confianca(tarefas, ano, versao, df):
     """
-    Carrega e processa os dados considerando apenas os 10 melhores alunos por escola
+    Intervalos de confiança (bootstrap) do Score Final e da classificação de
+    cada escola, calculados uma vez por versão dos dados
+    """
+    return bootstrap.intervalos_escolas(microdados_ano(tarefas, ano, versao), df)
+
+def percentis_notas(ano, versao):
+    """
+    Notas ordenadas por partição (estado, município, dependência), montadas
+    uma vez por dataset para as consultas de percentil
+    """
+    return percentis.PercentisNotas(percentis.carregar_alunos(ano))
+
+def ler_notas(texto):
+    """
+    Notas digitadas, separadas por espaço ou ponto e vírgula (vírgula decimal
+    aceita); None se alguma não for um número entre 0 e 1000
     """
     try:
-        # Carrega os dados originais
-        df = pd.read_csv('data-raw/RESULTADOS_2024_RN.csv', sep=';', encoding='latin-1')
-        
-        # Filtra apenas registros com nome da escola e scores válidos
-        df_clean = df.dropna(subset=['NOME_ESCOLA', 'SCORE_FINAL'])
-        
-        # Mapeia dependência administrativa
-        dep_map = {
-            1: 'Federal',
-            2: 'Estadual', 
-            3: 'Municipal',
-            4: 'Privada'
-        }
-        df_clean = df_clean.copy()
-        df_clean['DEPENDENCIA_NOME'] = df_clean['TP_DEPENDENCIA_ADM_ESC'].map(dep_map)
-        
-        # Para cada escola, pega apenas os 10 melhores alunos baseado no SCORE_FINAL
-        top10_por_escola = []
-        
-        for escola in df_clean['NOME_ESCOLA'].unique():
-            escola_data = df_clean[df_clean['NOME_ESCOLA'] == escola]
-            # Ordena por SCORE_FINAL decrescente e pega os 10 primeiros
-            top10_escola = escola_data.nlargest(10, 'SCORE_FINAL')
-            top10_por_escola.append(top10_escola)
-        
-        # Concatena todos os top10 de cada escola
-        df_top10 = pd.concat(top10_por_escola, ignore_index=True)
-        
-        # Agrupa por escola (agora com apenas os top 10 alunos de cada)
-        escola_stats_top10 = df_top10.groupby(['NOME_ESCOLA', 'NO_MUNICIPIO_ESC', 'TP_DEPENDENCIA_ADM_ESC', 'DEPENDENCIA_NOME']).agg({
-            'NU_NOTA_CN': 'mean',
-            'NU_NOTA_CH': 'mean', 
-            'NU_NOTA_LC': 'mean',
-            'NU_NOTA_MT': 'mean',
-            'NU_NOTA_REDACAO': 'mean',
-            'SCORE_OBJETIVA': 'mean',
-            'SCORE_FINAL': 'mean',
-            'CO_ESCOLA': 'count'
-        }).round(1).reset_index()
-        
-        # Renomeia as colunas
-        escola_stats_top10.columns = ['NOME_ESCOLA', 'Municipio', 'TP_DEPENDENCIA_ADM_ESC', 'DEPENDENCIA_NOME', 
-                                     'Nota_CN', 'Nota_CH', 'Nota_LC', 'Nota_MT', 'Nota_Redacao', 
-                                     'SCORE_OBJETIVA', 'SCORE_FINAL', 'Top_Alunos_Considerados']
-        
-        # Filtra apenas escolas com pelo menos 3 alunos no top 10 (para ter uma amostra mínima)
-        escola_stats_top10 = escola_stats_top10[escola_stats_top10['Top_Alunos_Considerados'] >= 3]
-        
-        # Cria classificação baseada no Score Final do Top 10
-        escola_stats_top10 = escola_stats_top10.sort_values('SCORE_FINAL', ascending=False).reset_index(drop=True)
-        escola_stats_top10['Classificacao_Top10'] = escola_stats_top10.index + 1
-        
-        # Adiciona categoria de desempenho
-        def categoria_desempenho(score):
-            if score >= 650: return 'Excelente'
-            elif score >= 600: return 'Muito Bom'
-            elif score >= 550: return 'Bom'
-            elif score >= 500: return 'Regular'
-            else: return 'Baixo'
-        
-        escola_stats_top10['Categoria_Desempenho_Top10'] = escola_stats_top10['SCORE_FINAL'].apply(categoria_desempenho)
-        
-        return escola_stats_top10
-        
-    except Exception as e:
-        st.error(f"Erro ao carregar dados top 10: {e}")
+        valores = [float(parte.replace(',', '.')) for parte in texto.replace(';', ' ').split()]
+    except ValueError:
+        return None
+    if not valores or any(not 0 <= valor <= 1000 for valor in valores):
         return None
+    return valores
+
+def cubo_desempenho(tarefas, ano, versao):
+    """
+    Cubo município x dependência x escola montado uma vez por dataset; as
+    métricas e o detalhamento regional são consultas a ele
+    """
+    return cubo.CuboDesempenho(microdados_ano(tarefas, ano, versao))
+
+def histogramas_notas(tarefas, ano, versao):
+    """
+    Alunos por faixa de Score Final em cada escola, contados uma vez por
+    dataset; a distribuição das escolas filtradas é uma soma de linhas
+    """
+    return histogramas.HistogramasNotas(microdados_ano(tarefas, ano, versao))
+
+def trajetorias_escolas(anos):
+    """
+    Tabela longa de trajetórias (uma linha por escola e ano), estendida só
+    com os anos novos ou alterados
+    """
+    tabela, _ = trajetorias.atualizar(list(anos), backend=backends.criar())
+    return tabela
+
+def cruzamentos_socioeconomicos(ano, versao, questoes, df):
+    """
+    Cruzamentos do questionário socioeconômico pré-calculados uma vez por
+    dataset; os detalhamentos são consultas a essas matrizes
+    """
+    respostas = socioeconomico.carregar_respostas(ano, questoes)
+    return socioeconomico.CruzamentosSocioeconomicos(respostas, df, questoes)
+
+def validacao_dados(ano):
+    """
+    Relatório de validação do arquivo do ano; arquivos já validados (mesma
+    versão dos dados) não são relidos
+    """
+    relatorio, _ = validar_dados_rn.validar_ano(ano)
+    return relatorio
+
+# Seções que leem os microdados locais: com ENEM_API_URL o dashboard só recebe
+# as tabelas por escola do serviço e não lê nem prepara os arquivos do ano
+AVISO_MODO_API = ("Indisponível com ENEM_API_URL: esta seção depende dos microdados dos alunos, "
+                  "que o serviço de agregados não envia.")
+
+def falhou(futuro):
+    """
+    Se a tarefa em segundo plano terminou com erro
+    """
+    return futuro.done() and futuro.exception() is not None
+
+def pronta(futuro, nome, aviso, pendentes):
+    """
+    Confere se a tarefa em segundo plano terminou; se não, mostra o aviso no
+    lugar da seção e guarda a tarefa em `pendentes` (a página é refeita
+    quando ela terminar). Se terminou com erro, mostra o erro só no lugar da
+    seção (a tarefa sai do registro e é enviada de novo na próxima execução).
+    Sem tarefa (None: seção que depende dos microdados, no modo API), mostra
+    o aviso de indisponível
+    """
+    if futuro is None:
+        st.info(f"ℹ️ {AVISO_MODO_API}")
+        return False
+    with instrumentacao.etapa(nome, cacheada=True) as registro:
+        if futuro.done():
+            if futuro.exception() is None:
+                return True
+            registro['cache'] = 'erro'
+            st.error(f"❌ Não foi possível concluir esta seção: {futuro.exception()}")
+            return False
+        registro['cache'] = 'pendente'
+    st.info(f"⏳ {aviso}")
+    pendentes.append(futuro)
+    return False
+
+def acompanhar_tarefas(pendentes):
+    """
+    Refaz a página quando alguma tarefa pendente termina. Roda como fragmento
+    com `run_every`: as verificações não refazem o script nem gravam etapas
+    no log de desempenho
+    """
+    if any(futuro.done() for futuro in pendentes):
+        st.session_state['rerun_tarefas'] = True
+        st.rerun(scope='app')
+
+def usar_sugestao(chave, sugestao):
+    st.session_state[chave] = sugestao
+
+def buscar_escolas(indice, consulta, posicoes, chave):
+    """
+    Posições das escolas que casam com a busca, das mais relevantes para as menos
+    (restritas às posições já filtradas); sem resultado, oferece sugestões
+    """
+    encontradas = indice.buscar(consulta, permitidas=posicoes)
+    if len(encontradas) == 0:
+        sugestoes = indice.sugerir(consulta, permitidas=posicoes)
+        if sugestoes:
+            st.caption("Nenhuma escola encontrada. Você quis dizer:")
+            for coluna, sugestao in zip(st.columns(len(sugestoes)), sugestoes):
+                coluna.button(
+                    sugestao,
+                    key=f"{chave}_sugestao_{sugestao}",
+                    on_click=usar_sugestao,
+                    args=(chave, sugestao)
+                )
+    return encontradas
+
+@instrumentacao.cronometrar(cacheada=True)
+@st.cache_data(max_entries=128)
+@instrumentacao.execucao_real
+def calcular_tendencias(chave, _df_filtrado):
+    """
+    Regressão de Score Final por Participantes, cacheada pela chave dos filtros
+    """
+    return regressao.tendencias_participantes(_df_filtrado)
+
+@st.cache_data(max_entries=32)
+def exportar_tabela(chave, formato, _df):
+    """
+    Arquivo de exportação de uma tabela, cacheado pela chave dos filtros e da busca
+    """
+    return exportacao.serializar(_df, formato)
+
+@st.cache_resource
+def cache_figuras():
+    """
+    Cache LRU de figuras compartilhado entre as sessões
+    """
+    return figuras.CacheFiguras(capacidade=64)
+
+def mostrar_figura(cache, chave, construtor, *args):
+    """
+    Obtém a figura do cache (construindo-a se preciso) e a exibe, medindo as duas coisas
+    """
+    with instrumentacao.etapa(f'figura_{chave[0]}', cacheada=True):
+        fig = cache.obter(chave, instrumentacao.execucao_real(construtor), *args)
+        st.plotly_chart(fig, use_container_width=True)
+
+COLUNAS_ETAPAS = {
+    'segundos': st.column_config.NumberColumn("Tempo (s)", format="%.4f"),
+    'memoria_mb': st.column_config.NumberColumn("Memória (MB)", format="%.0f"),
+    'antes_mb': st.column_config.NumberColumn("Tabela antes (MB)", format="%.1f"),
+    'depois_mb': st.column_config.NumberColumn("Tabela depois (MB)", format="%.1f"),
+}
+
+def painel_desempenho(execucao, cache, tarefas):
+    """
+    Painel oculto (?debug=perf) com o tempo de cada etapa desta execução e
+    das tarefas em segundo plano
+    """
+    with st.sidebar.expander("⏱️ Desempenho desta execução", expanded=True):
+        st.metric("Tempo total", f"{execucao.segundos * 1000:.0f} ms")
+        etapas = execucao.resumo()
+        if etapas:
+            st.dataframe(
+                etapas,
+                hide_index=True,
+                column_order=['etapa', 'pai', 'segundos', 'linhas', 'cache', 'memoria_mb'],
+                column_config=COLUNAS_ETAPAS
+            )
+        etapas_tarefas = tarefas.resumo()
+        if etapas_tarefas:
+            st.caption("Tarefas em segundo plano (compartilhadas entre as sessões):")
+            st.dataframe(
+                etapas_tarefas,
+                hide_index=True,
+                column_order=['tarefa', 'estado', 'etapa', 'segundos', 'linhas', 'memoria_mb', 'antes_mb', 'depois_mb'],
+                column_config=COLUNAS_ETAPAS
+            )
+        estatisticas = cache.estatisticas()
+        st.caption(
+            f"Cache de figuras: {estatisticas['acertos']} acertos, {estatisticas['falhas']} falhas, "
+            f"{estatisticas['tamanho']}/{estatisticas['capacidade']} entradas"
+        )
 
 def main():
     """
     Função principal do dashboard
     """
+    # Sidebar para filtros
+    st.sidebar.header("🔧 Filtros")
+    
+    # Com ENEM_API_URL, os anos e as versões dos dados vêm do serviço de
+    # agregados; sem ele, só o ano escolhido é lido do dataset particionado
+    url_api = api_agregados.url_configurada()
+    if url_api:
+        try:
+            versoes_api = {linha['ano']: linha['versao'] for linha in api_agregados.cliente(url_api).anos()}
+        except Exception as e:
+            st.error(f"Erro ao consultar o serviço de agregados ({url_api}): {e}")
+            return
+        anos_disponiveis = sorted(versoes_api)
+    else:
+        anos_disponiveis = ingestao.anos_disponiveis()
+    if not anos_disponiveis:
+        st.error("Nenhum arquivo de resultados encontrado em data-raw/.")
+        return
+    ano = st.sidebar.selectbox(
+        "Ano:",
+        anos_disponiveis,
+        index=len(anos_disponiveis) - 1,
+        help="Ano do ENEM analisado"
+    )
+    
+    # Quantidade de melhores alunos por escola no ranking Top N
+    opcoes_top_n = [f"Top {n}" for n in agregacoes.OPCOES_TOP_N] + ['Personalizado']
+    opcao_top_n = st.sidebar.selectbox(
+        "Melhores alunos por escola:",
+        opcoes_top_n,
+        index=agregacoes.OPCOES_TOP_N.index(agregacoes.TOP_N_PADRAO),
+        help="Quantos alunos de cada escola entram no ranking Top N"
+    )
+    if opcao_top_n == 'Personalizado':
+        top_n = int(st.sidebar.number_input(
+            "N (alunos por escola):",
+            min_value=1,
+            max_value=100,
+            value=agregacoes.TOP_N_PADRAO,
+            step=1
+        ))
+    else:
+        top_n = int(opcao_top_n.split()[1])
+    
     # Título principal
-    st.title("📊 Dashboard ENEM 2024 - Escolas do Rio Grande do Norte")
+    st.title(f"📊 Dashboard ENEM {ano} - Escolas do Rio Grande do Norte")
     st.markdown("---")
     
     # Carrega dados
     with st.spinner("Carregando dados..."):
-        df = carregar_dados()
+        if url_api:
+            versao = versoes_api[ano]
+        else:
+            try:
+                with instrumentacao.etapa('preparar_ano'):
+                    versao = ingestao.preparar_ano(ano)
+            except Exception as e:
+                st.error(f"Erro ao preparar os dados de {ano}: {e}")
+                return
+        
+        # Cargas independentes começam juntas em segundo plano; cada seção é
+        # desenhada assim que os seus dados ficam prontos (aviso até lá). No
+        # modo API as tarefas sobre os microdados não são enviadas (None)
+        tarefas = tarefas_segundo_plano()
+        pendentes = []
+        futuro_top_n = tarefas.enviar(('top_n', ano, versao, top_n), carregar_dados_top_n, tarefas, ano, versao, top_n)
+        futuro_cubo = futuro_validacao = None
+        if not url_api:
+            futuro_cubo = tarefas.enviar(('cubo', ano, versao), cubo_desempenho, tarefas, ano, versao)
+            futuro_validacao = tarefas.enviar(('validacao', ano, versao), validacao_dados, ano)
+        
+        # Os filtros da barra lateral dependem da tabela geral: calculada aqui
+        # mesmo, se nenhuma outra sessão já a estiver calculando
+        try:
+            with instrumentacao.etapa('escolas'):
+                df = tarefas.resultado(('escolas', ano, versao), carregar_dados, tarefas, ano, versao)
+        except Exception as e:
+            st.error(f"Erro ao carregar os dados: {e}. Verifique se o arquivo está no local correto.")
+            return
     
-    if df is None:
-        st.error("Erro ao carregar os dados. Verifique se o arquivo está no local correto.")
-        return
+    futuro_intervalos = futuro_percentis = futuro_histogramas = futuro_cruzamentos = None
+    questoes = [] if url_api else socioeconomico.questoes_disponiveis(ano)
+    if not url_api:
+        futuro_intervalos = tarefas.enviar(('intervalos', ano, versao), intervalos_confianca, tarefas, ano, versao, df)
+        futuro_percentis = tarefas.enviar(('percentis', ano, versao), percentis_notas, ano, versao)
+        futuro_histogramas = tarefas.enviar(('histogramas', ano, versao), histogramas_notas, tarefas, ano, versao)
+    if questoes:
+        futuro_cruzamentos = tarefas.enviar(
+            ('cruzamentos', ano, versao), cruzamentos_socioeconomicos, ano, versao, questoes, df
+        )
     
-    # Sidebar para filtros
-    st.sidebar.header("🔧 Filtros")
+    # Incerteza da média e da classificação (escolas pequenas têm intervalos largos),
+    # acrescentada quando o bootstrap termina
+    if futuro_intervalos is not None and futuro_intervalos.done() and not falhou(futuro_intervalos):
+        df = df.join(futuro_intervalos.result())
+    
+    # Índice construído uma vez por dataset; os filtros viram interseções de posições
+    indice = indice_filtros(ano, versao, 'geral', df)
     
     # Filtro por escola
-    escolas_disponiveis = ['Todas'] + sorted(df['NOME_ESCOLA'].unique().tolist())
+    codigos_escolas, rotulos_escolas = opcoes_escolas(ano, versao, df)
+    escolas_disponiveis = ['Todas'] + codigos_escolas
     escola_selecionada = st.sidebar.selectbox(
         "Selecione uma escola:",
         escolas_disponiveis,
+        format_func=lambda codigo: rotulos_escolas.get(codigo, codigo),
         help="Filtrar por uma escola específica"
     )
     
     # Filtro por dependência administrativa
-    dependencias_disponiveis = sorted(df['DEPENDENCIA_NOME'].unique().tolist())
+    dependencias_disponiveis = indice.valores('DEPENDENCIA_NOME')
     dependencia_selecionada = st.sidebar.multiselect(
         "Dependência Administrativa:",
         dependencias_disponiveis,
@@ -196,7 +526,7 @@ def main():
     )
     
     # Filtro por município
-    municipios_disponiveis = ['Todos'] + sorted(df['Municipio'].unique().tolist())
+    municipios_disponiveis = ['Todos'] + indice.valores('Municipio')
     municipio_selecionado = st.sidebar.selectbox(
         "Município:",
         municipios_disponiveis,
@@ -207,24 +537,53 @@ def main():
     min_participantes = st.sidebar.slider(
         "Mínimo de Participantes:",
         min_value=1,
-        max_value=int(df['Participantes'].max()),
+        max_value=int(indice.maximo_limiar()),
         value=10,
         help="Filtrar escolas com pelo menos N participantes"
     )
     
-    # Aplica filtros
-    df_filtrado = df.copy()
-    
-    if escola_selecionada != 'Todas':
-        df_filtrado = df_filtrado[df_filtrado['NOME_ESCOLA'] == escola_selecionada]
+    # Qualidade do arquivo do ano, validada em segundo plano
+    with st.sidebar.expander("🩺 Qualidade dos dados"):
+        if pronta(futuro_validacao, 'espera_validacao', "Validando o arquivo...", pendentes):
+            relatorio = futuro_validacao.result()
+            st.caption(f"{relatorio['linhas']:,} linhas, {relatorio['escolas']:,} escolas, "
+                       f"{relatorio['municipios']} municípios")
+            tabela_problemas = validar_dados_rn.problemas(relatorio)
+            if tabela_problemas.empty:
+                st.success("✅ Nenhum problema encontrado")
+            else:
+                st.dataframe(tabela_problemas, use_container_width=True, hide_index=True)
     
-    if dependencia_selecionada:
-        df_filtrado = df_filtrado[df_filtrado['DEPENDENCIA_NOME'].isin(dependencia_selecionada)]
+    # Aplica filtros (os mesmos valores valem para a tabela Top N)
+    filtros_selecionados = {
+        'CO_ESCOLA': [escola_selecionada] if escola_selecionada != 'Todas' else None,
+        'DEPENDENCIA_NOME': dependencia_selecionada,
+        'Municipio': [municipio_selecionado] if municipio_selecionado != 'Todos' else None,
+    }
+    with instrumentacao.etapa('filtros') as registro:
+        posicoes_filtradas = indice.resolver(filtros_selecionados, minimo=min_participantes)
+        df_filtrado = df.iloc[posicoes_filtradas]
+        registro['linhas'] = len(df_filtrado)
     
-    if municipio_selecionado != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Municipio'] == municipio_selecionado]
+    # Figuras são reaproveitadas enquanto o dataset e os filtros não mudarem
+    cache = cache_figuras()
+    chave_geral = (ano, versao, indice.chave(filtros_selecionados, minimo=min_participantes))
     
-    df_filtrado = df_filtrado[df_filtrado['Participantes'] >= min_participantes]
+    # Totais por aluno lidos do cubo (somas acumuladas, sem percorrer as escolas)
+    minimo_cubo = max(min_participantes, materializar.MIN_PARTICIPANTES)
+    if futuro_cubo is not None and futuro_cubo.done() and not falhou(futuro_cubo):
+        cubo_ano = futuro_cubo.result()
+        with instrumentacao.etapa('cubo'):
+            if escola_selecionada != 'Todas':
+                resumo = cubo_ano.consultar_escolas(df_filtrado.index)
+            else:
+                resumo = cubo_ano.consultar(filtros_selecionados['Municipio'], dependencia_selecionada, minimo_cubo)
+    else:
+        resumo = None
+        if futuro_cubo is not None and not falhou(futuro_cubo):
+            pendentes.append(futuro_cubo)
+    # Sem o cubo (modo API), os totais por aluno não são exibidos
+    aguardando_resumo = "—" if futuro_cubo is None else "⏳"
     
     # Informações gerais
     col1, col2, col3, col4 = st.columns(4)
@@ -232,9 +591,20 @@ def main():
     with col1:
         st.metric("🏫 Escolas", len(df_filtrado))
     with col2:
-        st.metric("👥 Participantes", f"{df_filtrado['Participantes'].sum():,}")
+        st.metric("👥 Participantes", f"{resumo['alunos']:,}" if resumo else aguardando_resumo)
     with col3:
-        st.metric("📊 Score Médio", f"{df_filtrado['SCORE_FINAL'].mean():.1f}")
+        if resumo:
+            st.metric(
+                "📊 Score Médio",
+                f"{resumo['media']:.1f}",
+                help=f"Média por aluno (desvio padrão {resumo['desvio']:.1f}), não a média das médias das escolas"
+            )
+        else:
+            st.metric(
+                "📊 Score Médio",
+                aguardando_resumo,
+                help=AVISO_MODO_API if futuro_cubo is None else "Calculando os totais por aluno..."
+            )
     with col4:
         st.metric("🏆 Melhor Score", f"{df_filtrado['SCORE_FINAL'].max():.1f}")
     
@@ -246,28 +616,9 @@ def main():
         # Seção 1: Ranking das Escolas
         st.header("🏆 Ranking das Escolas por Score Final")
         
-        # Limita a 20 melhores para visualização
-        top_escolas = df_filtrado.head(20)
-        
-        fig_ranking = px.bar(
-            top_escolas,
-            y='NOME_ESCOLA',
-            x='SCORE_FINAL',
-            color='DEPENDENCIA_NOME',
-            title="Top 20 Escolas por Score Final",
-            hover_data=['Municipio', 'Participantes', 'Classificacao'],
-            color_discrete_map={
-                'Federal': '#FF6B6B',
-                'Estadual': '#4ECDC4', 
-                'Municipal': '#45B7D1',
-                'Privada': '#96CEB4'
-            }
-        )
-        fig_ranking.update_layout(
-            height=600,
-            yaxis={'categoryorder': 'total ascending'}
-        )
-        st.plotly_chart(fig_ranking, use_container_width=True)
+        # Limita a 20 melhores para visualização (barras de erro quando o bootstrap terminar)
+        com_intervalos = 'IC_Inferior' in df_filtrado.columns
+        mostrar_figura(cache, ('ranking', com_intervalos) + chave_geral, figuras.figura_ranking, df_filtrado)
         
         # Seção 2: Análise por Áreas de Conhecimento
         st.header("📚 Desempenho por Área de Conhecimento")
@@ -277,75 +628,30 @@ def main():
         with col1:
             # Gráfico radar das melhores escolas
             if len(df_filtrado) >= 5:
-                top_5 = df_filtrado.head(5)
-                
-                fig_radar = go.Figure()
-                
-                areas = ['Nota_CN', 'Nota_CH', 'Nota_LC', 'Nota_MT', 'Nota_Redacao']
-                area_names = ['Ciências Natureza', 'Ciências Humanas', 'Linguagens', 'Matemática', 'Redação']
-                
-                for i, row in top_5.iterrows():
-                    valores = [row[area] for area in areas]
-                    escola_nome = row['NOME_ESCOLA']
-                    if len(escola_nome) > 30:
-                        escola_nome = escola_nome[:27] + "..."
-                    
-                    fig_radar.add_trace(go.Scatterpolar(
-                        r=valores,
-                        theta=area_names,
-                        fill='toself',
-                        name=escola_nome
-                    ))
-                
-                fig_radar.update_layout(
-                    polar=dict(
-                        radialaxis=dict(
-                            visible=True,
-                            range=[400, 700]
-                        )),
-                    title="Top 5 Escolas - Perfil por Área",
-                    height=400
-                )
-                st.plotly_chart(fig_radar, use_container_width=True)
+                mostrar_figura(cache, ('radar',) + chave_geral, figuras.figura_radar, df_filtrado)
         
         with col2:
             # Distribuição de scores por dependência
-            fig_box = px.box(
-                df_filtrado,
-                x='DEPENDENCIA_NOME',
-                y='SCORE_FINAL',
-                title="Distribuição de Scores por Dependência",
-                color='DEPENDENCIA_NOME',
-                color_discrete_map={
-                    'Federal': '#FF6B6B',
-                    'Estadual': '#4ECDC4', 
-                    'Municipal': '#45B7D1',
-                    'Privada': '#96CEB4'
-                }
+            mostrar_figura(cache, ('box',) + chave_geral, figuras.figura_box, df_filtrado)
+        
+        # Distribuição por aluno: contagens por faixa das escolas filtradas
+        # (o gráfico tem o mesmo tamanho com mil ou com milhões de alunos)
+        if pronta(futuro_histogramas, 'espera_histogramas', "Contando as notas dos alunos por faixa...", pendentes):
+            with instrumentacao.etapa('distribuicao_alunos') as registro:
+                distribuicao = futuro_histogramas.result().distribuicao(df_filtrado.index)
+                registro['linhas'] = len(distribuicao)
+            mostrar_figura(
+                cache,
+                ('distribuicao_alunos',) + chave_geral,
+                figuras.figura_distribuicao_alunos,
+                distribuicao,
+                histogramas.LARGURA_FAIXA
             )
-            fig_box.update_layout(height=400)
-            st.plotly_chart(fig_box, use_container_width=True)
         
         # Seção 3: Scatter Plot Score Objetiva vs Redação
         st.header("📈 Correlação: Score Objetiva vs Redação")
         
-        fig_scatter = px.scatter(
-            df_filtrado,
-            x='SCORE_OBJETIVA',
-            y='Nota_Redacao',
-            size='Participantes',
-            color='DEPENDENCIA_NOME',
-            hover_data=['NOME_ESCOLA', 'Municipio', 'Classificacao'],
-            title="Relação entre Score Objetiva e Nota da Redação",
-            color_discrete_map={
-                'Federal': '#FF6B6B',
-                'Estadual': '#4ECDC4', 
-                'Municipal': '#45B7D1',
-                'Privada': '#96CEB4'
-            }
-        )
-        fig_scatter.update_layout(height=500)
-        st.plotly_chart(fig_scatter, use_container_width=True)
+        mostrar_figura(cache, ('scatter',) + chave_geral, figuras.figura_scatter, df_filtrado)
         
         # Seção 4: Score Final vs Número de Participantes
         st.header("🎯 Score Final vs Número de Participantes")
@@ -364,49 +670,19 @@ def main():
         - A **linha de tendência** mostra se há correlação entre número de participantes e performance
         """)
         
-        fig_scatter_participantes = px.scatter(
-            df_filtrado,
-            x='Participantes',
-            y='SCORE_FINAL',
-            size='Participantes',
-            color='DEPENDENCIA_NOME',
-            hover_data=['NOME_ESCOLA', 'Municipio', 'Classificacao'],
-            title='Score Final vs Número de Participantes por Escola',
-            labels={
-                'Participantes': 'Número de Participantes',
-                'SCORE_FINAL': 'Score Final Médio',
-                'NOME_ESCOLA': 'Escola',
-                'DEPENDENCIA_NOME': 'Dependência'
-            },
-            color_discrete_map={
-                'Federal': '#FF6B6B',
-                'Estadual': '#4ECDC4', 
-                'Municipal': '#45B7D1',
-                'Privada': '#96CEB4'
-            },
-            trendline="ols"  # Adiciona linha de tendência
-        )
-        
-        fig_scatter_participantes.update_layout(
-            height=600,
-            showlegend=True
-        )
+        # Retas e correlação saem de uma única regressão vetorizada por dependência
+        tendencias = calcular_tendencias(chave_geral, df_filtrado)
         
-        # Customizar hover template
-        fig_scatter_participantes.update_traces(
-            hovertemplate="<b>%{customdata[0]}</b><br>" +
-                          "Participantes: %{x}<br>" +
-                          "Score Final: %{y:.1f}<br>" +
-                          "Dependência: %{customdata[3]}<br>" +
-                          "Município: %{customdata[1]}<br>" +
-                          "Classificação: #%{customdata[2]}<br>" +
-                          "<extra></extra>"
+        mostrar_figura(
+            cache,
+            ('scatter_participantes',) + chave_geral,
+            figuras.figura_scatter_participantes,
+            df_filtrado,
+            tendencias
         )
         
-        st.plotly_chart(fig_scatter_participantes, use_container_width=True)
-        
         # Análise estatística da correlação
-        correlacao = df_filtrado['Participantes'].corr(df_filtrado['SCORE_FINAL'])
+        correlacao = tendencias.loc['Todos', 'r']
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -434,197 +710,479 @@ def main():
                                    (df_filtrado['Participantes'] >= df_filtrado['Participantes'].quantile(0.5))]
             st.metric("🏆 Escolas Confiáveis", len(confiáveis))
         
-        # Seção 5: Ranking dos Top 10 Alunos por Escola
-        st.header("🌟 Ranking Baseado nos Top 10 Alunos por Escola")
+        # Seção 5: Ranking dos Top N Alunos por Escola
+        st.header(f"🌟 Ranking Baseado nos Top {top_n} Alunos por Escola")
         
-        st.markdown("""
-        **💡 Esta análise considera apenas os 10 melhores alunos de cada escola:**
+        st.markdown(f"""
+        **💡 Esta análise considera apenas os {top_n} melhores alunos de cada escola:**
         - Mostra o **potencial máximo** de cada escola
         - Útil para identificar escolas que produzem **excelência acadêmica**
         - Complementa a análise da média geral (que pode ser afetada por alunos com dificuldades)
-        - Escolas com menos de 3 alunos no top 10 são excluídas para garantir representatividade
+        - Escolas com menos de {min(3, top_n)} alunos no top {top_n} são excluídas para garantir representatividade
         """)
         
-        # Carrega dados do top 10
-        with st.spinner("Calculando estatísticas dos top 10 alunos por escola..."):
-            df_top10 = carregar_dados_top10()
-        
-        if df_top10 is not None and len(df_top10) > 0:
-            # Aplica os mesmos filtros da análise principal
-            df_top10_filtrado = df_top10.copy()
-            
-            if escola_selecionada != 'Todas':
-                df_top10_filtrado = df_top10_filtrado[df_top10_filtrado['NOME_ESCOLA'] == escola_selecionada]
-            
-            if dependencia_selecionada:
-                df_top10_filtrado = df_top10_filtrado[df_top10_filtrado['DEPENDENCIA_NOME'].isin(dependencia_selecionada)]
-            
-            if municipio_selecionado != 'Todos':
-                df_top10_filtrado = df_top10_filtrado[df_top10_filtrado['Municipio'] == municipio_selecionado]
-            
-            if len(df_top10_filtrado) > 0:
-                # Informações do top 10
-                col1, col2, col3, col4 = st.columns(4)
+        # Dados do top N, calculados em segundo plano desde o início da página
+        if pronta(futuro_top_n, 'espera_top_n', f"Calculando estatísticas dos top {top_n} alunos por escola...", pendentes):
+            df_top_n = futuro_top_n.result()
                 
-                with col1:
-                    st.metric("🏫 Escolas (Top 10)", len(df_top10_filtrado))
-                with col2:
-                    st.metric("👑 Score Médio (Top 10)", f"{df_top10_filtrado['SCORE_FINAL'].mean():.1f}")
-                with col3:
-                    st.metric("🥇 Melhor Score (Top 10)", f"{df_top10_filtrado['SCORE_FINAL'].max():.1f}")
-                with col4:
-                    # Comparação com a média geral
-                    if len(df_filtrado) > 0:
-                        diferenca = df_top10_filtrado['SCORE_FINAL'].mean() - df_filtrado['SCORE_FINAL'].mean()
-                        st.metric("📈 Diferença vs Média Geral", f"+{diferenca:.1f}")
-                
-                # Gráfico de comparação: Média Geral vs Top 10
-                st.subheader("📊 Comparação: Média Geral vs Top 10 Alunos")
+            if df_top_n is not None and len(df_top_n) > 0:
+                # Aplica os mesmos filtros da análise principal
+                indice_top_n = indice_filtros(ano, versao, f'top{top_n}', df_top_n)
+                with instrumentacao.etapa('filtros_top_n') as registro:
+                    posicoes_top_n = indice_top_n.resolver(filtros_selecionados)
+                    df_top_n_filtrado = df_top_n.iloc[posicoes_top_n]
+                    registro['linhas'] = len(df_top_n_filtrado)
                 
-                # Prepara dados para comparação
-                escolas_comuns = set(df_filtrado['NOME_ESCOLA']) & set(df_top10_filtrado['NOME_ESCOLA'])
-                
-                if escolas_comuns:
-                    df_comparacao = []
+                if len(df_top_n_filtrado) > 0:
+                    # Informações do top N
+                    col1, col2, col3, col4 = st.columns(4)
                     
-                    for escola in list(escolas_comuns)[:15]:  # Limita a 15 escolas para visualização
-                        score_geral = df_filtrado[df_filtrado['NOME_ESCOLA'] == escola]['SCORE_FINAL'].iloc[0]
-                        score_top10 = df_top10_filtrado[df_top10_filtrado['NOME_ESCOLA'] == escola]['SCORE_FINAL'].iloc[0]
-                        
-                        df_comparacao.append({'Escola': escola, 'Tipo': 'Média Geral', 'Score': score_geral})
-                        df_comparacao.append({'Escola': escola, 'Tipo': 'Top 10 Alunos', 'Score': score_top10})
+                    with col1:
+                        st.metric(f"🏫 Escolas (Top {top_n})", len(df_top_n_filtrado))
+                    with col2:
+                        st.metric(f"👑 Score Médio (Top {top_n})", f"{df_top_n_filtrado['SCORE_FINAL'].mean():.1f}")
+                    with col3:
+                        st.metric(f"🥇 Melhor Score (Top {top_n})", f"{df_top_n_filtrado['SCORE_FINAL'].max():.1f}")
+                    with col4:
+                        # Comparação com a média geral
+                        if len(df_filtrado) > 0:
+                            diferenca = df_top_n_filtrado['SCORE_FINAL'].mean() - df_filtrado['SCORE_FINAL'].mean()
+                            st.metric("📈 Diferença vs Média Geral", f"+{diferenca:.1f}")
                     
-                    df_comp = pd.DataFrame(df_comparacao)
+                    # Gráfico de comparação: Média Geral vs Top N
+                    st.subheader(f"📊 Comparação: Média Geral vs Top {top_n} Alunos")
                     
-                    fig_comp = px.bar(
-                        df_comp,
-                        x='Escola',
-                        y='Score',
-                        color='Tipo',
-                        barmode='group',
-                        title='Comparação: Score Médio Geral vs Top 10 Alunos por Escola',
-                        color_discrete_map={
-                            'Média Geral': '#45B7D1',
-                            'Top 10 Alunos': '#FF6B6B'
-                        }
+                    comparar_todas = st.checkbox(
+                        "Comparar todas as escolas",
+                        help="Mostra todas as escolas filtradas em vez das 15 primeiras da classificação"
                     )
-                    fig_comp.update_layout(
-                        xaxis_tickangle=-45,
-                        height=500,
-                        xaxis_title="Escola",
-                        yaxis_title="Score Final"
+                    
+                    # Uma junção por CO_ESCOLA; depende dos filtros gerais e de N, mas não das buscas
+                    comparacao = agregacoes.tabela_comparacao(df_filtrado, df_top_n_filtrado)
+                    
+                    if len(comparacao) > 0:
+                        if comparar_todas:
+                            mostrar_figura(
+                                cache,
+                                ('comparacao_todas', top_n) + chave_geral,
+                                figuras.figura_comparacao_todas,
+                                comparacao,
+                                top_n
+                            )
+                        else:
+                            mostrar_figura(
+                                cache,
+                                ('comparacao', top_n) + chave_geral,
+                                figuras.figura_comparacao,
+                                comparacao,
+                                top_n
+                            )
+                    
+                    # Tabela detalhada do top N
+                    st.subheader(f"📋 Ranking Detalhado - Top {top_n} Alunos por Escola")
+                    
+                    # Busca na tabela top N (sem acentos/maiúsculas, ranqueada e limitada)
+                    busca_top_n = st.text_input(
+                        "🔍 Buscar na tabela Top N:",
+                        placeholder="Digite o nome da escola...",
+                        key="busca_top_n"
                     )
-                    st.plotly_chart(fig_comp, use_container_width=True)
-                
-                # Tabela detalhada do top 10
-                st.subheader("📋 Ranking Detalhado - Top 10 Alunos por Escola")
-                
-                df_top10_display = df_top10_filtrado[[
-                    'Classificacao_Top10', 'NOME_ESCOLA', 'Municipio', 'DEPENDENCIA_NOME',
-                    'Nota_CN', 'Nota_CH', 'Nota_LC', 'Nota_MT', 'Nota_Redacao',
-                    'SCORE_OBJETIVA', 'SCORE_FINAL', 'Top_Alunos_Considerados', 'Categoria_Desempenho_Top10'
-                ]].copy()
+                    
+                    if busca_top_n:
+                        posicoes_tabela_top_n = buscar_escolas(
+                            indice_busca(ano, versao, f'top{top_n}', df_top_n),
+                            busca_top_n,
+                            posicoes_top_n,
+                            "busca_top_n"
+                        )
+                    else:
+                        posicoes_tabela_top_n = posicoes_top_n
+                    
+                    # Tabela completa de exibição; os filtros e a busca só escolhem posições
+                    exibicao_top_n, ordenacao_top_n = tabela_exibicao(
+                        ano, versao, f'top{top_n}', tuple(COLUNAS_TABELA_TOP_N.items()), df_top_n
+                    )
+                    df_top_n_display = exibicao_top_n.iloc[posicoes_tabela_top_n]
+                    pagina_top_n = paginar(
+                        ordenacao_top_n,
+                        exibicao_top_n.columns,
+                        posicoes_tabela_top_n,
+                        "tabela_top_n",
+                        relevancia=bool(busca_top_n)
+                    )
+                    
+                    # Exibe só a página visível (a serialização para o navegador entra na medição)
+                    with instrumentacao.etapa('tabela_top_n', linhas=len(pagina_top_n)):
+                        st.dataframe(
+                            exibicao_top_n.iloc[pagina_top_n],
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                "Score Final": st.column_config.NumberColumn(
+                                    "Score Final",
+                                    help=f"Score final médio dos top {top_n} alunos",
+                                    format="%.1f"
+                                ),
+                                "Alunos Top N": st.column_config.NumberColumn(
+                                    "Alunos Top N",
+                                    help=f"Número de alunos considerados no top {top_n} desta escola"
+                                )
+                            }
+                        )
+                else:
+                    st.warning(f"⚠️ Nenhuma escola encontrada com os filtros aplicados para análise do Top {top_n}.")
+            else:
+                st.error(f"❌ Erro ao carregar dados do Top {top_n}.")
+        
+        # Seção 6: Detalhamento Regional (estado -> município -> dependência), lido do cubo
+        st.header("🗺️ Detalhamento Regional")
+        # O mesmo cubo das métricas desta execução (ele pode terminar no meio do script)
+        if futuro_cubo is None:
+            st.info(f"ℹ️ {AVISO_MODO_API}")
+        elif falhou(futuro_cubo):
+            st.error(f"❌ Erro ao montar o cubo de agregados: {futuro_cubo.exception()}")
+        elif resumo is None:
+            st.info("⏳ Montando o cubo de agregados...")
+        else:
+            if municipio_selecionado == 'Todos':
+                st.markdown("Resultados **por aluno** em cada município; escolha um município na barra lateral para detalhar por dependência.")
+                municipio_detalhe = None
+            else:
+                st.markdown(f"Resultados **por aluno** em **{municipio_selecionado}**, por dependência administrativa.")
+                municipio_detalhe = municipio_selecionado
+            with instrumentacao.etapa('detalhamento_regional') as registro:
+                detalhamento_regional = cubo_ano.detalhar(municipio_detalhe, dependencia_selecionada, minimo_cubo).rename(
+                    columns={'escolas': 'Escolas', 'alunos': 'Alunos', 'media': 'Score Médio', 'desvio': 'Desvio Padrão'}
+                )
+                registro['linhas'] = len(detalhamento_regional)
+            st.dataframe(
+                detalhamento_regional,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "Score Médio": st.column_config.NumberColumn("Score Médio", format="%.1f"),
+                    "Desvio Padrão": st.column_config.NumberColumn("Desvio Padrão", format="%.1f"),
+                }
+            )
+        
+        # Seção 7: Trajetória das escolas entre os anos (tabela pré-calculada por trajetorias.py)
+        if len(anos_disponiveis) > 1:
+            st.header("📈 Trajetória das Escolas")
+            # Comparar anos lê todos eles (os ainda não preparados são convertidos
+            # do CSV): só acontece quando o usuário abre a seção
+            if url_api:
+                st.info(f"ℹ️ {AVISO_MODO_API}")
+            elif not st.toggle(
+                "Comparar os anos disponíveis",
+                key="trajetorias_ativas",
+                help="Lê as tabelas por escola de todos os anos; na primeira vez, anos ainda não preparados são convertidos a partir do CSV"
+            ):
+                st.caption(f"Anos disponíveis: {', '.join(map(str, anos_disponiveis))}. "
+                           "Ative a comparação para ver as maiores altas e quedas entre dois anos.")
+            else:
+                # A chave muda quando algum CSV de origem muda (sem ler os arquivos)
+                fontes = tuple((ano_trajetoria, ingestao.assinatura_fonte(ano_trajetoria))
+                               for ano_trajetoria in anos_disponiveis)
+                futuro_trajetorias = tarefas.enviar(('trajetorias', fontes), trajetorias_escolas, tuple(anos_disponiveis))
+                longa = None
+                if pronta(futuro_trajetorias, 'espera_trajetorias', "Atualizando trajetórias...", pendentes):
+                    longa = futuro_trajetorias.result()
+            
+                anos_trajetoria = sorted(longa['Ano'].unique().tolist()) if longa is not None else []
+                if longa is not None and len(anos_trajetoria) < 2:
+                    st.info("São precisos pelo menos dois anos com escolas para comparar trajetórias.")
+                elif longa is not None:
+                    st.caption("Escolas sem código do INEP (arquivos de 2022/2023) são acompanhadas pelo nome e "
+                               "município; uma escola que mudou de nome aparece como duas.")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        ano_inicial, ano_final = st.select_slider(
+                            "Período:",
+                            options=anos_trajetoria,
+                            value=(anos_trajetoria[0], anos_trajetoria[-1]),
+                            key="trajetoria_periodo"
+                        )
+                    with col2:
+                        variacao = st.selectbox(
+                            "Maiores variações de:",
+                            ['Variacao_Score', 'Variacao_Classificacao', 'Crescimento_Participantes'],
+                            format_func={
+                                'Variacao_Score': 'Score Final',
+                                'Variacao_Classificacao': 'Posições no ranking',
+                                'Crescimento_Participantes': 'Participantes (%)',
+                            }.get,
+                            key="trajetoria_variacao"
+                        )
                 
-                # Renomeia colunas para exibição
-                df_top10_display.columns = [
-                    'Classificação Top 10', 'Nome da Escola', 'Município', 'Dependência',
-                    'CN', 'CH', 'LC', 'MT', 'Redação',
-                    'Score Objetiva', 'Score Final', 'Alunos Top 10', 'Categoria'
-                ]
+                    if ano_inicial == ano_final:
+                        st.info("Escolha dois anos diferentes para comparar.")
+                    else:
+                        with instrumentacao.etapa('trajetorias') as registro:
+                            variacoes = trajetorias.variacoes(longa, ano_inicial, ano_final)
+                            # Mesmos filtros de dependência e município da barra lateral (dados do ano mais recente)
+                            # (seleção vazia não restringe, como em filtros.IndiceFiltros)
+                            if dependencia_selecionada:
+                                variacoes = variacoes[variacoes['DEPENDENCIA_NOME'].isin(dependencia_selecionada)]
+                            if municipio_selecionado != 'Todos':
+                                variacoes = variacoes[variacoes['Municipio'] == municipio_selecionado]
+                            altas, quedas = trajetorias.maiores_variacoes(variacoes, variacao)
+                            registro['linhas'] = len(variacoes)
+                    
+                        st.markdown(f"{len(variacoes):,} escolas presentes em {ano_inicial} e {ano_final}.")
+                        colunas_trajetoria = {
+                            'NOME_ESCOLA': st.column_config.TextColumn("Escola"),
+                            'Municipio': st.column_config.TextColumn("Município"),
+                            f'SCORE_FINAL_{ano_inicial}': st.column_config.NumberColumn(f"Score {ano_inicial}", format="%.1f"),
+                            f'SCORE_FINAL_{ano_final}': st.column_config.NumberColumn(f"Score {ano_final}", format="%.1f"),
+                            'Variacao_Score': st.column_config.NumberColumn("Δ Score", format="%+.1f"),
+                            'Variacao_Classificacao': st.column_config.NumberColumn("Δ Posições", format="%+d"),
+                            'Crescimento_Participantes': st.column_config.NumberColumn("Δ Participantes", format="%+.1f%%"),
+                            'Trajetoria': st.column_config.LineChartColumn(
+                                f"Score {anos_trajetoria[0]}-{anos_trajetoria[-1]}", y_min=0, y_max=1000
+                            ),
+                        }
+                        col1, col2 = st.columns(2)
+                        for coluna, titulo, tabela in ((col1, "⬆️ Maiores altas", altas), (col2, "⬇️ Maiores quedas", quedas)):
+                            with coluna:
+                                st.subheader(titulo)
+                                st.dataframe(
+                                    tabela[list(colunas_trajetoria)],
+                                    use_container_width=True,
+                                    hide_index=True,
+                                    column_config=colunas_trajetoria
+                                )
+        
+        # Seção 8: Percentil de notas de alunos (busca binária nos arrays ordenados)
+        st.header("🎯 Onde Fica uma Nota?")
+        col1, col2 = st.columns(2)
+        with col1:
+            nota_consulta = st.selectbox(
+                "Nota:",
+                list(percentis.NOTAS),
+                format_func=percentis.NOTAS.get,
+                key="percentil_nota"
+            )
+        with col2:
+            texto_notas = st.text_input(
+                "Valores (separados por espaço ou ponto e vírgula):",
+                value="600",
+                key="percentil_valores",
+                help="Ex.: 550; 612,5; 700"
+            )
+        
+        valores_consulta = ler_notas(texto_notas)
+        if valores_consulta is None:
+            st.warning("⚠️ Digite uma ou mais notas entre 0 e 1000.")
+        elif pronta(futuro_percentis, 'espera_percentis', "Ordenando as notas dos participantes...", pendentes):
+            motor_percentis = futuro_percentis.result()
+            particoes_consulta = [(percentis.ESTADO, None)]
+            if municipio_selecionado != 'Todos':
+                particoes_consulta.append((percentis.MUNICIPIO, municipio_selecionado))
+            particoes_consulta += [(percentis.DEPENDENCIA, nome) for nome in dependencia_selecionada]
+            
+            with instrumentacao.etapa('percentis') as registro:
+                tabela_percentis = motor_percentis.consultar(valores_consulta, nota_consulta, particoes_consulta)
+                registro['linhas'] = len(tabela_percentis)
+            
+            primeira = tabela_percentis.iloc[0]
+            st.metric(
+                f"📍 {percentis.NOTAS[nota_consulta]} {primeira['Nota']:.1f} no estado",
+                f"Percentil {primeira['Percentil']:.1f}",
+                help=f"Acima de {primeira['Percentil']:.1f}% dos {primeira['Alunos']:,} participantes "
+                     f"(empates contam pela metade); posição {primeira['Posição']:,}"
+            )
+            st.dataframe(
+                tabela_percentis,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "Nota": st.column_config.NumberColumn("Nota", format="%.1f"),
+                    "Percentil": st.column_config.NumberColumn("Percentil", format="%.1f"),
+                }
+            )
+        
+        # Seção 9: Perfil Socioeconômico (questionário de 2022/2023)
+        if questoes:
+            st.header("🏠 Perfil Socioeconômico dos Participantes")
+            if pronta(futuro_cruzamentos, 'espera_cruzamentos', "Cruzando as respostas do questionário...", pendentes):
+                cruzamentos = futuro_cruzamentos.result()
                 
-                # Busca na tabela top 10
-                busca_top10 = st.text_input("🔍 Buscar na tabela Top 10:", placeholder="Digite o nome da escola...")
+                col1, col2 = st.columns(2)
+                with col1:
+                    questao = st.selectbox(
+                        "Questão:",
+                        cruzamentos.questoes,
+                        index=cruzamentos.questoes.index('Q006') if 'Q006' in cruzamentos.questoes else 0,
+                        format_func=lambda q: f"{q} - {socioeconomico.QUESTOES[q]}",
+                        key="questao_socioeconomica"
+                    )
+                with col2:
+                    detalhamento = st.selectbox(
+                        "Detalhar por:",
+                        ['Resposta'] + list(socioeconomico.DIMENSOES),
+                        key="detalhamento_socioeconomico",
+                        help="Alunos das escolas filtradas, agrupados pela resposta e, opcionalmente, por dependência ou município"
+                    )
                 
-                if busca_top10:
-                    df_top10_display = df_top10_display[df_top10_display['Nome da Escola'].str.contains(busca_top10, case=False, na=False)]
+                # Consultas às matrizes pré-calculadas, restritas às escolas filtradas
+                with instrumentacao.etapa('socioeconomico') as registro:
+                    if detalhamento == 'Resposta':
+                        tabela_socioeconomica = cruzamentos.alunos_por_resposta(questao, posicoes_filtradas)
+                    else:
+                        tabela_socioeconomica = cruzamentos.alunos_por_dimensao(questao, detalhamento, posicoes_filtradas)
+                    escolas_por_resposta = cruzamentos.escolas_por_resposta(questao, posicoes_filtradas)
+                    registro['linhas'] = len(tabela_socioeconomica)
                 
-                # Exibe tabela do top 10
-                st.dataframe(
-                    df_top10_display,
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config={
-                        "Score Final": st.column_config.NumberColumn(
-                            "Score Final",
-                            help="Score final médio dos top 10 alunos",
-                            format="%.1f"
-                        ),
-                        "Alunos Top 10": st.column_config.NumberColumn(
-                            "Alunos Top 10",
-                            help="Número de alunos considerados no top 10 desta escola"
-                        )
-                    }
+                mostrar_figura(
+                    cache,
+                    ('socioeconomico', questao, detalhamento) + chave_geral,
+                    figuras.figura_socioeconomica,
+                    tabela_socioeconomica,
+                    f"Score Médio dos Alunos por {socioeconomico.QUESTOES[questao]}",
+                    detalhamento
                 )
-            else:
-                st.warning("⚠️ Nenhuma escola encontrada com os filtros aplicados para análise do Top 10.")
-        else:
-            st.error("❌ Erro ao carregar dados do Top 10.")
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.subheader("👥 Alunos por resposta")
+                    st.dataframe(tabela_socioeconomica, use_container_width=True, hide_index=True)
+                with col2:
+                    st.subheader("🏫 Escolas pela resposta predominante")
+                    st.dataframe(escolas_por_resposta, use_container_width=True, hide_index=True)
         
-        # Seção 6: Tabela Detalhada Geral
+        # Seção 10: Tabela Detalhada Geral
         st.header("📋 Dados Detalhados das Escolas (Média Geral)")
         
-        # Prepara dados para exibição
-        df_display = df_filtrado[[
-            'Classificacao', 'NOME_ESCOLA', 'Municipio', 'DEPENDENCIA_NOME',
-            'Nota_CN', 'Nota_CH', 'Nota_LC', 'Nota_MT', 'Nota_Redacao',
-            'SCORE_OBJETIVA', 'SCORE_FINAL', 'Participantes', 'Categoria_Desempenho'
-        ]].copy()
-        
-        # Renomeia colunas para exibição
-        df_display.columns = [
-            'Classificação', 'Nome da Escola', 'Município', 'Dependência',
-            'CN', 'CH', 'LC', 'MT', 'Redação',
-            'Score Objetiva', 'Score Final', 'Participantes', 'Categoria'
-        ]
+        # A tabela aparece logo; as colunas dos intervalos de confiança entram
+        # quando o bootstrap terminar (os mesmos dados do ranking desta execução)
+        if futuro_intervalos is None:
+            st.caption("Sem as colunas de intervalo de confiança: o bootstrap depende dos microdados, "
+                       "que o serviço de agregados (ENEM_API_URL) não envia.")
+        elif falhou(futuro_intervalos):
+            st.error(f"❌ Erro ao calcular os intervalos de confiança: {futuro_intervalos.exception()}")
+        elif not com_intervalos:
+            st.info("⏳ Calculando intervalos de confiança: as colunas de IC entram na tabela quando o bootstrap terminar.")
+            pendentes.append(futuro_intervalos)
+        colunas_geral = tuple(
+            (coluna, nome) for coluna, nome in COLUNAS_TABELA_GERAL.items() if coluna in df.columns
+        )
         
-        # Opção de busca na tabela
-        busca_tabela = st.text_input("🔍 Buscar na tabela:", placeholder="Digite o nome da escola...")
+        # Opção de busca na tabela (sem acentos/maiúsculas, ranqueada e limitada)
+        busca_tabela = st.text_input(
+            "🔍 Buscar na tabela:",
+            placeholder="Digite o nome da escola...",
+            key="busca_tabela"
+        )
         
         if busca_tabela:
-            df_display = df_display[df_display['Nome da Escola'].str.contains(busca_tabela, case=False, na=False)]
-        
-        # Exibe tabela com formatação
-        st.dataframe(
-            df_display,
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "Score Final": st.column_config.NumberColumn(
-                    "Score Final",
-                    help="Score final médio da escola",
-                    format="%.1f"
-                ),
-                "Participantes": st.column_config.NumberColumn(
-                    "Participantes",
-                    help="Número total de participantes da escola"
-                )
-            }
+            posicoes_tabela = buscar_escolas(
+                indice_busca(ano, versao, 'geral', df),
+                busca_tabela,
+                posicoes_filtradas,
+                "busca_tabela"
+            )
+        else:
+            posicoes_tabela = posicoes_filtradas
+        
+        # Tabela completa de exibição; os filtros e a busca só escolhem posições
+        exibicao, ordenacao = tabela_exibicao(ano, versao, 'geral', colunas_geral, df)
+        df_display = exibicao.iloc[posicoes_tabela]
+        pagina_geral = paginar(
+            ordenacao,
+            exibicao.columns,
+            posicoes_tabela,
+            "tabela_geral",
+            relevancia=bool(busca_tabela)
         )
         
-        # Download dos dados
+        # Exibe só a página visível, com formatação
+        with instrumentacao.etapa('tabela_geral', linhas=len(pagina_geral)):
+            st.dataframe(
+                exibicao.iloc[pagina_geral],
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "Score Final": st.column_config.NumberColumn(
+                        "Score Final",
+                        help="Score final médio da escola",
+                        format="%.1f"
+                    ),
+                    "IC 95% (mín.)": st.column_config.NumberColumn(
+                        "IC 95% (mín.)",
+                        help="Limite inferior do intervalo de confiança (bootstrap) do Score Final",
+                        format="%.1f"
+                    ),
+                    "IC 95% (máx.)": st.column_config.NumberColumn(
+                        "IC 95% (máx.)",
+                        help="Limite superior do intervalo de confiança (bootstrap) do Score Final",
+                        format="%.1f"
+                    ),
+                    "Classificação (melhor)": st.column_config.NumberColumn(
+                        "Classificação (melhor)",
+                        help="Melhor posição plausível no ranking (intervalo de 95% do bootstrap)"
+                    ),
+                    "Classificação (pior)": st.column_config.NumberColumn(
+                        "Classificação (pior)",
+                        help="Pior posição plausível no ranking (intervalo de 95% do bootstrap)"
+                    ),
+                    "Participantes": st.column_config.NumberColumn(
+                        "Participantes",
+                        help="Número total de participantes da escola"
+                    )
+                }
+            )
+        
+        # Download dos dados: os arquivos só são gerados quando o botão é clicado
         st.subheader("📥 Download dos Dados")
         
-        col1, col2 = st.columns(2)
+        formatos = exportacao.formatos_disponiveis()
+        formato = st.selectbox(
+            "Formato:",
+            formatos,
+            format_func=lambda formato: exportacao.FORMATOS[formato][0],
+            help="Parquet e Excel dependem do pyarrow e do openpyxl"
+        )
+        rotulo, extensao, mime, _ = exportacao.FORMATOS[formato]
+        
+        col1, col2, col3 = st.columns(3)
         
         with col1:
             # Download da tabela geral
-            csv_geral = df_display.to_csv(index=False)
+            chave_export_geral = ('geral', busca_tabela, com_intervalos) + chave_geral
             st.download_button(
-                label="📊 Download Dados Gerais (CSV)",
-                data=csv_geral,
-                file_name="enem_2024_rn_ranking_geral.csv",
-                mime="text/csv"
+                label=f"📊 Download Dados Gerais ({rotulo})",
+                data=lambda: exportar_tabela(chave_export_geral, formato, df_display),
+                file_name=f"enem_{ano}_rn_ranking_geral.{extensao}",
+                mime=mime,
+                on_click="ignore"
             )
         
         with col2:
-            # Download da tabela top 10 (se disponível)
-            if 'df_top10_filtrado' in locals() and len(df_top10_filtrado) > 0:
-                csv_top10 = df_top10_display.to_csv(index=False)
+            # Download da tabela top N (se disponível)
+            if 'df_top_n_filtrado' in locals() and len(df_top_n_filtrado) > 0:
+                chave_export_top_n = ('top', top_n, busca_top_n) + chave_geral
+                st.download_button(
+                    label=f"🌟 Download Top {top_n} ({rotulo})",
+                    data=lambda: exportar_tabela(chave_export_top_n, formato, df_top_n_display),
+                    file_name=f"enem_{ano}_rn_ranking_top{top_n}.{extensao}",
+                    mime=mime,
+                    on_click="ignore"
+                )
+        
+        with col3:
+            # Extrato por aluno das escolas filtradas, gravado em lotes em disco
+            # (Parquet em row groups; CSV quando o pyarrow não está instalado)
+            if url_api:
+                st.caption(f"👥 Alunos das escolas: {AVISO_MODO_API}")
+            else:
+                rotulo_extrato, extensao_extrato, mime_extrato, _ = exportacao.FORMATOS[exportacao.formato_extrato()]
                 st.download_button(
-                    label="🌟 Download Top 10 (CSV)",
-                    data=csv_top10,
-                    file_name="enem_2024_rn_ranking_top10.csv",
-                    mime="text/csv"
+                    label=f"👥 Download Alunos das Escolas ({rotulo_extrato})",
+                    data=lambda: exportacao.bytes_extrato_alunos(ano, versao, chave_geral, df_filtrado),
+                    file_name=f"enem_{ano}_rn_alunos.{extensao_extrato}",
+                    mime=mime_extrato,
+                    on_click="ignore",
+                    help="Microdados dos alunos das escolas filtradas"
                 )
     
     else:
@@ -632,12 +1190,31 @@ def main():
     
     # Rodapé
     st.markdown("---")
-    st.markdown("""
+    st.markdown(f"""
     <div style='text-align: center'>
-        <p>📊 <strong>Dashboard ENEM 2024 - Rio Grande do Norte</strong></p>
+        <p>📊 <strong>Dashboard ENEM {ano} - Rio Grande do Norte</strong></p>
         <p>Dados: INEP/MEC | Processamento: Python/Streamlit</p>
     </div>
     """, unsafe_allow_html=True)
+    
+    return pendentes
 
 if __name__ == "__main__":
-    main()
+    # Cada execução do script é medida; ?debug=perf mostra o detalhamento na barra lateral
+    sessao = st.session_state.setdefault('id_sessao', instrumentacao.novo_id())
+    # Páginas refeitas seguidas por tarefas concluídas (zera a cada interação)
+    if st.session_state.pop('rerun_tarefas', False):
+        st.session_state['tentativas_espera'] = st.session_state.get('tentativas_espera', 0) + 1
+    else:
+        st.session_state['tentativas_espera'] = 0
+    with instrumentacao.execucao(sessao=sessao) as execucao_atual:
+        pendentes = main()
+    if st.query_params.get('debug') == 'perf':
+        painel_desempenho(execucao_atual, cache_figuras(), tarefas_segundo_plano())
+    
+    # Seções ainda em cálculo: um fragmento verifica as tarefas em intervalos
+    # crescentes e só refaz a página quando alguma terminar (o script não fica
+    # esperando, e as interações do usuário são atendidas na hora)
+    if pendentes:
+        intervalo = segundo_plano.intervalo_espera(st.session_state['tentativas_espera'])
+        st.fragment(acompanhar_tarefas, run_every=intervalo)(pendentes)
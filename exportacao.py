@@ -0,0 +1,244 @@
+"""
+Exportação das tabelas do dashboard em CSV, Parquet e Excel
+
+Nada aqui é chamado durante a renderização: o dashboard passa funções para o
+`st.download_button`, e a serialização só acontece quando o usuário pede o
+arquivo. O extrato por aluno lê a partição do ano em lotes e grava cada lote
+filtrado como um row group de um Parquet comprimido em disco (sem o pyarrow,
+lê o CSV de origem em lotes e grava um CSV): nem a leitura
+nem a gravação montam o extrato inteiro na memória. O `st.download_button`
+ainda guarda o arquivo pronto na memória ao servi-lo (o Streamlit não envia
+downloads em streaming), mas comprimido ele ocupa uma fração do CSV.
+
+Os extratos ficam em `data-cache/exportacoes/`, um arquivo por versão dos
+dados e chave dos filtros. Cada gravação usa um temporário próprio, e a
+limpeza só remove extratos além dos MAXIMO_EXTRATOS mais recentes que tenham
+mais de IDADE_MINIMA_EXTRATO segundos e não estejam sendo lidos neste processo.
+"""
+import hashlib
+import importlib.util
+import io
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+import ingestao
+
+DIRETORIO_EXPORTACOES = os.path.join(ingestao.DIRETORIO_CACHE, 'exportacoes')
+
+# formato -> (rótulo, extensão, tipo MIME, módulo necessário)
+FORMATOS = {
+    'csv': ('CSV', 'csv', 'text/csv', None),
+    'parquet': ('Parquet', 'parquet', 'application/vnd.apache.parquet', 'pyarrow'),
+    'xlsx': ('Excel', 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'openpyxl'),
+}
+
+TAMANHO_LOTE = 100_000
+MAXIMO_EXTRATOS = 8
+
+# Extratos (e temporários) mais novos que isto nunca são removidos (s)
+IDADE_MINIMA_EXTRATO = 3600
+
+# Colunas que decidem se um aluno entra nas tabelas do dashboard e em qual escola
+COLUNAS_ESCOLA = ['CO_ESCOLA', 'NOME_ESCOLA', 'NO_MUNICIPIO_ESC', 'SCORE_FINAL']
+
+# Extratos abertos por este processo (caminho -> leitores)
+_em_uso = Counter()
+_trava_uso = threading.Lock()
+
+
+def formatos_disponiveis():
+    """
+    Formatos cujas dependências opcionais estão instaladas
+    """
+    return [
+        formato for formato, (_, _, _, modulo) in FORMATOS.items()
+        if modulo is None or importlib.util.find_spec(modulo) is not None
+    ]
+
+
+def serializar(df, formato):
+    """
+    Converte a tabela para os bytes do formato pedido
+    """
+    if formato == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+
+    buffer = io.BytesIO()
+    if formato == 'parquet':
+        df.to_parquet(buffer, index=False)
+    elif formato == 'xlsx':
+        df.to_excel(buffer, index=False, sheet_name='Ranking')
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    return buffer.getvalue()
+
+
+@contextmanager
+def _usando(caminho):
+    """
+    Marca o extrato como em uso enquanto o bloco executa (a limpeza não o remove)
+    """
+    with _trava_uso:
+        _em_uso[caminho] += 1
+    try:
+        yield caminho
+    finally:
+        with _trava_uso:
+            _em_uso[caminho] -= 1
+            if not _em_uso[caminho]:
+                del _em_uso[caminho]
+
+
+def _remover_antigos(diretorio, manter, idade_minima=IDADE_MINIMA_EXTRATO):
+    """
+    Remove os extratos além dos `manter` usados mais recentemente, desde que
+    tenham mais de `idade_minima` segundos e não estejam em uso; temporários
+    abandonados saem pela idade
+    """
+    with _trava_uso:
+        em_uso = set(_em_uso)
+    extratos, temporarios = [], []
+    with os.scandir(diretorio) as entradas:
+        for entrada in entradas:
+            try:
+                modificado = entrada.stat().st_mtime
+            except OSError:
+                continue
+            if entrada.name.endswith('.csv'):
+                extratos.append((modificado, entrada.path))
+            elif entrada.name.endswith('.tmp'):
+                temporarios.append((modificado, entrada.path))
+    extratos.sort(reverse=True)
+
+    limite = time.time() - idade_minima
+    for modificado, caminho in extratos[manter:] + temporarios:
+        if modificado > limite or caminho in em_uso:
+            continue
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def formato_extrato():
+    """
+    Formato do extrato por aluno: Parquet com o pyarrow, senão CSV
+    """
+    return 'parquet' if 'parquet' in formatos_disponiveis() else 'csv'
+
+
+def _caminho_extrato(ano, versao, chave, diretorio):
+    identificador = hashlib.sha256(repr(chave).encode('utf-8')).hexdigest()[:16]
+    extensao = FORMATOS[formato_extrato()][1]
+    return os.path.join(diretorio, f'alunos_{ano}_{versao}_{identificador}.{extensao}')
+
+
+def _par_escola(nomes, municipios):
+    return nomes.astype(str) + '|' + municipios.astype(str)
+
+
+def selecao_escolas(escolas):
+    """
+    Códigos do INEP e pares 'nome|município' das escolas escolhidas.
+
+    `escolas` é a tabela por escola do dashboard (CO_ESCOLA no índice, com
+    NOME_ESCOLA e Municipio): as escolas com código negativo (de
+    `agregacoes.preencher_codigo_escola`) são reconhecidas pelo par, como no
+    preenchimento, sem recalcular os códigos sobre o ano inteiro.
+    """
+    codigos = escolas.index.to_numpy()
+    substitutas = escolas[codigos < 0]
+    return (
+        set(int(codigo) for codigo in codigos[codigos >= 0]),
+        set(_par_escola(substitutas['NOME_ESCOLA'], substitutas['Municipio'])),
+    )
+
+
+def linhas_escolas(df, codigos, pares):
+    """
+    Máscara dos alunos do lote que pertencem às escolas escolhidas, com as
+    mesmas regras das tabelas (escola e Score Final presentes)
+    """
+    validos = df['NOME_ESCOLA'].notna() & df['SCORE_FINAL'].notna()
+    ausentes = df['CO_ESCOLA'].isna()
+    mascara = df['CO_ESCOLA'].isin(codigos)
+    if pares and ausentes.any():
+        mascara |= ausentes & _par_escola(df['NOME_ESCOLA'], df['NO_MUNICIPIO_ESC']).isin(pares)
+    return (validos & mascara).to_numpy()
+
+
+def _gravar_parquet(ano, selecao, destino, tamanho_lote):
+    """
+    Um row group por lote filtrado da partição do ano
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    ingestao.preparar_ano(ano)
+    origem = pq.ParquetFile(os.path.join(ingestao.caminho_particao(ano), 'dados.parquet'))
+    with pq.ParquetWriter(destino, origem.schema_arrow, compression='zstd') as saida:
+        for lote in origem.iter_batches(batch_size=tamanho_lote):
+            mascara = linhas_escolas(lote.select(COLUNAS_ESCOLA).to_pandas(), *selecao)
+            if mascara.any():
+                saida.write_batch(lote.filter(pa.array(mascara)))
+
+
+def _gravar_csv(ano, selecao, destino, tamanho_lote):
+    """
+    Sem o pyarrow: lotes do CSV de origem, filtrados e acrescentados a um CSV
+    """
+    with open(destino, 'w', encoding='utf-8', newline='') as saida:
+        cabecalho = True
+        for lote in ingestao.ler_csv_resultados_em_lotes(ingestao.ARQUIVOS_POR_ANO[ano], ano, tamanho_lote):
+            df = lote[linhas_escolas(lote, *selecao)]
+            if len(df) or cabecalho:
+                df.to_csv(saida, index=False, header=cabecalho)
+                cabecalho = False
+
+
+def extrato_alunos(ano, versao, chave, escolas, diretorio=DIRETORIO_EXPORTACOES,
+                   tamanho_lote=TAMANHO_LOTE):
+    """
+    Grava em Parquet (ou CSV, ver `formato_extrato`) os alunos das escolas
+    filtradas e retorna o caminho do arquivo.
+
+    A partição Parquet do ano é lida em lotes de `tamanho_lote` linhas e cada
+    lote filtrado vira um row group do arquivo, de modo que a memória usada
+    não depende do tamanho do ano nem do extrato. O arquivo é identificado
+    pela versão dos dados e pela chave dos filtros e reaproveitado enquanto
+    existir. `escolas` é a tabela por escola filtrada (ver `selecao_escolas`).
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    destino = _caminho_extrato(ano, versao, chave, diretorio)
+    with _usando(destino):
+        try:
+            os.utime(destino)
+            return destino
+        except FileNotFoundError:
+            pass
+
+        # Temporário próprio desta gravação: pedidos simultâneos não se misturam
+        temporario = f'{destino}.{uuid.uuid4().hex[:8]}.tmp'
+        selecao = selecao_escolas(escolas)
+        if formato_extrato() == 'parquet':
+            _gravar_parquet(ano, selecao, temporario, tamanho_lote)
+        else:
+            _gravar_csv(ano, selecao, temporario, tamanho_lote)
+        os.replace(temporario, destino)
+
+        _remover_antigos(diretorio, MAXIMO_EXTRATOS)
+    return destino
+
+
+def bytes_extrato_alunos(ano, versao, chave, escolas, diretorio=DIRETORIO_EXPORTACOES):
+    """
+    Conteúdo do extrato por aluno, para o `st.download_button` (o arquivo é
+    lido e fechado aqui, sem deixar um descritor aberto para o Streamlit)
+    """
+    with _usando(_caminho_extrato(ano, versao, chave, diretorio)):
+        with open(extrato_alunos(ano, versao, chave, escolas, diretorio), 'rb') as arquivo:
+            return arquivo.read()
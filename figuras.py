@@ -0,0 +1,482 @@
+"""
+Construção das figuras do dashboard e cache LRU das figuras prontas
+
+Cada gráfico é montado por uma função pura a partir das tabelas já
+filtradas. O CacheFiguras guarda as figuras prontas, indexadas pelo nome do
+gráfico, pela versão do dataset e pela chave normalizada dos filtros, para que
+interações que não mudam os dados de um gráfico (como a busca na tabela) não o
+reconstruam.
+
+O tamanho do que vai para o navegador não cresce com os dados: as dispersões
+passam a WebGL acima de LIMITE_SVG pontos e são decimadas no servidor até
+MAXIMO_PONTOS (um ponto por célula de uma grade, por dependência), os box
+plots recebem os quartis já calculados e a distribuição por aluno chega em
+contagens por faixa (histogramas.py).
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+CORES_DEPENDENCIA = {
+    'Federal': '#FF6B6B',
+    'Estadual': '#4ECDC4',
+    'Municipal': '#45B7D1',
+    'Privada': '#96CEB4'
+}
+
+AREAS = ['Nota_CN', 'Nota_CH', 'Nota_LC', 'Nota_MT', 'Nota_Redacao']
+NOMES_AREAS = ['Ciências Natureza', 'Ciências Humanas', 'Linguagens', 'Matemática', 'Redação']
+
+# Acima deste número de pontos as dispersões usam WebGL em vez de SVG
+LIMITE_SVG = 1_000
+
+# Pontos enviados ao navegador por dispersão e células da grade de decimação por eixo
+MAXIMO_PONTOS = 5_000
+CELULAS_DECIMACAO = 200
+
+
+class CacheFiguras:
+    """
+    Cache LRU de figuras com contadores de acertos e falhas
+    """
+
+    def __init__(self, capacidade=64):
+        self.capacidade = capacidade
+        self.acertos = 0
+        self.falhas = 0
+        self._figuras = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave, construtor, *args, **kwargs):
+        """
+        Retorna a figura da chave, construindo-a (e guardando) se não existir
+        """
+        with self._trava:
+            if chave in self._figuras:
+                self._figuras.move_to_end(chave)
+                self.acertos += 1
+                return self._figuras[chave]
+            self.falhas += 1
+
+        figura = construtor(*args, **kwargs)
+
+        with self._trava:
+            self._figuras[chave] = figura
+            self._figuras.move_to_end(chave)
+            while len(self._figuras) > self.capacidade:
+                self._figuras.popitem(last=False)
+        return figura
+
+    def estatisticas(self):
+        with self._trava:
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'tamanho': len(self._figuras),
+                'capacidade': self.capacidade,
+            }
+
+
+def decimar(df, x, y, grupo='DEPENDENCIA_NOME', maximo=MAXIMO_PONTOS, celulas=CELULAS_DECIMACAO):
+    """
+    No máximo `maximo` linhas que preservam a forma da dispersão de x por y.
+
+    Cada ponto cai em uma célula de uma grade celulas x celulas (por grupo,
+    para não apagar uma cor); fica um ponto por célula ocupada, o de mais
+    participantes quando a tabela os tiver, de modo que extremos e regiões
+    esparsas continuam visíveis. Se ainda sobrarem pontos demais, as células
+    são sorteadas (semente fixa). A ordem das linhas é mantida.
+    """
+    if len(df) <= maximo:
+        return df
+    valores_x = df[x].to_numpy(dtype=float, na_value=np.nan)
+    valores_y = df[y].to_numpy(dtype=float, na_value=np.nan)
+    validos = ~np.isnan(valores_x) & ~np.isnan(valores_y)
+
+    def celula(valores):
+        minimo, maximo_valor = np.nanmin(valores), np.nanmax(valores)
+        escala = celulas / ((maximo_valor - minimo) or 1)
+        return np.clip(np.nan_to_num((valores - minimo) * escala).astype(np.int64), 0, celulas - 1)
+
+    grupos = pd.factorize(df[grupo])[0] if grupo in df.columns else np.zeros(len(df), dtype=np.int64)
+    codigos = (grupos * celulas + celula(valores_x)) * celulas + celula(valores_y)
+    codigos[~validos] = -1
+
+    # O primeiro de cada célula na ordem de prioridade
+    if 'Participantes' in df.columns:
+        ordem = np.argsort(-df['Participantes'].to_numpy(dtype=float), kind='stable')
+    else:
+        ordem = np.arange(len(df))
+    _, primeiros = np.unique(codigos[ordem], return_index=True)
+    escolhidos = ordem[primeiros]
+    escolhidos = escolhidos[codigos[escolhidos] >= 0]
+    if len(escolhidos) > maximo:
+        escolhidos = np.random.default_rng(0).choice(escolhidos, maximo, replace=False)
+    return df.iloc[np.sort(escolhidos)]
+
+
+def _dispersao(df, x, y, titulo):
+    """
+    Pontos a enviar, modo de renderização e título (com o total quando os
+    pontos foram decimados)
+    """
+    pontos = decimar(df, x, y)
+    if len(pontos) < len(df):
+        titulo = f"{titulo} ({len(pontos):,} de {len(df):,} escolas)"
+    return pontos, ('webgl' if len(df) > LIMITE_SVG else 'svg'), titulo
+
+
+def quantis_box(df, grupo, coluna):
+    """
+    Quartis, média, contagem e bigodes de cada grupo, como o plotly os
+    calcularia no navegador (quartis lineares; bigodes no dado mais extremo
+    dentro de 1,5 IQR)
+    """
+    valores = df[[grupo, coluna]].dropna()
+    agrupado = valores.groupby(grupo, observed=True)[coluna]
+    estatisticas = agrupado.quantile([0.25, 0.5, 0.75]).unstack()
+    estatisticas.columns = ['q1', 'mediana', 'q3']
+    estatisticas['media'] = agrupado.mean()
+    estatisticas['n'] = agrupado.size()
+
+    iqr = estatisticas['q3'] - estatisticas['q1']
+    limite_inferior = valores[grupo].map(estatisticas['q1'] - 1.5 * iqr)
+    limite_superior = valores[grupo].map(estatisticas['q3'] + 1.5 * iqr)
+    dentro = valores[coluna].between(limite_inferior, limite_superior)
+    estatisticas['bigode_inferior'] = valores[dentro].groupby(grupo, observed=True)[coluna].min()
+    estatisticas['bigode_superior'] = valores[dentro].groupby(grupo, observed=True)[coluna].max()
+    # Grupos na ordem em que aparecem, como no px.box
+    return estatisticas.reindex(valores[grupo].unique())
+
+
+def figura_ranking(df_filtrado, limite=20):
+    """
+    Barras com as melhores escolas por Score Final (com o intervalo de
+    confiança, quando a tabela o trouxer)
+    """
+    top_escolas = df_filtrado.head(limite)
+    opcoes = {}
+    if {'IC_Inferior', 'IC_Superior'} <= set(top_escolas.columns):
+        # Barras de erro com o intervalo de confiança do bootstrap
+        top_escolas = top_escolas.assign(
+            erro_mais=top_escolas['IC_Superior'] - top_escolas['SCORE_FINAL'],
+            erro_menos=top_escolas['SCORE_FINAL'] - top_escolas['IC_Inferior'],
+        )
+        opcoes = {'error_x': 'erro_mais', 'error_x_minus': 'erro_menos'}
+
+    hover = ['Municipio', 'Participantes', 'Classificacao']
+    hover += [coluna for coluna in ('Classificacao_Min', 'Classificacao_Max') if coluna in top_escolas.columns]
+    fig = px.bar(
+        top_escolas,
+        y='NOME_ESCOLA',
+        x='SCORE_FINAL',
+        color='DEPENDENCIA_NOME',
+        title=f"Top {limite} Escolas por Score Final",
+        hover_data=hover,
+        color_discrete_map=CORES_DEPENDENCIA,
+        **opcoes
+    )
+    fig.update_layout(
+        height=600,
+        yaxis={'categoryorder': 'total ascending'}
+    )
+    return fig
+
+
+def figura_radar(df_filtrado, quantidade=5):
+    """
+    Perfil por área de conhecimento das melhores escolas
+    """
+    fig = go.Figure()
+
+    for _, row in df_filtrado.head(quantidade).iterrows():
+        escola_nome = row['NOME_ESCOLA']
+        if len(escola_nome) > 30:
+            escola_nome = escola_nome[:27] + "..."
+
+        fig.add_trace(go.Scatterpolar(
+            r=[row[area] for area in AREAS],
+            theta=NOMES_AREAS,
+            fill='toself',
+            name=escola_nome
+        ))
+
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[400, 700]
+            )),
+        title=f"Top {quantidade} Escolas - Perfil por Área",
+        height=400
+    )
+    return fig
+
+
+def figura_box(df_filtrado):
+    """
+    Distribuição de scores por dependência administrativa, a partir dos
+    quartis calculados no servidor (sem enviar os pontos)
+    """
+    estatisticas = quantis_box(df_filtrado, 'DEPENDENCIA_NOME', 'SCORE_FINAL')
+    fig = go.Figure()
+    for dependencia, linha in estatisticas.iterrows():
+        fig.add_trace(go.Box(
+            x=[dependencia],
+            q1=[linha['q1']],
+            median=[linha['mediana']],
+            q3=[linha['q3']],
+            mean=[linha['media']],
+            lowerfence=[linha['bigode_inferior']],
+            upperfence=[linha['bigode_superior']],
+            name=dependencia,
+            marker_color=CORES_DEPENDENCIA.get(dependencia)
+        ))
+    fig.update_layout(
+        title="Distribuição de Scores por Dependência",
+        xaxis_title='DEPENDENCIA_NOME',
+        yaxis_title='SCORE_FINAL',
+        legend_title_text='DEPENDENCIA_NOME',
+        height=400
+    )
+    return fig
+
+
+def figura_scatter(df_filtrado):
+    """
+    Score da parte objetiva contra a nota da redação
+    """
+    pontos, modo, titulo = _dispersao(df_filtrado, 'SCORE_OBJETIVA', 'Nota_Redacao',
+                                      "Relação entre Score Objetiva e Nota da Redação")
+    fig = px.scatter(
+        pontos,
+        x='SCORE_OBJETIVA',
+        y='Nota_Redacao',
+        size='Participantes',
+        color='DEPENDENCIA_NOME',
+        hover_data=['NOME_ESCOLA', 'Municipio', 'Classificacao'],
+        title=titulo,
+        color_discrete_map=CORES_DEPENDENCIA,
+        render_mode=modo
+    )
+    fig.update_layout(height=500)
+    return fig
+
+
+def figura_scatter_participantes(df_filtrado, tendencias):
+    """
+    Score Final contra número de participantes, com linha de tendência.
+
+    As retas vêm de `tendencias` (regressao.tendencias_participantes), já
+    calculadas para todas as dependências de uma vez (sobre todas as
+    escolas, mesmo quando os pontos são decimados).
+    """
+    pontos, modo, titulo = _dispersao(df_filtrado, 'Participantes', 'SCORE_FINAL',
+                                      'Score Final vs Número de Participantes por Escola')
+    fig = px.scatter(
+        pontos,
+        x='Participantes',
+        y='SCORE_FINAL',
+        size='Participantes',
+        color='DEPENDENCIA_NOME',
+        hover_data=['NOME_ESCOLA', 'Municipio', 'Classificacao'],
+        title=titulo,
+        render_mode=modo,
+        labels={
+            'Participantes': 'Número de Participantes',
+            'SCORE_FINAL': 'Score Final Médio',
+            'NOME_ESCOLA': 'Escola',
+            'DEPENDENCIA_NOME': 'Dependência'
+        },
+        color_discrete_map=CORES_DEPENDENCIA
+    )
+
+    fig.update_layout(
+        height=600,
+        showlegend=True
+    )
+
+    # Customizar hover template
+    fig.update_traces(
+        hovertemplate="<b>%{customdata[0]}</b><br>" +
+                      "Participantes: %{x}<br>" +
+                      "Score Final: %{y:.1f}<br>" +
+                      "Dependência: %{customdata[3]}<br>" +
+                      "Município: %{customdata[1]}<br>" +
+                      "Classificação: #%{customdata[2]}<br>" +
+                      "<extra></extra>"
+    )
+
+    # Adiciona linha de tendência de cada dependência presente no gráfico
+    for dependencia in df_filtrado['DEPENDENCIA_NOME'].dropna().unique():
+        if dependencia not in tendencias.index:
+            continue
+        ajuste = tendencias.loc[dependencia]
+        if pd.isna(ajuste['inclinacao']):
+            continue
+        x_linha = [ajuste['x_min'], ajuste['x_max']]
+        fig.add_trace(go.Scatter(
+            x=x_linha,
+            y=[ajuste['intercepto'] + ajuste['inclinacao'] * x for x in x_linha],
+            mode='lines',
+            line=dict(color=CORES_DEPENDENCIA.get(dependencia)),
+            name=f"Tendência {dependencia}",
+            showlegend=False,
+            hovertemplate=f"<b>Tendência {dependencia}</b><br>"
+                          f"Score = {ajuste['intercepto']:.1f} + {ajuste['inclinacao']:.3f} × Participantes<br>"
+                          f"r = {ajuste['r']:.3f} (n = {int(ajuste['n'])})"
+                          "<extra></extra>"
+        ))
+    return fig
+
+
+def _rotulos_escolas(tabela):
+    """
+    Nome da escola, com o município quando o nome se repete na tabela
+    """
+    repetidos = tabela['NOME_ESCOLA'].duplicated(keep=False)
+    return tabela['NOME_ESCOLA'].where(~repetidos, tabela['NOME_ESCOLA'] + ' (' + tabela['Municipio'] + ')')
+
+
+def figura_comparacao(comparacao, top_n, limite=15):
+    """
+    Score médio geral contra o score dos N melhores alunos, por escola.
+
+    Recebe a tabela de agregacoes.tabela_comparacao e mostra as `limite`
+    primeiras escolas (na ordem da classificação geral).
+    """
+    tabela = comparacao.head(limite)
+    tipo_top_n = f'Top {top_n} Alunos'
+    df_comp = pd.DataFrame({
+        'Escola': _rotulos_escolas(tabela),
+        'Média Geral': tabela['SCORE_FINAL'],
+        tipo_top_n: tabela['SCORE_FINAL_TOPN'],
+    }).melt(id_vars='Escola', var_name='Tipo', value_name='Score')
+
+    fig = px.bar(
+        df_comp,
+        x='Escola',
+        y='Score',
+        color='Tipo',
+        barmode='group',
+        title=f'Comparação: Score Médio Geral vs Top {top_n} Alunos por Escola',
+        color_discrete_map={
+            'Média Geral': '#45B7D1',
+            tipo_top_n: '#FF6B6B'
+        }
+    )
+    fig.update_layout(
+        xaxis_tickangle=-45,
+        height=500,
+        xaxis_title="Escola",
+        yaxis_title="Score Final"
+    )
+    return fig
+
+
+def figura_comparacao_todas(comparacao, top_n):
+    """
+    Todas as escolas: média geral (x) contra média dos N melhores (y).
+
+    Com centenas de escolas, barras agrupadas ficam ilegíveis; a dispersão
+    com a diagonal y = x mostra quanto o topo de cada escola se afasta da média.
+    """
+    tabela = comparacao.assign(Escola=_rotulos_escolas(comparacao))
+    pontos, modo, titulo = _dispersao(tabela, 'SCORE_FINAL', 'SCORE_FINAL_TOPN',
+                                      f'Todas as Escolas: Score Médio Geral vs Top {top_n} Alunos')
+    fig = px.scatter(
+        pontos,
+        x='SCORE_FINAL',
+        y='SCORE_FINAL_TOPN',
+        color='DEPENDENCIA_NOME',
+        hover_data=['Escola', 'Municipio', 'Diferenca'],
+        title=titulo,
+        render_mode=modo,
+        labels={
+            'SCORE_FINAL': 'Score Médio Geral',
+            'SCORE_FINAL_TOPN': f'Score Médio Top {top_n}',
+            'DEPENDENCIA_NOME': 'Dependência',
+            'Diferenca': 'Diferença'
+        },
+        color_discrete_map=CORES_DEPENDENCIA
+    )
+    limites = [
+        min(tabela['SCORE_FINAL'].min(), tabela['SCORE_FINAL_TOPN'].min()),
+        max(tabela['SCORE_FINAL'].max(), tabela['SCORE_FINAL_TOPN'].max()),
+    ]
+    fig.add_trace(go.Scatter(
+        x=limites,
+        y=limites,
+        mode='lines',
+        line=dict(color='gray', dash='dash'),
+        name='Top N = Média Geral',
+        hoverinfo='skip'
+    ))
+    fig.update_layout(height=600)
+    return fig
+
+
+def figura_distribuicao_alunos(distribuicao, largura, titulo="Distribuição do Score Final dos Alunos"):
+    """
+    Histograma empilhado por dependência a partir das contagens por faixa
+    (histogramas.HistogramasNotas.distribuicao): uma barra por faixa ocupada
+    """
+    fig = go.Figure()
+    for dependencia, faixas in distribuicao.groupby('Dependência', sort=False):
+        fig.add_trace(go.Bar(
+            x=faixas['Faixa'] + largura / 2,
+            y=faixas['Alunos'],
+            width=largura,
+            name=dependencia,
+            marker_color=CORES_DEPENDENCIA.get(dependencia),
+            customdata=faixas['Faixa'].astype(str) + '–' + (faixas['Faixa'] + largura).astype(str),
+            hovertemplate=f"<b>{dependencia}</b><br>Score %{{customdata}}: %{{y:,}} alunos<extra></extra>"
+        ))
+    fig.update_layout(
+        barmode='stack',
+        bargap=0,
+        title=f"{titulo} ({int(distribuicao['Alunos'].sum()):,} alunos)",
+        xaxis_title='Score Final',
+        yaxis_title='Alunos',
+        height=400
+    )
+    return fig
+
+
+def figura_socioeconomica(tabela, titulo, detalhamento='Resposta'):
+    """
+    Score médio dos alunos por alternativa de uma questão do questionário.
+
+    Recebe as tabelas de socioeconomico.CruzamentosSocioeconomicos: barras
+    simples por resposta, barras agrupadas por dependência ou, por município
+    (muitos grupos), um mapa de calor município x resposta.
+    """
+    if detalhamento == 'Município':
+        matriz = tabela.pivot(index='Município', columns='Resposta', values='Score Médio')
+        matriz = matriz[[resposta for resposta in tabela['Resposta'].unique()]]
+        fig = px.imshow(
+            matriz,
+            aspect='auto',
+            color_continuous_scale='RdYlGn',
+            labels={'color': 'Score Médio'},
+            title=titulo
+        )
+        fig.update_layout(height=max(400, 18 * len(matriz)))
+        return fig
+
+    fig = px.bar(
+        tabela,
+        x='Resposta',
+        y='Score Médio',
+        color='Dependência' if detalhamento == 'Dependência' else None,
+        barmode='group',
+        hover_data=['Alunos'],
+        title=titulo,
+        color_discrete_map=CORES_DEPENDENCIA
+    )
+    fig.update_layout(xaxis_tickangle=-30, height=450)
+    return fig
@@ -0,0 +1,353 @@
+"""
+Filtra os arquivos nacionais RESULTADOS_AAAA.csv por UF
+
+Os arquivos nacionais têm vários GB e não cabem na memória de uma vez. O
+script divide cada arquivo em blocos de bytes alinhados a quebras de linha e
+processa os blocos em paralelo (ProcessPoolExecutor): cada processo lê só o
+seu bloco, separa as linhas por UF (descartando as sem UF) e grava uma partição Parquet por UF em
+`data-cache/por_uf/ano=AAAA/uf=XX/`. Ao final, gera os arquivos
+`data-raw/RESULTADOS_AAAA_XX.csv` usados pelo dashboard.
+
+A divisão em blocos de cada ano fica em `_PLANO`, com a identidade do
+arquivo de origem, e é reaproveitada ao retomar (mesmo com outro
+--tamanho-bloco). Cada bloco concluído deixa um marcador em `_blocos/` com o
+seu intervalo de bytes e as UFs gravadas; ao rodar de novo, os blocos cujo
+marcador confere com o plano e já tem as UFs pedidas são pulados sem
+nova leitura, e só as UFs que faltam são extraídas dos demais. Um ano com
+`_SUCESSO` é ignorado por inteiro quando o arquivo de origem (caminho,
+tamanho e data de modificação) é o mesmo e as UFs pedidas já foram gravadas.
+Se o arquivo de origem mudou, as partições antigas não são misturadas com as
+novas: o ano é recusado até que `--refazer` as descarte.
+
+Uso:
+    python filtrar_rn.py
+    python filtrar_rn.py data-raw/RESULTADOS_2024.csv --ufs RN PB
+    python filtrar_rn.py --todas-ufs --processos 8 --tamanho-bloco 64
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+DIRETORIO_DADOS = 'data-raw'
+DIRETORIO_SAIDA = os.path.join('data-cache', 'por_uf')
+COLUNA_UF = 'SG_UF_ESC'
+
+MB = 1024 * 1024
+
+
+def ano_do_arquivo(caminho):
+    """
+    Extrai o ano do nome RESULTADOS_AAAA.csv
+    """
+    encontrado = re.search(r'RESULTADOS_(\d{4})\.csv$', os.path.basename(caminho))
+    if not encontrado:
+        raise ValueError(f"Nome de arquivo inesperado: {caminho}")
+    return int(encontrado.group(1))
+
+
+def dividir_em_blocos(caminho, tamanho_bloco):
+    """
+    Divide o arquivo em intervalos de bytes que começam e terminam em quebra de linha.
+
+    Retorna o cabeçalho (bytes) e a lista de (inicio, fim). Os arquivos do
+    INEP não têm quebras de linha dentro de campos, então cada intervalo
+    contém apenas linhas completas.
+    """
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, 'rb') as arquivo:
+        cabecalho = arquivo.readline()
+        inicio = arquivo.tell()
+        blocos = []
+        while inicio < tamanho:
+            arquivo.seek(min(inicio + tamanho_bloco, tamanho))
+            arquivo.readline()
+            fim = min(arquivo.tell(), tamanho)
+            blocos.append((inicio, fim))
+            inicio = fim
+    return cabecalho, blocos
+
+
+def _diretorio_ano(saida, ano):
+    return os.path.join(saida, f'ano={ano}')
+
+
+def _plano(saida, ano):
+    return os.path.join(_diretorio_ano(saida, ano), '_PLANO')
+
+
+def _marcador_bloco(saida, ano, indice):
+    return os.path.join(_diretorio_ano(saida, ano), '_blocos', f'bloco-{indice:05d}.json')
+
+
+def identidade_fonte(caminho):
+    """
+    Caminho, tamanho e data de modificação do arquivo de origem (um arquivo
+    trocado ou regravado tem outra identidade)
+    """
+    informacoes = os.stat(caminho)
+    return {
+        'caminho': os.path.abspath(caminho),
+        'tamanho': informacoes.st_size,
+        'modificado_ns': informacoes.st_mtime_ns,
+    }
+
+
+def _faltantes(feitas, pedidas):
+    """
+    UFs a extrair (incluir, excluir) dadas as já gravadas e as pedidas
+    (None = todas); None se não falta nenhuma
+    """
+    if feitas is None:
+        return None
+    if pedidas is None:
+        return None, sorted(feitas)
+    faltam = sorted(set(pedidas) - set(feitas))
+    return (faltam, []) if faltam else None
+
+
+def _ler_json(caminho):
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_json(caminho, conteudo):
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(conteudo, arquivo, indent=2)
+    os.replace(temporario, caminho)
+
+
+def processar_bloco(caminho, ano, indice, cabecalho, inicio, fim, saida, ufs, coluna_uf,
+                    excluir=(), anterior=None):
+    """
+    Lê um bloco do arquivo nacional e grava uma partição Parquet por UF.
+
+    Todas as colunas são lidas como texto para que os blocos tenham o mesmo
+    esquema e o CSV regenerado preserve os valores originais. `ufs` (None =
+    todas) e `excluir` escolhem as UFs gravadas agora; `anterior` é o
+    marcador de uma execução que já gravou outras UFs deste bloco.
+    """
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        dados = arquivo.read(fim - inicio)
+
+    df = pd.read_csv(
+        io.BytesIO(cabecalho + dados),
+        sep=';',
+        encoding='latin-1',
+        dtype=str,
+        keep_default_na=False
+    )
+    linhas_lidas = len(df)
+
+    # Linhas sem UF da escola não formam partição (nem um `uf=` vazio)
+    sem_uf = df[coluna_uf].str.strip() == ''
+    linhas_sem_uf = int(sem_uf.sum())
+    df = df[~sem_uf]
+
+    if ufs is not None:
+        df = df[df[coluna_uf].isin(ufs)]
+    if excluir:
+        df = df[~df[coluna_uf].isin(excluir)]
+
+    linhas_por_uf = {}
+    for uf, grupo in df.groupby(coluna_uf, sort=True):
+        diretorio_uf = os.path.join(_diretorio_ano(saida, ano), f'uf={uf}')
+        os.makedirs(diretorio_uf, exist_ok=True)
+        destino = os.path.join(diretorio_uf, f'bloco-{indice:05d}.parquet')
+        grupo.to_parquet(destino + '.tmp', index=False)
+        os.replace(destino + '.tmp', destino)
+        linhas_por_uf[uf] = len(grupo)
+
+    # O marcador só é gravado depois de todas as partições do bloco
+    feitas = (anterior or {}).get('ufs', [])
+    marcador = _marcador_bloco(saida, ano, indice)
+    os.makedirs(os.path.dirname(marcador), exist_ok=True)
+    _gravar_json(marcador, {
+        'inicio': inicio,
+        'fim': fim,
+        'linhas_lidas': linhas_lidas,
+        'linhas_sem_uf': linhas_sem_uf,
+        'ufs': None if ufs is None else sorted(set(feitas) | set(ufs)),
+        'linhas_por_uf': {**(anterior or {}).get('linhas_por_uf', {}), **linhas_por_uf},
+    })
+    return ano, indice, linhas_lidas, fim - inicio
+
+
+def gerar_csv_uf(saida, ano, uf, destino):
+    """
+    Concatena as partições de uma UF em um CSV (';' e latin-1), bloco a bloco
+    """
+    diretorio_uf = os.path.join(_diretorio_ano(saida, ano), f'uf={uf}')
+    partes = sorted(glob.glob(os.path.join(diretorio_uf, 'bloco-*.parquet')))
+    if not partes:
+        return 0
+    temporario = destino + '.tmp'
+    linhas = 0
+    with open(temporario, 'w', encoding='latin-1', newline='') as arquivo:
+        for i, parte in enumerate(partes):
+            df = pd.read_parquet(parte)
+            df.to_csv(arquivo, sep=';', index=False, header=(i == 0))
+            linhas += len(df)
+    os.replace(temporario, destino)
+    return linhas
+
+
+def _formatar_taxa(linhas, segundos):
+    return f"{linhas / segundos:,.0f} linhas/s" if segundos > 0 else "-"
+
+
+def filtrar(arquivos, ufs, saida, tamanho_bloco, processos, coluna_uf, gerar_csv, diretorio_csv,
+            refazer=False):
+    """
+    Processa os arquivos nacionais, retomando execuções interrompidas; retorna
+    os anos recusados (arquivo de origem diferente do da execução anterior)
+    """
+    tarefas = []
+    pendentes_por_ano = {}
+    recusados = []
+    for caminho in arquivos:
+        ano = ano_do_arquivo(caminho)
+        diretorio_ano = _diretorio_ano(saida, ano)
+        fonte = identidade_fonte(caminho)
+        sucesso = _ler_json(os.path.join(diretorio_ano, '_SUCESSO'))
+        plano = _ler_json(_plano(saida, ano))
+        # Partições de outro arquivo (ou de uma execução sem plano) não são reaproveitadas
+        existentes = os.path.isdir(diretorio_ano) and bool(os.listdir(diretorio_ano))
+        if existentes and (plano is None or plano.get('fonte') != fonte):
+            if not refazer:
+                print(f"❌ {ano}: {caminho} não é o mesmo arquivo da execução anterior; "
+                      f"use --refazer para descartar {diretorio_ano}", file=sys.stderr)
+                recusados.append(ano)
+                continue
+            shutil.rmtree(diretorio_ano)
+            sucesso = plano = None
+        if sucesso is not None and _faltantes(sucesso['ufs'], ufs) is None:
+            print(f"✅ {ano}: já concluído, pulando {caminho}")
+            continue
+
+        if plano is None:
+            cabecalho, blocos = dividir_em_blocos(caminho, tamanho_bloco)
+            os.makedirs(diretorio_ano, exist_ok=True)
+            _gravar_json(_plano(saida, ano), {'fonte': fonte, 'tamanho_bloco': tamanho_bloco, 'blocos': blocos})
+        else:
+            with open(caminho, 'rb') as arquivo:
+                cabecalho = arquivo.readline()
+            blocos = [tuple(bloco) for bloco in plano['blocos']]
+            if plano['tamanho_bloco'] != tamanho_bloco:
+                print(f"ℹ️  {ano}: mantendo os blocos de {plano['tamanho_bloco'] / MB:g} MB da execução anterior")
+        restantes = []
+        for indice, (inicio, fim) in enumerate(blocos):
+            anterior = _ler_json(_marcador_bloco(saida, ano, indice))
+            if anterior is not None and (anterior.get('inicio'), anterior.get('fim')) != (inicio, fim):
+                anterior = None
+            faltantes = _faltantes([] if anterior is None else anterior.get('ufs', []), ufs)
+            if faltantes is not None:
+                restantes.append((indice, inicio, fim, *faltantes, anterior))
+        print(f"📄 {caminho}: {len(blocos)} blocos, {len(blocos) - len(restantes)} já processados")
+        pendentes_por_ano[ano] = (caminho, fonte, sucesso)
+        tarefas.extend(
+            (caminho, ano, indice, cabecalho, inicio, fim, saida, incluir, coluna_uf, excluir, anterior)
+            for indice, inicio, fim, incluir, excluir, anterior in restantes
+        )
+
+    inicio_execucao = time.perf_counter()
+    linhas_total = 0
+    bytes_total = 0
+    if tarefas:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            futuros = [executor.submit(processar_bloco, *tarefa) for tarefa in tarefas]
+            for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+                ano, indice, linhas, lidos = futuro.result()
+                linhas_total += linhas
+                bytes_total += lidos
+                decorrido = time.perf_counter() - inicio_execucao
+                print(f"   {ano} bloco {indice:05d}: {linhas:,} linhas "
+                      f"[{concluidos}/{len(tarefas)}] {_formatar_taxa(linhas_total, decorrido)}, "
+                      f"{bytes_total / MB / decorrido:,.1f} MB/s")
+
+    for ano, (caminho, fonte, sucesso) in sorted(pendentes_por_ano.items()):
+        diretorio_ano = _diretorio_ano(saida, ano)
+        marcadores = glob.glob(os.path.join(diretorio_ano, '_blocos', 'bloco-*.json'))
+        sem_uf = sum((_ler_json(marcador) or {}).get('linhas_sem_uf', 0) for marcador in marcadores)
+        if sem_uf:
+            print(f"⚠️  {ano}: {sem_uf:,} linhas sem {coluna_uf} descartadas")
+        if gerar_csv:
+            ufs_ano = ufs or sorted(
+                nome.split('=', 1)[1] for nome in os.listdir(diretorio_ano) if nome.startswith('uf=')
+            )
+            for uf in ufs_ano:
+                destino = os.path.join(diretorio_csv, f'RESULTADOS_{ano}_{uf}.csv')
+                linhas = gerar_csv_uf(saida, ano, uf, destino)
+                if linhas:
+                    print(f"💾 {destino}: {linhas:,} participantes")
+                else:
+                    print(f"⚠️  {ano}: nenhuma linha encontrada para {uf}")
+        # UFs gravadas nesta execução e nas anteriores do mesmo arquivo
+        feitas = None if ufs is None or (sucesso is not None and sucesso['ufs'] is None) else sorted(
+            set(ufs) | set(sucesso['ufs'] if sucesso is not None else [])
+        )
+        _gravar_json(os.path.join(diretorio_ano, '_SUCESSO'), {'fonte': fonte, 'ufs': feitas})
+
+    decorrido = time.perf_counter() - inicio_execucao
+    print(f"\n⏱️  {linhas_total:,} linhas em {decorrido:.1f}s ({_formatar_taxa(linhas_total, decorrido)})")
+    return recusados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('arquivos', nargs='*',
+                        help="Arquivos nacionais (padrão: data-raw/RESULTADOS_AAAA.csv)")
+    parser.add_argument('--ufs', nargs='+', default=['RN'],
+                        help="UFs a manter (padrão: RN)")
+    parser.add_argument('--todas-ufs', action='store_true',
+                        help="Particiona todas as UFs em vez de filtrar")
+    parser.add_argument('--coluna-uf', default=COLUNA_UF,
+                        help="Coluna usada para a UF (padrão: SG_UF_ESC)")
+    parser.add_argument('--saida', default=DIRETORIO_SAIDA,
+                        help="Diretório das partições por UF")
+    parser.add_argument('--tamanho-bloco', type=int, default=32,
+                        help="Tamanho de cada bloco em MB (limita a memória por processo)")
+    parser.add_argument('--processos', type=int, default=os.cpu_count(),
+                        help="Número de processos em paralelo")
+    parser.add_argument('--sem-csv', action='store_true',
+                        help="Não gera os arquivos RESULTADOS_AAAA_UF.csv")
+    parser.add_argument('--refazer', action='store_true',
+                        help="Descarta as partições de anos cujo arquivo de origem mudou")
+    args = parser.parse_args()
+
+    arquivos = args.arquivos or sorted(
+        glob.glob(os.path.join(DIRETORIO_DADOS, 'RESULTADOS_[0-9][0-9][0-9][0-9].csv'))
+    )
+    if not arquivos:
+        print("❌ Nenhum arquivo RESULTADOS_AAAA.csv encontrado.", file=sys.stderr)
+        return 1
+
+    recusados = filtrar(
+        arquivos,
+        ufs=None if args.todas_ufs else [uf.upper() for uf in args.ufs],
+        saida=args.saida,
+        tamanho_bloco=args.tamanho_bloco * MB,
+        processos=args.processos,
+        coluna_uf=args.coluna_uf,
+        gerar_csv=not args.sem_csv,
+        diretorio_csv=DIRETORIO_DADOS,
+        refazer=args.refazer
+    )
+    return 1 if recusados else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
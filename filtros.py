@@ -0,0 +1,151 @@
+"""
+Índice de filtros para as tabelas por escola
+
+Construído uma vez por tabela: cada coluna categórica vira códigos inteiros e
+uma lista de posições de linha por categoria (formato CSR: posições ordenadas
+por código + deslocamentos), e a coluna de limiar (Participantes) fica
+ordenada. Uma combinação de filtros é resolvida em posições de linha a partir
+do filtro mais seletivo (interseção pelos códigos dos candidatos) e de
+`searchsorted` no limiar, sem criar máscaras sobre a tabela inteira a cada
+interação.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _coluna(df, nome):
+    """
+    Coluna ou nível do índice (as tabelas por escola são indexadas por CO_ESCOLA)
+    """
+    if nome in df.columns:
+        return df[nome]
+    return pd.Series(df.index.get_level_values(nome))
+
+
+class _PosicoesPorCategoria:
+    """
+    Posições de linha agrupadas por categoria de uma coluna
+    """
+
+    def __init__(self, serie):
+        codigos, categorias = pd.factorize(serie, sort=True)
+        self.codigos = codigos.astype(np.int32)
+        self.categorias = categorias.tolist()
+        self._codigo_por_valor = {valor: codigo for codigo, valor in enumerate(self.categorias)}
+
+        validos = self.codigos >= 0
+        self._ordem = np.flatnonzero(validos)[np.argsort(self.codigos[validos], kind='stable')]
+        contagens = np.bincount(self.codigos[validos], minlength=len(self.categorias))
+        self._deslocamentos = np.r_[0, np.cumsum(contagens)]
+
+    def valores(self):
+        return list(self.categorias)
+
+    def codigos_de(self, valores):
+        """
+        Códigos das categorias pedidas (valores inexistentes são ignorados)
+        """
+        return np.array(
+            [self._codigo_por_valor[v] for v in valores if v in self._codigo_por_valor],
+            dtype=np.intp
+        )
+
+    def tamanho(self, codigos):
+        """
+        Quantidade de linhas nas categorias, sem materializar as posições
+        """
+        return int((self._deslocamentos[codigos + 1] - self._deslocamentos[codigos]).sum())
+
+    def posicoes(self, codigos):
+        """
+        Posições (ordenadas) das linhas cujas categorias estão em `codigos`
+        """
+        partes = [self._ordem[self._deslocamentos[c]:self._deslocamentos[c + 1]] for c in codigos]
+        if not partes:
+            return np.empty(0, dtype=np.intp)
+        if len(partes) == 1:
+            return partes[0]
+        return np.sort(np.concatenate(partes))
+
+
+class IndiceFiltros:
+    """
+    Resolve filtros de igualdade/pertinência e um limiar mínimo em posições de linha
+    """
+
+    def __init__(self, df, categoricas, limiar=None):
+        self.linhas = len(df)
+        self._categoricas = {coluna: _PosicoesPorCategoria(_coluna(df, coluna)) for coluna in categoricas}
+
+        self.limiar = limiar
+        if limiar is not None:
+            self._valores_limiar = df[limiar].to_numpy()
+            self._ordem_limiar = np.argsort(self._valores_limiar, kind='stable')
+            self._limiar_ordenado = self._valores_limiar[self._ordem_limiar]
+
+    def valores(self, coluna):
+        """
+        Valores distintos (ordenados) de uma coluna categórica, para os widgets
+        """
+        return self._categoricas[coluna].valores()
+
+    def maximo_limiar(self):
+        return self._limiar_ordenado[-1] if len(self._limiar_ordenado) else 0
+
+    def chave(self, filtros=None, minimo=None):
+        """
+        Tupla normalizada e hasheável que identifica o resultado de `resolver`.
+
+        Filtros equivalentes geram a mesma chave: colunas sem restrição (ou com
+        todas as categorias marcadas) são omitidas, os valores são ordenados e
+        um mínimo que não exclui nenhuma linha é descartado.
+        """
+        partes = []
+        for coluna, valores in sorted((filtros or {}).items()):
+            if not valores:
+                continue
+            categoria = self._categoricas[coluna]
+            aceitos = tuple(sorted(set(valores) & set(categoria.categorias)))
+            if len(aceitos) < len(categoria.categorias):
+                partes.append((coluna, aceitos))
+
+        if minimo is not None and self.limiar is not None and self.linhas:
+            if minimo > self._limiar_ordenado[0]:
+                partes.append((self.limiar, minimo))
+        return tuple(partes)
+
+    def resolver(self, filtros=None, minimo=None):
+        """
+        Retorna as posições (em ordem crescente) que atendem a todos os filtros.
+
+        `filtros` mapeia coluna -> lista de valores aceitos; listas vazias ou
+        None não restringem a coluna, como nos multiselects do dashboard.
+        """
+        restricoes = []
+        for coluna, valores in (filtros or {}).items():
+            if valores:
+                categoria = self._categoricas[coluna]
+                codigos = categoria.codigos_de(valores)
+                restricoes.append((categoria.tamanho(codigos), categoria, codigos))
+        usa_limiar = minimo is not None and self.limiar is not None
+
+        if not restricoes:
+            if not usa_limiar:
+                return np.arange(self.linhas)
+            # Só o limiar: a cauda do array ordenado já é a resposta
+            inicio = np.searchsorted(self._limiar_ordenado, minimo, side='left')
+            return np.sort(self._ordem_limiar[inicio:])
+
+        # Materializa só o filtro mais seletivo; os demais são conferidos
+        # pelos códigos dos candidatos, em tempo proporcional a eles
+        restricoes.sort(key=lambda restricao: restricao[0])
+        _, categoria, codigos = restricoes[0]
+        posicoes = categoria.posicoes(codigos)
+        for _, categoria, codigos in restricoes[1:]:
+            if len(posicoes) == 0:
+                break
+            posicoes = posicoes[np.isin(categoria.codigos[posicoes], codigos)]
+
+        if usa_limiar:
+            posicoes = posicoes[self._valores_limiar[posicoes] >= minimo]
+        return posicoes
@@ -0,0 +1,359 @@
+"""
+Gera arquivos RESULTADOS_* sintéticos com o mesmo formato dos dados do INEP
+
+Os dados reais não podem ser distribuídos com o repositório. Este script
+produz arquivos com as mesmas colunas, separador ';' e encoding latin-1 dos
+arquivos usados pelo dashboard: o esquema de 76 colunas dos microdados de
+2022/2023 (sem CO_ESCOLA, com o questionário Q001-Q025) e o de 42 colunas dos
+resultados de 2024 (com CO_ESCOLA), ambos acrescidos de NOME_ESCOLA,
+SCORE_OBJETIVA e SCORE_FINAL, como nos arquivos filtrados do RN.
+
+As cardinalidades seguem as reais (~40 participantes por escola, 167
+municípios no RN, 5.570 no país), o tamanho das escolas tem cauda longa e as
+notas combinam o efeito da dependência administrativa, o da escola e o do
+aluno, com faltas por dia de prova e redações em múltiplos de 20.
+
+A escala 1 corresponde ao RN de 2024 (28 mil linhas); a escala ~143, ao país
+(~4 milhões). O arquivo é gerado e gravado em lotes, com memória limitada.
+
+Uso:
+    python gerar_dados_sinteticos.py
+    python gerar_dados_sinteticos.py --anos 2024 --escala 10 --saida /tmp/enem
+    python gerar_dados_sinteticos.py --nacional --escala 143
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+LINHAS_RN = 28_000
+PARTICIPANTES_POR_ESCOLA = 40
+TAMANHO_LOTE = 250_000
+
+# UF -> (código IBGE, municípios, participação nas inscrições)
+UFS = {
+    'AC': (12, 22, 0.005), 'AL': (27, 102, 0.016), 'AM': (13, 62, 0.021), 'AP': (16, 16, 0.005),
+    'BA': (29, 417, 0.074), 'CE': (23, 184, 0.057), 'DF': (53, 1, 0.014), 'ES': (32, 78, 0.016),
+    'GO': (52, 246, 0.029), 'MA': (21, 217, 0.037), 'MG': (31, 853, 0.093), 'MS': (50, 79, 0.011),
+    'MT': (51, 141, 0.015), 'PA': (15, 144, 0.051), 'PB': (25, 223, 0.025), 'PE': (26, 185, 0.052),
+    'PI': (22, 224, 0.022), 'PR': (41, 399, 0.040), 'RJ': (33, 92, 0.064), 'RN': (24, 167, 0.016),
+    'RO': (11, 52, 0.008), 'RR': (14, 15, 0.003), 'RS': (43, 497, 0.040), 'SC': (42, 295, 0.024),
+    'SE': (28, 75, 0.011), 'SP': (35, 645, 0.199), 'TO': (17, 139, 0.007),
+}
+
+MUNICIPIOS_RN = [
+    'Natal', 'Mossoró', 'Parnamirim', 'São Gonçalo do Amarante', 'Caicó', 'Macaíba',
+    'Ceará-Mirim', 'Açu', 'Currais Novos', 'Santa Cruz', 'Nova Cruz', 'Apodi',
+    'João Câmara', 'Pau dos Ferros', 'Canguaretama', 'Touros', 'Macau', 'Extremoz',
+]
+
+# Dependência: (código, proporção das escolas, efeito médio na nota, prefixos do nome)
+DEPENDENCIAS = [
+    (1, 0.04, 60, ['INSTITUTO FEDERAL DE EDUCAÇÃO', 'IFRN CAMPUS']),
+    (2, 0.62, -15, ['ESCOLA ESTADUAL', 'E E', 'CENTRO ESTADUAL DE EDUCAÇÃO']),
+    (3, 0.04, -25, ['ESCOLA MUNICIPAL', 'E M']),
+    (4, 0.30, 55, ['COLÉGIO', 'CENTRO EDUCACIONAL', 'INSTITUTO', 'ESCOLA']),
+]
+
+PATRONOS = [
+    'SÃO JOSÉ', 'JOÃO XXIII', 'PROFESSORA MARIA DE LOURDES', 'DOM JOSÉ DE MEDEIROS', 'NOSSA SENHORA DAS GRAÇAS',
+    'SANTA LUZIA', 'PADRE JOÃO MARIA', 'PRESIDENTE KENNEDY', 'TIRADENTES', 'CÂMARA CASCUDO',
+    'PROFESSOR ANTÔNIO FAGUNDES', 'AUTA DE SOUZA', 'ZILA MAMEDE', 'NÍSIA FLORESTA', 'SÃO FRANCISCO DE ASSIS',
+    'SANTA TERESINHA', 'MONSENHOR WALFREDO GURGEL', 'CASTRO ALVES', 'RUI BARBOSA', 'MONTEIRO LOBATO',
+    'JOSÉ DE ALENCAR', 'PROFESSORA JOSEFA SAMPAIO', 'DR. ÁLVARO DE VASCONCELOS', 'CORONEL JOSÉ BERNARDO',
+    'ANCHIETA', 'SÃO LUÍS', 'SAGRADA FAMÍLIA', 'IMACULADA CONCEIÇÃO', 'MARISTA', 'SALESIANO',
+]
+
+# Média e desvio das notas objetivas (CN, CH, LC, MT), como nos dados reais
+NOTAS = {
+    'CN': (495, 75),
+    'CH': (520, 80),
+    'LC': (510, 70),
+    'MT': (530, 110),
+}
+
+COLUNAS_76 = (
+    ['NU_INSCRICAO', 'NU_ANO', 'TP_FAIXA_ETARIA', 'TP_SEXO', 'TP_ESTADO_CIVIL', 'TP_COR_RACA',
+     'TP_NACIONALIDADE', 'TP_ST_CONCLUSAO', 'TP_ANO_CONCLUIU', 'TP_ESCOLA', 'TP_ENSINO', 'IN_TREINEIRO',
+     'CO_MUNICIPIO_ESC', 'NO_MUNICIPIO_ESC', 'CO_UF_ESC', 'SG_UF_ESC', 'TP_DEPENDENCIA_ADM_ESC',
+     'TP_LOCALIZACAO_ESC', 'TP_SIT_FUNC_ESC', 'CO_MUNICIPIO_PROVA', 'NO_MUNICIPIO_PROVA', 'CO_UF_PROVA',
+     'SG_UF_PROVA']
+    + [f'TP_PRESENCA_{area}' for area in NOTAS]
+    + [f'CO_PROVA_{area}' for area in NOTAS]
+    + [f'NU_NOTA_{area}' for area in NOTAS]
+    + [f'TX_RESPOSTAS_{area}' for area in NOTAS]
+    + ['TP_LINGUA']
+    + [f'TX_GABARITO_{area}' for area in NOTAS]
+    + ['TP_STATUS_REDACAO']
+    + [f'NU_NOTA_COMP{i}' for i in range(1, 6)]
+    + ['NU_NOTA_REDACAO']
+    + [f'Q{i:03d}' for i in range(1, 26)]
+)
+
+COLUNAS_42 = (
+    ['NU_SEQUENCIAL', 'NU_ANO', 'CO_ESCOLA', 'CO_MUNICIPIO_ESC', 'NO_MUNICIPIO_ESC', 'CO_UF_ESC',
+     'SG_UF_ESC', 'TP_DEPENDENCIA_ADM_ESC', 'TP_LOCALIZACAO_ESC', 'TP_SIT_FUNC_ESC',
+     'CO_MUNICIPIO_PROVA', 'NO_MUNICIPIO_PROVA', 'CO_UF_PROVA', 'SG_UF_PROVA']
+    + [f'TP_PRESENCA_{area}' for area in NOTAS]
+    + [f'CO_PROVA_{area}' for area in NOTAS]
+    + [f'NU_NOTA_{area}' for area in NOTAS]
+    + [f'TX_RESPOSTAS_{area}' for area in NOTAS]
+    + ['TP_LINGUA']
+    + [f'TX_GABARITO_{area}' for area in NOTAS]
+    + ['TP_STATUS_REDACAO']
+    + [f'NU_NOTA_COMP{i}' for i in range(1, 6)]
+    + ['NU_NOTA_REDACAO']
+)
+
+# Colunas acrescentadas aos arquivos filtrados do RN e lidas pelo dashboard
+COLUNAS_ENRIQUECIDAS = ['NOME_ESCOLA', 'SCORE_OBJETIVA', 'SCORE_FINAL']
+
+# Questionário: alternativas possíveis (Q005 é numérica, de 1 a 20)
+QUESTIONARIO = {
+    **{f'Q{i:03d}': 'ABCDEFGH' for i in (1, 2)},
+    **{f'Q{i:03d}': 'ABCDEF' for i in (3, 4)},
+    'Q006': 'ABCDEFGHIJKLMNOPQ',
+    'Q007': 'ABCD',
+    **{f'Q{i:03d}': 'ABCDE' for i in (8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 19, 22, 24)},
+    **{f'Q{i:03d}': 'AB' for i in (18, 20, 21, 23, 25)},
+}
+
+
+def colunas_do_ano(ano):
+    """
+    Colunas do arquivo de um ano, na ordem do INEP, mais as enriquecidas
+    """
+    return (COLUNAS_42 if ano >= 2024 else COLUNAS_76) + COLUNAS_ENRIQUECIDAS
+
+
+def _nomes_municipios(uf, quantidade):
+    if uf == 'RN':
+        nomes = [nome.upper() for nome in MUNICIPIOS_RN]
+    else:
+        nomes = []
+    nomes += [f'MUNICÍPIO {uf} {i:04d}' for i in range(len(nomes) + 1, quantidade + 1)]
+    return nomes[:quantidade]
+
+
+def gerar_escolas(n_escolas, ufs, rng):
+    """
+    Cadastro de escolas: código, nome, município, dependência, efeito e peso
+    """
+    pesos_uf = np.array([UFS[uf][2] for uf in ufs])
+    uf_escola = rng.choice(len(ufs), size=n_escolas, p=pesos_uf / pesos_uf.sum())
+
+    codigos_municipio = np.empty(n_escolas, dtype=np.int64)
+    nomes_municipio = np.empty(n_escolas, dtype=object)
+    codigos_escola = np.empty(n_escolas, dtype=np.int64)
+    for i, uf in enumerate(ufs):
+        codigo_uf, n_municipios, _ = UFS[uf]
+        escolas_uf = np.flatnonzero(uf_escola == i)
+        # Poucos municípios concentram a maior parte das escolas (lei de Zipf)
+        pesos = 1 / np.arange(1, n_municipios + 1)
+        municipio = rng.choice(n_municipios, size=len(escolas_uf), p=pesos / pesos.sum())
+        codigos_municipio[escolas_uf] = codigo_uf * 100_000 + municipio + 1
+        nomes_municipio[escolas_uf] = np.array(_nomes_municipios(uf, n_municipios), dtype=object)[municipio]
+        codigos_escola[escolas_uf] = codigo_uf * 1_000_000 + np.arange(1, len(escolas_uf) + 1)
+
+    proporcoes = np.array([proporcao for _, proporcao, _, _ in DEPENDENCIAS])
+    dependencia = rng.choice(len(DEPENDENCIAS), size=n_escolas, p=proporcoes)
+    efeito = np.array([efeito for _, _, efeito, _ in DEPENDENCIAS])[dependencia] + rng.normal(0, 30, n_escolas)
+
+    nomes = np.empty(n_escolas, dtype=object)
+    for i, (_, _, _, prefixos) in enumerate(DEPENDENCIAS):
+        escolas_dep = np.flatnonzero(dependencia == i)
+        prefixo = rng.choice(prefixos, size=len(escolas_dep))
+        patrono = rng.choice(PATRONOS, size=len(escolas_dep))
+        nomes[escolas_dep] = [f'{p} {q}' for p, q in zip(prefixo, patrono)]
+
+    # Nomes se repetem entre municípios, como nos dados reais, mas não dentro
+    # de um mesmo município (onde o par nome/município identifica a escola)
+    repeticao = pd.DataFrame({'nome': nomes, 'municipio': codigos_municipio}).groupby(
+        ['nome', 'municipio']).cumcount().to_numpy()
+    nomes = np.where(repeticao > 0, nomes + ' - UNIDADE ' + (repeticao + 1).astype(str).astype(object), nomes)
+
+    return pd.DataFrame({
+        'CO_ESCOLA': codigos_escola,
+        'NOME_ESCOLA': nomes,
+        'CO_MUNICIPIO_ESC': codigos_municipio,
+        'NO_MUNICIPIO_ESC': nomes_municipio,
+        'CO_UF_ESC': np.array([UFS[uf][0] for uf in ufs])[uf_escola],
+        'SG_UF_ESC': np.array(ufs, dtype=object)[uf_escola],
+        'TP_DEPENDENCIA_ADM_ESC': np.array([codigo for codigo, _, _, _ in DEPENDENCIAS])[dependencia],
+        'TP_LOCALIZACAO_ESC': np.where(rng.random(n_escolas) < 0.9, 1, 2),
+        'EFEITO': efeito,
+        # Tamanho das escolas com cauda longa
+        'PESO': rng.lognormal(0, 0.8, n_escolas),
+    })
+
+
+def _respostas(rng, quantidade, tamanho=45):
+    """
+    Conjunto pequeno de cadeias de respostas, sorteadas para cada aluno
+    """
+    letras = np.array(list('ABCDE'))
+    return np.array([''.join(rng.choice(letras, tamanho)) for _ in range(quantidade)], dtype=object)
+
+
+def _com_nulos(valores, nulos):
+    serie = pd.Series(valores).astype('Int64')
+    serie[nulos] = pd.NA
+    return serie
+
+
+def gerar_lote(ano, escolas, inicio, linhas, fracao_sem_escola, rng):
+    """
+    Gera `linhas` participantes (a partir do número `inicio`) de um ano
+    """
+    pesos = escolas['PESO'].to_numpy()
+    escola = rng.choice(len(escolas), size=linhas, p=pesos / pesos.sum())
+    cadastro = escolas.iloc[escola].reset_index(drop=True)
+    sem_escola = rng.random(linhas) < fracao_sem_escola
+
+    # Habilidade latente do aluno: efeito da escola + variação individual
+    habilidade = cadastro['EFEITO'].to_numpy() + rng.normal(0, 55, linhas)
+    habilidade[sem_escola] = rng.normal(0, 70, sem_escola.sum())
+
+    falta_dia1 = rng.random(linhas) < 0.25
+    falta_dia2 = falta_dia1 | (rng.random(linhas) < 0.05)
+    faltas = {'CH': falta_dia1, 'LC': falta_dia1, 'CN': falta_dia2, 'MT': falta_dia2}
+
+    df = pd.DataFrame(index=pd.RangeIndex(linhas))
+    if ano >= 2024:
+        df['NU_SEQUENCIAL'] = np.arange(inicio, inicio + linhas) + 1
+    else:
+        df['NU_INSCRICAO'] = (ano % 100 - 1) * 10 ** 10 + np.arange(inicio, inicio + linhas) + 1
+    df['NU_ANO'] = ano
+
+    if ano < 2024:
+        df['TP_FAIXA_ETARIA'] = np.clip(rng.geometric(0.35, linhas), 1, 20)
+        df['TP_SEXO'] = np.where(rng.random(linhas) < 0.6, 'F', 'M')
+        df['TP_ESTADO_CIVIL'] = rng.choice(5, linhas, p=[0.05, 0.88, 0.05, 0.01, 0.01])
+        df['TP_COR_RACA'] = rng.choice(7, linhas, p=[0.02, 0.38, 0.10, 0.47, 0.02, 0.005, 0.005])
+        df['TP_NACIONALIDADE'] = rng.choice(5, linhas, p=[0.002, 0.98, 0.01, 0.006, 0.002])
+        df['TP_ST_CONCLUSAO'] = np.where(sem_escola, rng.choice([1, 3, 4], linhas), 2)
+        df['TP_ANO_CONCLUIU'] = np.where(sem_escola, rng.integers(1, 18, linhas), 0)
+        privada = cadastro['TP_DEPENDENCIA_ADM_ESC'].to_numpy() == 4
+        df['TP_ESCOLA'] = np.where(sem_escola, 1, np.where(privada, 3, 2))
+        df['TP_ENSINO'] = _com_nulos(np.ones(linhas), sem_escola)
+        df['IN_TREINEIRO'] = (rng.random(linhas) < 0.08).astype(int)
+
+    if ano >= 2024:
+        df['CO_ESCOLA'] = _com_nulos(cadastro['CO_ESCOLA'], sem_escola)
+    for coluna in ['CO_MUNICIPIO_ESC', 'CO_UF_ESC', 'TP_DEPENDENCIA_ADM_ESC', 'TP_LOCALIZACAO_ESC']:
+        df[coluna] = _com_nulos(cadastro[coluna], sem_escola)
+    for coluna in ['NO_MUNICIPIO_ESC', 'SG_UF_ESC']:
+        df[coluna] = cadastro[coluna].where(~sem_escola)
+    df['TP_SIT_FUNC_ESC'] = _com_nulos(np.ones(linhas), sem_escola)
+
+    # A prova é feita, em geral, no município da escola
+    df['CO_MUNICIPIO_PROVA'] = cadastro['CO_MUNICIPIO_ESC']
+    df['NO_MUNICIPIO_PROVA'] = cadastro['NO_MUNICIPIO_ESC']
+    df['CO_UF_PROVA'] = cadastro['CO_UF_ESC']
+    df['SG_UF_PROVA'] = cadastro['SG_UF_ESC']
+
+    for area, falta in faltas.items():
+        eliminado = ~falta & (rng.random(linhas) < 0.001)
+        df[f'TP_PRESENCA_{area}'] = np.where(falta, 0, np.where(eliminado, 2, 1))
+    for i, area in enumerate(NOTAS):
+        df[f'CO_PROVA_{area}'] = (ano - 2000) * 100 + i * 10 + rng.integers(1, 5, linhas)
+    for area, (media, desvio) in NOTAS.items():
+        nota = media + habilidade * desvio / 80 + rng.normal(0, desvio * 0.6, linhas)
+        nota = np.clip(nota, 300, 1000).round(1)
+        nota[faltas[area]] = np.nan
+        df[f'NU_NOTA_{area}'] = nota
+    for area in NOTAS:
+        respostas = _respostas(rng, 256)[rng.integers(0, 256, linhas)]
+        df[f'TX_RESPOSTAS_{area}'] = np.where(faltas[area], None, respostas)
+    df['TP_LINGUA'] = (rng.random(linhas) < 0.45).astype(int)
+    for area in NOTAS:
+        gabarito = _respostas(rng, 4)[df[f'CO_PROVA_{area}'].to_numpy() % 10 - 1]
+        df[f'TX_GABARITO_{area}'] = np.where(faltas[area], None, gabarito)
+
+    # Redação: 5 competências de 0 a 200 em passos de 20; status != 1 zera a nota
+    status = np.where(rng.random(linhas) < 0.03, rng.integers(2, 10, linhas), 1)
+    competencias = np.clip(np.round((120 + habilidade[:, None] * 0.5 + rng.normal(0, 30, (linhas, 5))) / 20) * 20, 0, 200)
+    competencias[status != 1] = 0
+    competencias[falta_dia1] = np.nan
+    df['TP_STATUS_REDACAO'] = _com_nulos(status, falta_dia1)
+    for i in range(5):
+        df[f'NU_NOTA_COMP{i + 1}'] = competencias[:, i]
+    df['NU_NOTA_REDACAO'] = competencias.sum(axis=1)
+
+    if ano < 2024:
+        # Renda e escolaridade dos pais acompanham a habilidade latente
+        nivel = (habilidade - habilidade.mean()) / (habilidade.std() or 1)
+        for questao, alternativas in QUESTIONARIO.items():
+            centro = (len(alternativas) - 1) / 2 + nivel * len(alternativas) / 5
+            indice = np.clip(np.round(centro + rng.normal(0, len(alternativas) / 4, linhas)), 0, len(alternativas) - 1)
+            df[questao] = np.array(list(alternativas))[indice.astype(int)]
+        df['Q005'] = np.clip(rng.poisson(3.5, linhas) + 1, 1, 20)
+
+    df['NOME_ESCOLA'] = cadastro['NOME_ESCOLA'].where(~sem_escola)
+    objetiva = df[[f'NU_NOTA_{area}' for area in NOTAS]].mean(axis=1, skipna=False)
+    df['SCORE_OBJETIVA'] = objetiva.round(2)
+    df['SCORE_FINAL'] = ((objetiva * 4 + df['NU_NOTA_REDACAO']) / 5).round(2)
+    return df[colunas_do_ano(ano)]
+
+
+def gerar_arquivo(destino, ano, linhas, ufs=('RN',), fracao_sem_escola=0.0, semente=0,
+                  tamanho_lote=TAMANHO_LOTE):
+    """
+    Grava um arquivo RESULTADOS sintético em lotes e retorna o número de linhas
+    """
+    rng = np.random.default_rng([semente, ano])
+    n_escolas = max(1, round(linhas * (1 - fracao_sem_escola) / PARTICIPANTES_POR_ESCOLA))
+    escolas = gerar_escolas(n_escolas, list(ufs), rng)
+
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    temporario = destino + '.tmp'
+    with open(temporario, 'w', encoding='latin-1', newline='') as arquivo:
+        for inicio in range(0, linhas, tamanho_lote):
+            lote = gerar_lote(ano, escolas, inicio, min(tamanho_lote, linhas - inicio), fracao_sem_escola, rng)
+            lote.to_csv(arquivo, sep=';', index=False, header=(inicio == 0))
+    os.replace(temporario, destino)
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--anos', nargs='+', type=int, default=[2022, 2023, 2024],
+                        help="Anos a gerar (2024 usa o esquema de 42 colunas)")
+    parser.add_argument('--escala', type=float, default=1.0,
+                        help="Fator de escala: 1 = RN (28 mil linhas), ~143 = Brasil (~4 milhões)")
+    parser.add_argument('--linhas', type=int,
+                        help="Número exato de linhas (ignora --escala)")
+    parser.add_argument('--nacional', action='store_true',
+                        help="Distribui as escolas por todas as UFs e grava RESULTADOS_AAAA.csv, "
+                             "com participantes sem escola, como no arquivo nacional")
+    parser.add_argument('--saida', default='data-raw',
+                        help="Diretório de saída (padrão: data-raw)")
+    parser.add_argument('--semente', type=int, default=0,
+                        help="Semente do gerador (mesma semente, mesmos arquivos)")
+    args = parser.parse_args()
+
+    linhas = args.linhas or int(LINHAS_RN * args.escala)
+    if linhas < 1:
+        print("❌ O número de linhas deve ser positivo.", file=sys.stderr)
+        return 1
+
+    for ano in args.anos:
+        if args.nacional:
+            destino = os.path.join(args.saida, f'RESULTADOS_{ano}.csv')
+            ufs, fracao_sem_escola = sorted(UFS), 0.7
+        else:
+            destino = os.path.join(args.saida, f'RESULTADOS_{ano}_RN.csv')
+            ufs, fracao_sem_escola = ['RN'], 0.0
+
+        inicio = time.perf_counter()
+        gerar_arquivo(destino, ano, linhas, ufs, fracao_sem_escola, args.semente)
+        print(f"💾 {destino}: {linhas:,} linhas, {len(colunas_do_ano(ano))} colunas, "
+              f"{os.path.getsize(destino) / 1024 / 1024:,.1f} MB em {time.perf_counter() - inicio:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
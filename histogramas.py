@@ -0,0 +1,68 @@
+"""
+Distribuição das notas dos alunos em histogramas pré-calculados por escola
+
+Montado uma vez por dataset a partir dos microdados: as notas de cada escola
+são contadas em faixas fixas de 0 a 1000 com um único `np.bincount` sobre
+(escola, faixa), formando uma matriz escolas x faixas. A distribuição de
+qualquer conjunto de escolas é a soma das linhas escolhidas, e o gráfico
+recebe só as contagens por faixa e dependência: o tamanho não depende do
+número de alunos.
+"""
+import numpy as np
+import pandas as pd
+
+import agregacoes
+
+LARGURA_FAIXA = 10
+BORDAS = np.arange(0, 1000 + LARGURA_FAIXA, LARGURA_FAIXA)
+
+
+class HistogramasNotas:
+    """
+    Alunos por faixa de nota em cada escola
+    """
+
+    def __init__(self, microdados, nota='SCORE_FINAL'):
+        self.nota = nota
+        codigos, escolas = pd.factorize(microdados['CO_ESCOLA'])
+        valores = microdados[nota].to_numpy(dtype=float, na_value=np.nan)
+        validos = (codigos >= 0) & ~np.isnan(valores)
+
+        # Faixa de cada nota; a nota máxima entra na última faixa
+        quantidade = len(BORDAS) - 1
+        faixas = np.clip((valores[validos] // LARGURA_FAIXA).astype(np.int64), 0, quantidade - 1)
+        self.contagens = np.bincount(
+            codigos[validos] * quantidade + faixas, minlength=len(escolas) * quantidade
+        ).reshape(len(escolas), quantidade).astype(np.int32)
+        self._por_codigo = pd.Series(np.arange(len(escolas)), index=escolas)
+
+        # Dependência de cada escola (a do primeiro aluno; é a mesma para todos)
+        primeiros = pd.Series(codigos).drop_duplicates()
+        primeiros = primeiros[primeiros >= 0].sort_values()
+        nomes = microdados['DEPENDENCIA_NOME'].iloc[primeiros.index].astype(object)
+        self.dependencias = [nome for nome in agregacoes.DEPENDENCIAS.values() if nome in set(nomes)]
+        posicao = {nome: indice for indice, nome in enumerate(self.dependencias)}
+        self._dependencia = nomes.map(posicao).fillna(-1).to_numpy(dtype=np.int64)
+
+    def distribuicao(self, codigos=None):
+        """
+        Alunos por faixa e dependência nas escolas escolhidas por CO_ESCOLA
+        (todas, se None), em formato longo e sem faixas vazias
+        """
+        if codigos is None:
+            posicoes = np.arange(len(self.contagens))
+        else:
+            posicoes = self._por_codigo.reindex(codigos).dropna().astype(np.int64).to_numpy()
+        posicoes = posicoes[self._dependencia[posicoes] >= 0]
+
+        dependencia = self._dependencia[posicoes]
+        totais = np.stack([
+            self.contagens[posicoes[dependencia == indice]].sum(axis=0, dtype=np.int64)
+            for indice in range(len(self.dependencias))
+        ]) if self.dependencias else np.zeros((0, self.contagens.shape[1]), dtype=np.int64)
+        dependencias, faixas = np.nonzero(totais)
+        return pd.DataFrame({
+            'Faixa': BORDAS[faixas],
+            'Dependência': np.array(self.dependencias, dtype=object)[dependencias],
+            'Alunos': totais[dependencias, faixas],
+        })
@@ -0,0 +1,318 @@
+"""
+Camada única de ingestão dos arquivos RESULTADOS do ENEM
+
+Lê apenas as colunas usadas pelo dashboard, com tipos explícitos, e mantém
+um dataset colunar particionado por ano em `data-cache/resultados/ano=AAAA/`.
+Cada partição é identificada pelo tamanho, data de modificação e hash do CSV
+de origem, de modo que as próximas inicializações não precisem refazer o parse
+do arquivo latin-1 e que cada ano só seja lido quando for pedido.
+
+Os arquivos de 2022/2023 (76 colunas) e de 2024 (42 colunas) têm esquemas
+diferentes; ESQUEMAS_POR_ANO leva cada um para o mesmo conjunto canônico de
+colunas (COLUNAS_CANONICAS).
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+ARQUIVOS_POR_ANO = {
+    2022: 'data-raw/RESULTADOS_2022_RN.csv',
+    2023: 'data-raw/RESULTADOS_2023_RN.csv',
+    2024: 'data-raw/RESULTADOS_2024_RN.csv',
+}
+
+DIRETORIO_CACHE = 'data-cache'
+DIRETORIO_DATASET = os.path.join(DIRETORIO_CACHE, 'resultados')
+
+# Colunas canônicas usadas pelo dashboard e seus tipos
+COLUNAS_CANONICAS = {
+    'NU_INSCRICAO': 'string',
+    'CO_ESCOLA': 'Int64',
+    'NOME_ESCOLA': 'string',
+    'NO_MUNICIPIO_ESC': 'string',
+    'TP_DEPENDENCIA_ADM_ESC': 'Int64',
+    'NU_NOTA_CN': 'float64',
+    'NU_NOTA_CH': 'float64',
+    'NU_NOTA_LC': 'float64',
+    'NU_NOTA_MT': 'float64',
+    'NU_NOTA_REDACAO': 'float64',
+    'SCORE_OBJETIVA': 'float64',
+    'SCORE_FINAL': 'float64',
+}
+
+NOTAS_OBJETIVAS = ['NU_NOTA_CN', 'NU_NOTA_CH', 'NU_NOTA_LC', 'NU_NOTA_MT']
+
+# Questionário socioeconômico (só nos arquivos de 2022/2023): alternativas de
+# cada questão, guardadas como categorias (códigos int8; Q005 é o número de
+# moradores, de 1 a 20)
+ALTERNATIVAS_QUESTIONARIO = {
+    **{f'Q{i:03d}': 'ABCDEFGH' for i in (1, 2)},
+    **{f'Q{i:03d}': 'ABCDEF' for i in (3, 4)},
+    'Q005': [str(moradores) for moradores in range(1, 21)],
+    'Q006': 'ABCDEFGHIJKLMNOPQ',
+    'Q007': 'ABCD',
+    **{f'Q{i:03d}': 'ABCDE' for i in (8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 19, 22, 24)},
+    **{f'Q{i:03d}': 'AB' for i in (18, 20, 21, 23, 25)},
+}
+COLUNAS_QUESTIONARIO = {
+    questao: pd.CategoricalDtype(list(alternativas))
+    for questao, alternativas in sorted(ALTERNATIVAS_QUESTIONARIO.items())
+}
+
+# Nome da coluna no arquivo de origem -> nome canônico
+_COLUNAS_COMUNS = {nome: nome for nome in COLUNAS_CANONICAS if nome != 'NU_INSCRICAO'}
+
+# 2022 e 2023: microdados completos (76 colunas, com questionário)
+ESQUEMA_76_COLUNAS = {'NU_INSCRICAO': 'NU_INSCRICAO', **_COLUNAS_COMUNS}
+
+# 2024: arquivo de resultados (42 colunas), identificado por número sequencial
+ESQUEMA_42_COLUNAS = {'NU_SEQUENCIAL': 'NU_INSCRICAO', **_COLUNAS_COMUNS}
+
+ESQUEMAS_POR_ANO = {
+    2022: ESQUEMA_76_COLUNAS,
+    2023: ESQUEMA_76_COLUNAS,
+    2024: ESQUEMA_42_COLUNAS,
+}
+
+# Incrementar sempre que a seleção de colunas, os tipos ou o mapeamento mudarem
+VERSAO_ESQUEMA = 3
+
+TAMANHO_BLOCO_HASH = 8 * 1024 * 1024
+
+
+def calcular_hash(caminho):
+    """
+    Calcula o SHA-256 do arquivo lendo em blocos
+    """
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def ler_csv_resultados(caminho, ano):
+    """
+    Faz o parse do CSV (separador ';' e encoding latin-1) e devolve as colunas canônicas.
+
+    Só as colunas mapeadas no esquema do ano são lidas; colunas canônicas
+    ausentes no arquivo entram como nulas, e os scores são derivados das
+    notas quando o arquivo não os traz. As questões do questionário
+    socioeconômico presentes no arquivo são lidas como categorias.
+    """
+    opcoes, origem = _opcoes_csv(caminho, ano)
+    return completar_esquema(pd.read_csv(caminho, **opcoes).rename(columns=origem))
+
+
+def ler_csv_resultados_em_lotes(caminho, ano, tamanho_lote):
+    """
+    Como `ler_csv_resultados`, em lotes de `tamanho_lote` linhas (para quem
+    percorre o arquivo sem o dataset colunar e sem carregá-lo inteiro)
+    """
+    opcoes, origem = _opcoes_csv(caminho, ano)
+    with pd.read_csv(caminho, chunksize=tamanho_lote, **opcoes) as lotes:
+        for lote in lotes:
+            yield completar_esquema(lote.rename(columns=origem))
+
+
+def ler_csv_como_texto(caminho, ano):
+    """
+    Colunas do esquema do ano como texto, já com os nomes canônicos e sem a
+    conversão de tipos (que interrompe o `read_csv` no primeiro valor
+    inválido): a validação converte cada coluna e aponta o que não converte
+    """
+    opcoes, origem = _opcoes_csv(caminho, ano)
+    opcoes['usecols'] = list(origem)
+    opcoes['dtype'] = str
+    return pd.read_csv(caminho, **opcoes).rename(columns=origem)
+
+
+def _opcoes_csv(caminho, ano):
+    """
+    Argumentos do `read_csv` do arquivo do ano e o mapa coluna do arquivo ->
+    coluna canônica
+    """
+    esquema = ESQUEMAS_POR_ANO.get(ano, ESQUEMA_42_COLUNAS)
+    cabecalho = pd.read_csv(caminho, sep=';', encoding='latin-1', nrows=0).columns
+    origem = {nome: canonico for nome, canonico in esquema.items() if nome in cabecalho}
+    questoes = [questao for questao in COLUNAS_QUESTIONARIO if questao in cabecalho]
+    opcoes = {
+        'sep': ';',
+        'encoding': 'latin-1',
+        'usecols': list(origem) + questoes,
+        'dtype': {
+            **{nome: COLUNAS_CANONICAS[canonico] for nome, canonico in origem.items()},
+            **{questao: COLUNAS_QUESTIONARIO[questao] for questao in questoes},
+        },
+    }
+    return opcoes, origem
+
+
+def completar_esquema(df):
+    """
+    Garante todas as colunas canônicas, na ordem e com os tipos esperados,
+    seguidas das questões do questionário que o arquivo tiver
+    """
+    if 'SCORE_OBJETIVA' not in df.columns and set(NOTAS_OBJETIVAS) <= set(df.columns):
+        df['SCORE_OBJETIVA'] = df[NOTAS_OBJETIVAS].mean(axis=1, skipna=False).round(2)
+    if 'SCORE_FINAL' not in df.columns and {'SCORE_OBJETIVA', 'NU_NOTA_REDACAO'} <= set(df.columns):
+        df['SCORE_FINAL'] = ((df['SCORE_OBJETIVA'] * len(NOTAS_OBJETIVAS) + df['NU_NOTA_REDACAO'])
+                             / (len(NOTAS_OBJETIVAS) + 1)).round(2)
+
+    for nome, tipo in COLUNAS_CANONICAS.items():
+        if nome not in df.columns:
+            df[nome] = pd.Series(pd.NA, index=df.index, dtype=tipo)
+    questoes = [questao for questao in COLUNAS_QUESTIONARIO if questao in df.columns]
+    return df[list(COLUNAS_CANONICAS) + questoes]
+
+
+def caminho_particao(ano, diretorio_dataset=DIRETORIO_DATASET):
+    """
+    Diretório da partição de um ano no dataset colunar
+    """
+    return os.path.join(diretorio_dataset, f'ano={ano}')
+
+
+def _ler_metadados(caminho_meta):
+    try:
+        with open(caminho_meta, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_metadados(caminho_meta, caminho_fonte, stat, sha256):
+    meta = {
+        'versao_esquema': VERSAO_ESQUEMA,
+        'fonte': caminho_fonte,
+        'tamanho': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256,
+    }
+    temporario = caminho_meta + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(meta, arquivo, indent=2)
+    os.replace(temporario, caminho_meta)
+
+
+def _cache_valido(meta, stat, caminho):
+    """
+    Confere se o cache corresponde ao arquivo de origem.
+
+    Tamanho e data de modificação iguais bastam; se só a data mudou (arquivo
+    copiado ou tocado), o hash decide e evita um novo parse desnecessário.
+    """
+    if meta is None or meta.get('versao_esquema') != VERSAO_ESQUEMA:
+        return False, None
+    if meta.get('tamanho') != stat.st_size:
+        return False, None
+    if meta.get('mtime_ns') == stat.st_mtime_ns:
+        return True, meta.get('sha256')
+    sha256 = calcular_hash(caminho)
+    return sha256 == meta.get('sha256'), sha256
+
+
+def anos_disponiveis(diretorio_dataset=DIRETORIO_DATASET):
+    """
+    Anos com CSV de origem ou partição já materializada
+    """
+    return sorted(
+        ano for ano, caminho in ARQUIVOS_POR_ANO.items()
+        if os.path.exists(caminho)
+        or os.path.exists(os.path.join(caminho_particao(ano, diretorio_dataset), 'dados.parquet'))
+    )
+
+
+def assinatura_fonte(ano):
+    """
+    Tamanho e data de modificação do CSV do ano (None sem o arquivo): muda
+    quando a origem muda, sem ler o arquivo
+    """
+    try:
+        stat = os.stat(ARQUIVOS_POR_ANO[ano])
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def colunas_ano(ano, diretorio_dataset=DIRETORIO_DATASET):
+    """
+    Colunas disponíveis para o ano (esquema da partição, sem ler os dados)
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return list(ler_csv_resultados(ARQUIVOS_POR_ANO[ano], ano).columns)
+    preparar_ano(ano, diretorio_dataset)
+    caminho_parquet = os.path.join(caminho_particao(ano, diretorio_dataset), 'dados.parquet')
+    return pq.read_schema(caminho_parquet).names
+
+
+def preparar_ano(ano, diretorio_dataset=DIRETORIO_DATASET):
+    """
+    Garante que a partição do ano está atualizada e retorna a versão dos dados.
+
+    O CSV só é lido quando a partição não existe ou não corresponde mais ao
+    arquivo de origem. A versão (prefixo do SHA-256 da origem) serve como
+    chave de cache para tudo que é derivado deste ano.
+    """
+    caminho = ARQUIVOS_POR_ANO[ano]
+    particao = caminho_particao(ano, diretorio_dataset)
+    caminho_parquet = os.path.join(particao, 'dados.parquet')
+    caminho_meta = os.path.join(particao, '_fonte.json')
+    meta = _ler_metadados(caminho_meta)
+
+    if not os.path.exists(caminho):
+        # Sem o CSV, vale a partição já materializada (se houver)
+        if meta is None or not os.path.exists(caminho_parquet):
+            raise FileNotFoundError(f"Arquivo de resultados de {ano} não encontrado: {caminho}")
+        return meta['sha256'][:12]
+
+    stat = os.stat(caminho)
+    valido, sha256 = _cache_valido(meta, stat, caminho)
+    if valido and os.path.exists(caminho_parquet):
+        if meta.get('mtime_ns') != stat.st_mtime_ns:
+            # Mesmo conteúdo com nova data: só atualiza os metadados
+            _gravar_metadados(caminho_meta, caminho, stat, sha256)
+        return sha256[:12]
+
+    df = ler_csv_resultados(caminho, ano)
+    sha256 = sha256 or calcular_hash(caminho)
+
+    os.makedirs(particao, exist_ok=True)
+    temporario = caminho_parquet + '.tmp'
+    df.to_parquet(temporario, index=False)
+    os.replace(temporario, caminho_parquet)
+    _gravar_metadados(caminho_meta, caminho, stat, sha256)
+    return sha256[:12]
+
+
+def carregar_ano(ano, colunas=None, diretorio_dataset=DIRETORIO_DATASET):
+    """
+    Lê as colunas pedidas de um único ano, materializando a partição se preciso
+    """
+    colunas = list(colunas or COLUNAS_CANONICAS)
+    try:
+        preparar_ano(ano, diretorio_dataset)
+        caminho_parquet = os.path.join(caminho_particao(ano, diretorio_dataset), 'dados.parquet')
+        return pd.read_parquet(caminho_parquet, columns=colunas)
+    except ImportError:
+        # Sem pyarrow/fastparquet não há dataset colunar; lê direto do CSV
+        return ler_csv_resultados(ARQUIVOS_POR_ANO[ano], ano)[colunas]
+
+
+def carregar_anos(anos, colunas=None, diretorio_dataset=DIRETORIO_DATASET):
+    """
+    Lê vários anos (apenas as partições e colunas pedidas) com a coluna NU_ANO
+    """
+    partes = []
+    for ano in anos:
+        df = carregar_ano(ano, colunas, diretorio_dataset)
+        df.insert(0, 'NU_ANO', np.int16(ano))
+        partes.append(df)
+    if not partes:
+        return pd.DataFrame(columns=['NU_ANO'] + list(colunas or COLUNAS_CANONICAS))
+    return pd.concat(partes, ignore_index=True)
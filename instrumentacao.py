@@ -0,0 +1,198 @@
+"""
+Medição de desempenho das execuções do dashboard
+
+Cada execução do script (rerun) abre uma lista de etapas; `etapa()` é um
+context manager e `cronometrar()` um decorador que registram, por etapa, o
+tempo, o número de linhas produzidas, a memória residente do processo e, para
+funções cacheadas, se houve acerto ou falha no cache. As etapas podem ser
+aninhadas (por exemplo, os microdados carregados dentro das agregações).
+
+Para saber se uma função com `@st.cache_data` executou de fato, o corpo é
+marcado com `execucao_real` (por baixo do decorador de cache): ele só roda em
+caso de falha, e então marca a etapa corrente.
+
+Ao final da execução as etapas são gravadas em JSON lines (uma linha por
+etapa), para agregação entre sessões. O arquivo é definido pela variável de
+ambiente ENEM_LOG_DESEMPENHO; vazia, desativa o log.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+ARQUIVO_LOG = os.environ.get('ENEM_LOG_DESEMPENHO', os.path.join('data-cache', 'logs', 'desempenho.jsonl'))
+
+_local = threading.local()
+_trava_log = threading.Lock()
+
+
+def memoria_mb():
+    """
+    Memória residente do processo em MB (None se não for possível medir)
+    """
+    try:
+        with open('/proc/self/statm') as arquivo:
+            paginas = int(arquivo.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Sem /proc (macOS): pico da memória residente, em bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 / 1024
+
+
+def novo_id():
+    return uuid.uuid4().hex[:12]
+
+
+class Execucao:
+    """
+    Etapas medidas durante uma execução do script
+    """
+
+    def __init__(self, sessao=None):
+        self.id = novo_id()
+        self.sessao = sessao
+        self.inicio = time.perf_counter()
+        self.momento = datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+        self.etapas = []
+        self.pilha = []
+        self.segundos = None
+
+    def resumo(self):
+        """
+        Etapas como lista de dicionários, na ordem em que começaram
+        """
+        return [dict(registro) for registro in self.etapas]
+
+
+def execucao_atual():
+    return getattr(_local, 'execucao', None)
+
+
+@contextmanager
+def execucao(sessao=None, arquivo_log=ARQUIVO_LOG):
+    """
+    Mede uma execução completa do script e grava suas etapas no log
+    """
+    atual = Execucao(sessao)
+    anterior = execucao_atual()
+    _local.execucao = atual
+    try:
+        yield atual
+    finally:
+        atual.segundos = time.perf_counter() - atual.inicio
+        _local.execucao = anterior
+        if arquivo_log:
+            gravar_log(atual, arquivo_log)
+
+
+@contextmanager
+def etapa(nome, linhas=None, cacheada=False):
+    """
+    Mede um trecho da execução atual.
+
+    O dicionário devolvido pode receber `linhas` (ou outros campos) dentro do
+    bloco. Com `cacheada=True`, a etapa é marcada como acerto de cache, a
+    menos que uma função `execucao_real` rode dentro dela.
+    """
+    atual = execucao_atual()
+    registro = {
+        'etapa': nome,
+        'pai': atual.pilha[-1]['etapa'] if atual and atual.pilha else None,
+        'linhas': linhas,
+        'cache': 'acerto' if cacheada else None,
+    }
+    if atual is None:
+        # Fora de uma execução medida (scripts, benchmarks): não registra nada
+        yield registro
+        return
+
+    atual.etapas.append(registro)
+    atual.pilha.append(registro)
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro['segundos'] = time.perf_counter() - inicio
+        registro['memoria_mb'] = memoria_mb()
+        atual.pilha.pop()
+
+
+def _contar_linhas(resultado):
+    """
+    Linhas de DataFrames, Series e arrays; None para outros resultados
+    """
+    forma = getattr(resultado, 'shape', None)
+    return int(forma[0]) if forma else None
+
+
+def cronometrar(nome=None, cacheada=False):
+    """
+    Decorador que mede cada chamada da função como uma etapa.
+
+    O número de linhas vem do `shape` do resultado, quando existir. Use
+    `cacheada=True` sobre funções com `@st.cache_data`/`@st.cache_resource`
+    cujo corpo esteja marcado com `execucao_real`.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with etapa(nome or funcao.__name__, cacheada=cacheada) as registro:
+                resultado = funcao(*args, **kwargs)
+                registro['linhas'] = _contar_linhas(resultado)
+                return resultado
+        return medida
+    return decorador
+
+
+def execucao_real(funcao):
+    """
+    Marca a etapa corrente como falha de cache quando o corpo da função roda
+    """
+    @functools.wraps(funcao)
+    def marcada(*args, **kwargs):
+        atual = execucao_atual()
+        if atual is not None and atual.pilha and atual.pilha[-1]['cache'] is not None:
+            atual.pilha[-1]['cache'] = 'falha'
+        return funcao(*args, **kwargs)
+    return marcada
+
+
+def gravar_log(atual, arquivo_log=ARQUIVO_LOG):
+    """
+    Acrescenta as etapas da execução ao arquivo JSON lines
+    """
+    linhas = [
+        json.dumps({
+            'momento': atual.momento,
+            'sessao': atual.sessao,
+            'execucao': atual.id,
+            **registro,
+        }, ensure_ascii=False)
+        for registro in atual.etapas
+    ]
+    linhas.append(json.dumps({
+        'momento': atual.momento,
+        'sessao': atual.sessao,
+        'execucao': atual.id,
+        'etapa': 'total',
+        'pai': None,
+        'segundos': atual.segundos,
+        'memoria_mb': memoria_mb(),
+    }, ensure_ascii=False))
+
+    try:
+        os.makedirs(os.path.dirname(arquivo_log) or '.', exist_ok=True)
+        with _trava_log, open(arquivo_log, 'a', encoding='utf-8') as arquivo:
+            arquivo.write('\n'.join(linhas) + '\n')
+    except OSError:
+        # O log de desempenho nunca deve derrubar o dashboard
+        pass
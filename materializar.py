@@ -0,0 +1,205 @@
+"""
+Materializa offline as tabelas por escola usadas pelo dashboard
+
+Roda fora do Streamlit, com as mesmas agregações do dashboard (no backend de
+consulta escolhido por --backend ou ENEM_BACKEND, ver backends.py), e grava para
+cada ano a tabela geral (médias, Classificacao e Categoria_Desempenho) e as
+tabelas dos N melhores alunos em `data-cache/agregados/ano=AAAA/`, no formato
+Arrow IPC sem compressão. O dashboard abre esses arquivos por memory-map e os
+converte uma vez para pandas (uma cópia das colunas, sem parse nem groupby)
+em vez de refazer as agregações.
+
+Cada ano tem um `_manifesto.json` com a versão dos dados de origem (prefixo
+do SHA-256 do CSV), a versão das agregações e os parâmetros usados; só os anos
+cujo manifesto não corresponde mais são recalculados. Ao final, a tabela de
+trajetórias entre anos (trajetorias.py) é estendida com os anos alterados e
+os arquivos ainda não validados passam por validar_dados_rn.py.
+
+Uso:
+    python materializar.py
+    python materializar.py --anos 2024 --top-n 5 10 20 50
+    python materializar.py --forcar
+    python materializar.py --backend duckdb
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import agregacoes
+import backends
+import ingestao
+
+DIRETORIO_AGREGADOS = os.path.join(ingestao.DIRETORIO_CACHE, 'agregados')
+
+# Incrementar sempre que as agregações (ou o formato dos artefatos) mudarem
+VERSAO_AGREGADOS = 2
+
+MIN_PARTICIPANTES = 5
+MIN_ALUNOS_TOP_N = 3
+
+
+def diretorio_ano(ano, diretorio=DIRETORIO_AGREGADOS):
+    return os.path.join(diretorio, f'ano={ano}')
+
+
+def _nome_artefato(tabela):
+    return f'{tabela}.arrow'
+
+
+def _parametros(top_n):
+    return {
+        'versao_agregados': VERSAO_AGREGADOS,
+        'min_participantes': MIN_PARTICIPANTES,
+        'min_alunos_top_n': MIN_ALUNOS_TOP_N,
+        'top_n': sorted(top_n),
+    }
+
+
+def ler_manifesto(ano, diretorio=DIRETORIO_AGREGADOS):
+    try:
+        with open(os.path.join(diretorio_ano(ano, diretorio), '_manifesto.json'), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_manifesto(ano, versao, top_n, diretorio):
+    caminho = os.path.join(diretorio_ano(ano, diretorio), '_manifesto.json')
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump({'ano': ano, 'versao_dados': versao, **_parametros(top_n)}, arquivo, indent=2)
+    os.replace(temporario, caminho)
+
+
+def _gravar_tabela(tabela, caminho):
+    """
+    Grava a tabela (indexada por CO_ESCOLA) em Arrow IPC sem compressão
+    """
+    from pyarrow import feather
+
+    temporario = caminho + '.tmp'
+    feather.write_feather(tabela.reset_index(), temporario, compression='uncompressed')
+    os.replace(temporario, caminho)
+
+
+def atualizado(ano, versao, top_n, diretorio=DIRETORIO_AGREGADOS):
+    """
+    Confere se os artefatos do ano correspondem aos dados e parâmetros atuais
+    """
+    manifesto = ler_manifesto(ano, diretorio)
+    if manifesto is None or manifesto.get('versao_dados') != versao:
+        return False
+    if any(manifesto.get(chave) != valor for chave, valor in _parametros(top_n).items()):
+        return False
+    tabelas = ['escolas'] + [f'top{n}' for n in top_n]
+    return all(
+        os.path.exists(os.path.join(diretorio_ano(ano, diretorio), _nome_artefato(tabela)))
+        for tabela in tabelas
+    )
+
+
+def materializar_ano(ano, top_n, diretorio=DIRETORIO_AGREGADOS, backend=None):
+    """
+    Calcula e grava todas as tabelas por escola de um ano
+    """
+    backend = backend or backends.criar()
+    versao = ingestao.preparar_ano(ano)
+
+    destino = diretorio_ano(ano, diretorio)
+    os.makedirs(destino, exist_ok=True)
+
+    escolas = backend.estatisticas_escolas(ano, min_participantes=MIN_PARTICIPANTES)
+    _gravar_tabela(escolas, os.path.join(destino, _nome_artefato('escolas')))
+    for n in top_n:
+        tabela = backend.estatisticas_top_n(ano, n, min_alunos=MIN_ALUNOS_TOP_N)
+        _gravar_tabela(tabela, os.path.join(destino, _nome_artefato(f'top{n}')))
+
+    # O manifesto só é gravado depois de todas as tabelas
+    _gravar_manifesto(ano, versao, top_n, diretorio)
+    return versao, len(escolas)
+
+
+def carregar_tabela(ano, versao, tabela, diretorio=DIRETORIO_AGREGADOS):
+    """
+    Lê uma tabela materializada, indexada por CO_ESCOLA.
+
+    O arquivo é aberto por memory-map e convertido uma vez para pandas: a
+    conversão copia as colunas (não é leitura sem cópia), e `self_destruct`
+    libera cada coluna Arrow assim que ela é convertida, de modo que o pico
+    de memória fica perto de uma cópia da tabela.
+
+    Retorna None se o artefato não existir, for de outra versão dos dados
+    (por exemplo, um N personalizado ou um CSV alterado após o build) ou se
+    o pyarrow não estiver instalado; o chamador então calcula a tabela.
+    """
+    manifesto = ler_manifesto(ano, diretorio)
+    if manifesto is None or manifesto.get('versao_dados') != versao:
+        return None
+    parametros = _parametros([])
+    del parametros['top_n']
+    if any(manifesto.get(chave) != valor for chave, valor in parametros.items()):
+        return None
+    caminho = os.path.join(diretorio_ano(ano, diretorio), _nome_artefato(tabela))
+    if not os.path.exists(caminho):
+        return None
+
+    try:
+        from pyarrow import feather
+    except ImportError:
+        return None
+    tabela_arrow = feather.read_table(caminho, memory_map=True)
+    return tabela_arrow.to_pandas(self_destruct=True, split_blocks=True).set_index('CO_ESCOLA')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--anos', nargs='+', type=int,
+                        help="Anos a materializar (padrão: todos os disponíveis)")
+    parser.add_argument('--top-n', nargs='+', type=int, default=agregacoes.OPCOES_TOP_N,
+                        help="Valores de N para as tabelas dos melhores alunos (padrão: 5 10 20)")
+    parser.add_argument('--saida', default=DIRETORIO_AGREGADOS,
+                        help="Diretório dos artefatos")
+    parser.add_argument('--backend', choices=list(backends.BACKENDS),
+                        help="Motor das agregações (padrão: ENEM_BACKEND ou pandas)")
+    parser.add_argument('--forcar', action='store_true',
+                        help="Recalcula mesmo os anos já atualizados")
+    args = parser.parse_args()
+
+    anos = args.anos or ingestao.anos_disponiveis()
+    if not anos:
+        print("❌ Nenhum arquivo de resultados encontrado em data-raw/.", file=sys.stderr)
+        return 1
+    top_n = sorted(set(args.top_n))
+    backend = backends.criar(args.backend)
+
+    for ano in anos:
+        versao = ingestao.preparar_ano(ano)
+        if not args.forcar and atualizado(ano, versao, top_n, args.saida):
+            print(f"✅ {ano}: artefatos atualizados (versão {versao})")
+            continue
+
+        inicio = time.perf_counter()
+        versao, escolas = materializar_ano(ano, top_n, args.saida, backend)
+        print(f"💾 {ano}: {escolas:,} escolas, top N {top_n} (versão {versao}, {backend.nome}) "
+              f"em {time.perf_counter() - inicio:.1f}s")
+
+    # Trajetórias entre anos: só os anos novos ou alterados são relidos
+    import trajetorias
+    _, recalculados = trajetorias.atualizar(backend=backend)
+    if recalculados:
+        print(f"📈 Trajetórias: anos {recalculados} atualizados")
+
+    # Validação dos arquivos: os já validados (mesma versão) não são relidos
+    import validar_dados_rn
+    for ano in anos:
+        relatorio, validado_agora = validar_dados_rn.validar_ano(ano)
+        erros = sum(item['linhas'] for item in relatorio['verificacoes'] if item['gravidade'] == 'erro')
+        if validado_agora or erros:
+            print(f"🩺 {ano}: {erros:,} linhas com erros de validação (python validar_dados_rn.py)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Ordenação e paginação das tabelas de escolas no servidor
+
+As ordens de cada coluna são calculadas uma vez sobre a tabela completa (na
+primeira vez em que a coluna é pedida) e guardadas. Para ordenar um
+subconjunto de linhas (filtros ou busca), basta percorrer a ordem completa e
+manter as linhas do subconjunto, sem uma nova ordenação; depois, só a página
+visível é enviada ao navegador.
+"""
+import numpy as np
+import pandas as pd
+
+TAMANHOS_PAGINA = [25, 50, 100, 250]
+TAMANHO_PAGINA_PADRAO = 50
+
+
+class OrdenacaoTabela:
+    """
+    Ordens pré-calculadas (crescente e decrescente) das colunas de uma tabela
+    """
+
+    def __init__(self, df):
+        self.linhas = len(df)
+        self._df = df
+        self._ordens = {}
+
+    def ordem(self, coluna, crescente=True):
+        """
+        Posições da tabela completa ordenadas pela coluna.
+
+        A ordenação é estável nos dois sentidos (empates mantêm a ordem da
+        tabela) e valores ausentes ficam sempre no fim.
+        """
+        chave = (coluna, crescente)
+        if chave not in self._ordens:
+            codigos, categorias = pd.factorize(self._df[coluna], sort=True)
+            codigos = codigos.astype(np.int64)
+            ausentes = codigos < 0
+            if crescente:
+                codigos[ausentes] = len(categorias)
+            else:
+                codigos = -codigos
+                codigos[ausentes] = 1
+            self._ordens[chave] = np.argsort(codigos, kind='stable')
+        return self._ordens[chave]
+
+    def ordenar(self, posicoes, coluna, crescente=True):
+        """
+        Ordena um subconjunto de posições (sem repetições) pela coluna
+        """
+        ordem = self.ordem(coluna, crescente)
+        if len(posicoes) == self.linhas:
+            return ordem
+        marcadas = np.zeros(self.linhas, dtype=bool)
+        marcadas[posicoes] = True
+        return ordem[marcadas[ordem]]
+
+
+def total_paginas(linhas, tamanho):
+    return max(1, -(-linhas // tamanho))
+
+
+def fatiar(posicoes, pagina, tamanho):
+    """
+    Posições da página (numerada a partir de 1) e o intervalo exibido
+    """
+    inicio = (pagina - 1) * tamanho
+    fim = min(inicio + tamanho, len(posicoes))
+    return posicoes[inicio:fim], inicio, fim
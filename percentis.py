@@ -0,0 +1,137 @@
+"""
+Percentis de notas de alunos por partição (estado, município e dependência)
+
+Para cada nota (Score Final e as notas por área) guarda um único array
+ordenado por (partição, nota), com os limites de cada partição; a posição de
+uma nota na partição sai de `np.searchsorted` sobre a fatia, em O(log n), e
+várias notas podem ser consultadas de uma vez.
+
+O estado inclui todos os participantes com a nota; município e dependência
+só existem para quem tem a escola informada.
+"""
+import numpy as np
+import pandas as pd
+
+import agregacoes
+import ingestao
+
+NOTAS = {
+    'SCORE_FINAL': 'Score Final',
+    'NU_NOTA_CN': 'Ciências da Natureza',
+    'NU_NOTA_CH': 'Ciências Humanas',
+    'NU_NOTA_LC': 'Linguagens e Códigos',
+    'NU_NOTA_MT': 'Matemática',
+    'NU_NOTA_REDACAO': 'Redação',
+}
+
+ESTADO = 'Estado'
+MUNICIPIO = 'Município'
+DEPENDENCIA = 'Dependência'
+
+COLUNAS_ALUNOS = ['NO_MUNICIPIO_ESC', 'TP_DEPENDENCIA_ADM_ESC'] + list(NOTAS)
+
+
+def carregar_alunos(ano):
+    """
+    Notas, município e dependência de todos os participantes do ano
+    """
+    df = ingestao.carregar_ano(ano, colunas=COLUNAS_ALUNOS)
+    df['DEPENDENCIA_NOME'] = df['TP_DEPENDENCIA_ADM_ESC'].map(agregacoes.DEPENDENCIAS)
+    return df
+
+
+class PercentisNotas:
+    """
+    Arrays ordenados de cada nota por partição, para consultas de percentil
+    """
+
+    def __init__(self, alunos):
+        particoes = {
+            MUNICIPIO: alunos['NO_MUNICIPIO_ESC'],
+            DEPENDENCIA: alunos['DEPENDENCIA_NOME'],
+        }
+        self._valores = {}
+        self._limites = {}
+        for nota in NOTAS:
+            valores = alunos[nota].to_numpy(dtype=np.float32, na_value=np.nan)
+            presentes = ~np.isnan(valores)
+            partes = [np.sort(valores[presentes])]
+            limites = {(ESTADO, None): (0, len(partes[0]))}
+            deslocamento = len(partes[0])
+
+            for tipo, coluna in particoes.items():
+                codigos, nomes = pd.factorize(coluna, sort=True)
+                validos = presentes & (codigos >= 0)
+                # Ordena por (partição, nota) de uma vez e recorta os limites de cada partição
+                ordem = np.lexsort((valores[validos], codigos[validos]))
+                codigos_ordenados = codigos[validos][ordem]
+                partes.append(valores[validos][ordem])
+                fronteiras = np.searchsorted(codigos_ordenados, np.arange(len(nomes) + 1))
+                for posicao, nome in enumerate(nomes):
+                    if fronteiras[posicao + 1] > fronteiras[posicao]:
+                        limites[(tipo, nome)] = (deslocamento + fronteiras[posicao],
+                                                 deslocamento + fronteiras[posicao + 1])
+                deslocamento += len(codigos_ordenados)
+
+            self._valores[nota] = np.concatenate(partes)
+            self._limites[nota] = limites
+
+    def particoes(self, tipo, nota='SCORE_FINAL'):
+        """
+        Nomes das partições de um tipo (municípios ou dependências) com alunos
+        """
+        return sorted(nome for tipo_particao, nome in self._limites[nota] if tipo_particao == tipo)
+
+    def _fatia(self, nota, tipo, nome):
+        inicio, fim = self._limites[nota].get((tipo, nome), (0, 0))
+        return self._valores[nota][inicio:fim]
+
+    def alunos(self, nota='SCORE_FINAL', tipo=ESTADO, nome=None):
+        return len(self._fatia(nota, tipo, nome))
+
+    def percentil(self, valores, nota='SCORE_FINAL', tipo=ESTADO, nome=None):
+        """
+        Percentil de cada valor na partição: alunos abaixo mais metade dos
+        empatados, em % (vetorizado; NaN se a partição não tiver alunos)
+        """
+        fatia = self._fatia(nota, tipo, nome)
+        valores = np.asarray(valores, dtype=np.float32)
+        if len(fatia) == 0:
+            return np.full(valores.shape, np.nan)
+        abaixo = np.searchsorted(fatia, valores, side='left')
+        ate = np.searchsorted(fatia, valores, side='right')
+        return 100 * (abaixo + (ate - abaixo) / 2) / len(fatia)
+
+    def posicao(self, valores, nota='SCORE_FINAL', tipo=ESTADO, nome=None):
+        """
+        Posição que cada valor ocuparia na partição (1 = maior nota)
+        """
+        fatia = self._fatia(nota, tipo, nome)
+        return len(fatia) - np.searchsorted(fatia, np.asarray(valores, dtype=np.float32), side='right') + 1
+
+    def quantil(self, percentis, nota='SCORE_FINAL', tipo=ESTADO, nome=None):
+        """
+        Nota correspondente a cada percentil (0-100) na partição
+        """
+        fatia = self._fatia(nota, tipo, nome)
+        if len(fatia) == 0:
+            return np.full(np.shape(percentis), np.nan)
+        indices = np.clip(np.round(np.asarray(percentis) / 100 * (len(fatia) - 1)).astype(np.int64), 0, len(fatia) - 1)
+        return fatia[indices].astype(float).round(2)
+
+    def consultar(self, valores, nota='SCORE_FINAL', particoes=((ESTADO, None),)):
+        """
+        Percentil e posição dos valores em cada partição, em formato longo
+        """
+        valores = np.atleast_1d(np.asarray(valores, dtype=float))
+        linhas = []
+        for tipo, nome in particoes:
+            alunos = self.alunos(nota, tipo, nome)
+            linhas.append(pd.DataFrame({
+                'Nota': valores,
+                'Partição': tipo if nome is None else f'{tipo}: {nome}',
+                'Alunos': alunos,
+                'Percentil': np.round(self.percentil(valores, nota, tipo, nome), 1),
+                'Posição': self.posicao(valores, nota, tipo, nome) if alunos else pd.NA,
+            }))
+        return pd.concat(linhas, ignore_index=True)
@@ -0,0 +1,69 @@
+"""
+Regressão linear simples e correlação por grupo, vetorizadas em NumPy
+
+Substitui o `trendline="ols"` do Plotly Express (que importa o statsmodels e
+ajusta um modelo por cor): todas as somas por grupo saem de `np.bincount`, em
+uma passada para as médias e outra para os produtos centrados.
+"""
+import numpy as np
+import pandas as pd
+
+
+def regressao_por_grupo(x, y, grupos=None):
+    """
+    Ajusta y = intercepto + inclinacao * x para cada grupo.
+
+    Retorna um DataFrame indexado pelo grupo com n, inclinacao, intercepto,
+    r (correlação de Pearson), x_min e x_max. Pares com valores ausentes são
+    ignorados; grupos com menos de dois pontos ou x constante ficam com NaN.
+    Sem `grupos`, ajusta um único modelo com todos os pontos (grupo 'Todos').
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if grupos is None:
+        grupos = np.zeros(len(x), dtype=np.intp)
+        rotulos = pd.Index(['Todos'])
+    else:
+        grupos, rotulos = pd.factorize(pd.Series(grupos), sort=True)
+
+    validos = (grupos >= 0) & ~np.isnan(x) & ~np.isnan(y)
+    x, y, grupos = x[validos], y[validos], grupos[validos]
+    k = len(rotulos)
+
+    n = np.bincount(grupos, minlength=k).astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media_x = np.bincount(grupos, weights=x, minlength=k) / n
+        media_y = np.bincount(grupos, weights=y, minlength=k) / n
+
+        dx = x - media_x[grupos]
+        dy = y - media_y[grupos]
+        sxx = np.bincount(grupos, weights=dx * dx, minlength=k)
+        syy = np.bincount(grupos, weights=dy * dy, minlength=k)
+        sxy = np.bincount(grupos, weights=dx * dy, minlength=k)
+
+        inclinacao = np.where((n >= 2) & (sxx > 0), sxy / sxx, np.nan)
+        intercepto = media_y - inclinacao * media_x
+        r = np.where((n >= 2) & (sxx > 0) & (syy > 0), sxy / np.sqrt(sxx * syy), np.nan)
+
+    x_min = np.full(k, np.nan)
+    x_max = np.full(k, np.nan)
+    np.fmin.at(x_min, grupos, x)
+    np.fmax.at(x_max, grupos, x)
+
+    return pd.DataFrame({
+        'n': n.astype(int),
+        'inclinacao': inclinacao,
+        'intercepto': intercepto,
+        'r': r,
+        'x_min': x_min,
+        'x_max': x_max,
+    }, index=pd.Index(rotulos, name='grupo'))
+
+
+def tendencias_participantes(df):
+    """
+    Tendência de SCORE_FINAL por Participantes para cada dependência e no total
+    """
+    por_dependencia = regressao_por_grupo(df['Participantes'], df['SCORE_FINAL'], df['DEPENDENCIA_NOME'])
+    total = regressao_por_grupo(df['Participantes'], df['SCORE_FINAL'])
+    return pd.concat([por_dependencia, total])
@@ -0,0 +1,142 @@
+"""
+Tarefas em segundo plano do dashboard
+
+Um pool de threads compartilhado entre as sessões executa as cargas e
+agregações pesadas (microdados, tabela geral, Top N, intervalos de confiança,
+cubo, percentis...) ao mesmo tempo, enquanto o script já desenha as seções
+que não dependem delas. Cada tarefa é identificada por uma chave (nome, ano,
+versão, ...): sessões e reruns que pedem a mesma chave recebem o mesmo
+Future, em andamento ou concluído, de modo que o registro também faz o papel
+de cache dos resultados (LRU das tarefas concluídas). Erros não ficam em
+cache: o pedido seguinte de uma tarefa que falhou a envia de novo.
+
+As tarefas não chamam o Streamlit (as threads do pool não têm contexto de
+sessão). Uma tarefa que depende de outra usa `resultado()`: se a dependência
+ainda estiver na fila, ela é executada na própria thread, e nenhuma thread
+fica esperando por uma tarefa que não começou. Cada tarefa roda dentro de uma
+execução própria de `instrumentacao`, gravada no log quando termina.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import instrumentacao
+
+TRABALHADORES = 4
+
+# Tarefas concluídas mantidas no registro (as em andamento nunca são descartadas)
+CAPACIDADE = 64
+
+# Intervalo (s) entre as verificações das tarefas pendentes pelo dashboard:
+# começa curto e dobra a cada página refeita sem interação do usuário
+ESPERA = 0.5
+ESPERA_MAXIMA = 4.0
+
+
+class TarefasSegundoPlano:
+    """
+    Registro de tarefas por chave, executadas em um pool de threads
+    """
+
+    def __init__(self, trabalhadores=TRABALHADORES, capacidade=CAPACIDADE):
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='segundo_plano')
+        self._tarefas = OrderedDict()
+        self._capacidade = capacidade
+        self._trava = threading.Lock()
+
+    def _registrar(self, chave):
+        """
+        Future da chave (criado se preciso) e se ele foi criado agora; chamar
+        com a trava
+        """
+        futuro = self._tarefas.get(chave)
+        # Falhas não ficam no registro: o próximo pedido da chave tenta de novo
+        if futuro is not None and futuro.done() and futuro.exception() is not None:
+            del self._tarefas[chave]
+            futuro = None
+        nova = futuro is None
+        if nova:
+            futuro = Future()
+            self._tarefas[chave] = futuro
+            excedente = len(self._tarefas) - self._capacidade
+            if excedente > 0:
+                concluidas = [antiga for antiga, tarefa in self._tarefas.items() if tarefa.done()]
+                for antiga in concluidas[:excedente]:
+                    del self._tarefas[antiga]
+        self._tarefas.move_to_end(chave)
+        return futuro, nova
+
+    def _assumir(self, futuro):
+        """
+        Marca a tarefa como iniciada pela thread atual; False se outra thread
+        já a iniciou
+        """
+        with self._trava:
+            if futuro.running() or futuro.done():
+                return False
+            return futuro.set_running_or_notify_cancel()
+
+    def _executar(self, chave, futuro, funcao, args):
+        try:
+            with instrumentacao.execucao(sessao='segundo_plano') as execucao:
+                futuro.execucao = execucao
+                with instrumentacao.etapa(f'tarefa_{chave[0]}'):
+                    resultado = funcao(*args)
+        except Exception as erro:
+            futuro.set_exception(erro)
+        except BaseException as erro:
+            futuro.set_exception(erro)
+            raise
+        else:
+            futuro.set_result(resultado)
+
+    def _no_pool(self, chave, futuro, funcao, args):
+        if self._assumir(futuro):
+            self._executar(chave, futuro, funcao, args)
+
+    def enviar(self, chave, funcao, *args):
+        """
+        Agenda `funcao(*args)` no pool, se a chave ainda não tiver uma tarefa,
+        e devolve o Future da chave
+        """
+        with self._trava:
+            futuro, nova = self._registrar(chave)
+        if nova:
+            self._executor.submit(self._no_pool, chave, futuro, funcao, args)
+        return futuro
+
+    def resultado(self, chave, funcao, *args):
+        """
+        Resultado da tarefa da chave, executando-a na thread atual se ela ainda
+        não começou (para dependências entre tarefas)
+        """
+        with self._trava:
+            futuro, _ = self._registrar(chave)
+        if self._assumir(futuro):
+            self._executar(chave, futuro, funcao, args)
+        return futuro.result()
+
+    def resumo(self):
+        """
+        Etapas medidas de cada tarefa do registro, com o estado da tarefa
+        """
+        with self._trava:
+            tarefas = list(self._tarefas.items())
+        linhas = []
+        for chave, futuro in tarefas:
+            if futuro.done():
+                estado = 'erro' if futuro.exception() is not None else 'concluída'
+            else:
+                estado = 'em andamento' if futuro.running() else 'na fila'
+            execucao = getattr(futuro, 'execucao', None)
+            for registro in (execucao.resumo() if execucao is not None else [{}]):
+                linhas.append({'tarefa': ' '.join(map(str, chave)), 'estado': estado, **registro})
+        return linhas
+
+
+def intervalo_espera(tentativas):
+    """
+    Intervalo entre verificações após `tentativas` páginas refeitas seguidas
+    por tarefas concluídas (recuo exponencial até ESPERA_MAXIMA)
+    """
+    return min(ESPERA * 2 ** tentativas, ESPERA_MAXIMA)
@@ -0,0 +1,251 @@
+"""
+Análise do questionário socioeconômico (Q001-Q025, arquivos de 2022/2023)
+
+As respostas são guardadas como categorias (códigos int8) desde a ingestão.
+`CruzamentosSocioeconomicos` percorre os alunos uma única vez e monta, para
+cada questão, uma matriz alternativa x escola com o número de alunos e a soma
+dos scores. Os detalhamentos do dashboard (por resposta, por dependência, por
+município, para as escolas filtradas) são somas sobre colunas dessa matriz,
+sem um novo groupby sobre as linhas de alunos.
+"""
+import numpy as np
+import pandas as pd
+
+import agregacoes
+import ingestao
+
+QUESTOES = {
+    'Q001': 'Escolaridade do pai',
+    'Q002': 'Escolaridade da mãe',
+    'Q003': 'Ocupação do pai',
+    'Q004': 'Ocupação da mãe',
+    'Q005': 'Pessoas na residência',
+    'Q006': 'Renda mensal da família',
+    'Q007': 'Empregado(a) doméstico(a)',
+    'Q008': 'Banheiros',
+    'Q009': 'Quartos',
+    'Q010': 'Carros',
+    'Q011': 'Motocicletas',
+    'Q012': 'Geladeira',
+    'Q013': 'Freezer',
+    'Q014': 'Máquina de lavar roupa',
+    'Q015': 'Máquina de secar roupa',
+    'Q016': 'Micro-ondas',
+    'Q017': 'Máquina de lavar louça',
+    'Q018': 'Aspirador de pó',
+    'Q019': 'Televisão em cores',
+    'Q020': 'Aparelho de DVD',
+    'Q021': 'TV por assinatura',
+    'Q022': 'Telefone celular',
+    'Q023': 'Telefone fixo',
+    'Q024': 'Computador',
+    'Q025': 'Acesso à internet',
+}
+
+_ESCOLARIDADE = {
+    'A': 'Nunca estudou',
+    'B': 'Fundamental I incompleto',
+    'C': 'Fundamental I completo',
+    'D': 'Fundamental II completo',
+    'E': 'Ensino médio completo',
+    'F': 'Superior completo',
+    'G': 'Pós-graduação',
+    'H': 'Não sabe',
+}
+
+_OCUPACAO = {
+    'A': 'Grupo 1 (agricultura, pesca)',
+    'B': 'Grupo 2 (serviços gerais, comércio)',
+    'C': 'Grupo 3 (indústria, ofícios)',
+    'D': 'Grupo 4 (técnicos, professores)',
+    'E': 'Grupo 5 (profissionais de nível superior, gestores)',
+    'F': 'Não sabe',
+}
+
+# Faixas em salários mínimos (os valores em reais mudam de um ano para outro)
+_RENDA = {
+    'A': 'Nenhuma renda',
+    'B': 'Até 1 SM',
+    'C': '1 a 1,5 SM',
+    'D': '1,5 a 2 SM',
+    'E': '2 a 2,5 SM',
+    'F': '2,5 a 3 SM',
+    'G': '3 a 4 SM',
+    'H': '4 a 5 SM',
+    'I': '5 a 6 SM',
+    'J': '6 a 7 SM',
+    'K': '7 a 8 SM',
+    'L': '8 a 9 SM',
+    'M': '9 a 10 SM',
+    'N': '10 a 12 SM',
+    'O': '12 a 15 SM',
+    'P': '15 a 20 SM',
+    'Q': 'Acima de 20 SM',
+}
+
+_EMPREGADO = {
+    'A': 'Não',
+    'B': '1 ou 2 dias por semana',
+    'C': '3 ou 4 dias por semana',
+    'D': '5 dias ou mais',
+}
+
+_QUANTIDADE = {'A': 'Não tem', 'B': 'Um', 'C': 'Dois', 'D': 'Três', 'E': 'Quatro ou mais'}
+
+_SIM_NAO = {'A': 'Não', 'B': 'Sim'}
+
+# Rótulo de cada alternativa, por questão
+ROTULOS = {
+    'Q001': _ESCOLARIDADE,
+    'Q002': _ESCOLARIDADE,
+    'Q003': _OCUPACAO,
+    'Q004': _OCUPACAO,
+    'Q005': {str(moradores): str(moradores) for moradores in range(1, 21)},
+    'Q006': _RENDA,
+    'Q007': _EMPREGADO,
+    **{questao: _QUANTIDADE for questao in ('Q008', 'Q009', 'Q010', 'Q011', 'Q012', 'Q013', 'Q014',
+                                            'Q015', 'Q016', 'Q017', 'Q019', 'Q022', 'Q024')},
+    **{questao: _SIM_NAO for questao in ('Q018', 'Q020', 'Q021', 'Q023', 'Q025')},
+}
+
+# Dimensões dos detalhamentos: nome exibido -> coluna da tabela de escolas
+DIMENSOES = {
+    'Dependência': 'DEPENDENCIA_NOME',
+    'Município': 'Municipio',
+}
+
+COLUNAS_ALUNOS = ['CO_ESCOLA', 'NOME_ESCOLA', 'NO_MUNICIPIO_ESC', 'TP_DEPENDENCIA_ADM_ESC', 'SCORE_FINAL']
+
+
+def questoes_disponiveis(ano):
+    """
+    Questões presentes na partição do ano (vazia em 2024)
+    """
+    colunas = set(ingestao.colunas_ano(ano))
+    return [questao for questao in QUESTOES if questao in colunas]
+
+
+def carregar_respostas(ano, questoes):
+    """
+    Alunos válidos (como em `agregacoes.preparar_microdados`) com as respostas
+    das questões, em categorias
+    """
+    df = ingestao.carregar_ano(ano, colunas=COLUNAS_ALUNOS + list(questoes))
+    return agregacoes.preparar_microdados(df)
+
+
+class CruzamentosSocioeconomicos:
+    """
+    Matrizes alternativa x escola (alunos e soma dos scores) de cada questão.
+
+    As escolas são as linhas da tabela `escolas` (indexada por CO_ESCOLA);
+    alunos de escolas fora dela não entram, como no restante do dashboard.
+    """
+
+    def __init__(self, respostas, escolas, questoes, metrica='SCORE_FINAL'):
+        self.escolas = escolas
+        self.questoes = list(questoes)
+        quantidade = len(escolas)
+
+        posicao_escola = escolas.index.get_indexer(respostas['CO_ESCOLA'])
+        valores = respostas[metrica].to_numpy(dtype=float, na_value=np.nan)
+        validos = (posicao_escola >= 0) & ~np.isnan(valores)
+
+        self._alternativas = {}
+        self._alunos = {}
+        self._somas = {}
+        for questao in self.questoes:
+            coluna = respostas[questao]
+            alternativas = list(coluna.cat.categories)
+            codigos = coluna.cat.codes.to_numpy()
+            respondidas = validos & (codigos >= 0)
+
+            # Um único bincount por questão: célula = alternativa * escolas + escola
+            celulas = codigos[respondidas].astype(np.int64) * quantidade + posicao_escola[respondidas]
+            tamanho = len(alternativas) * quantidade
+            self._alternativas[questao] = alternativas
+            self._alunos[questao] = np.bincount(celulas, minlength=tamanho).reshape(-1, quantidade)
+            self._somas[questao] = np.bincount(
+                celulas, weights=valores[respondidas], minlength=tamanho
+            ).reshape(-1, quantidade)
+
+        self._grupos = {
+            coluna: pd.factorize(escolas[coluna], sort=True)
+            for coluna in DIMENSOES.values()
+        }
+
+    def rotulos(self, questao):
+        return [ROTULOS[questao].get(alternativa, alternativa) for alternativa in self._alternativas[questao]]
+
+    def _selecionar(self, questao, posicoes):
+        alunos, somas = self._alunos[questao], self._somas[questao]
+        if posicoes is None:
+            return alunos, somas
+        return alunos[:, posicoes], somas[:, posicoes]
+
+    def alunos_por_resposta(self, questao, posicoes=None):
+        """
+        Alunos, percentual e score médio por alternativa, nas escolas das
+        posições (todas, se None)
+        """
+        alunos, somas = self._selecionar(questao, posicoes)
+        total_alunos = alunos.sum(axis=1)
+        total_somas = somas.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = total_somas / total_alunos
+            percentual = 100 * total_alunos / total_alunos.sum()
+        return pd.DataFrame({
+            'Resposta': self.rotulos(questao),
+            'Alunos': total_alunos,
+            'Percentual': np.round(percentual, 1),
+            'Score Médio': np.round(media, 1),
+        })
+
+    def alunos_por_dimensao(self, questao, dimensao, posicoes=None):
+        """
+        Alunos e score médio por alternativa e por grupo da dimensão
+        ('Dependência' ou 'Município'), em formato longo
+        """
+        codigos, grupos = self._grupos[DIMENSOES[dimensao]]
+        if posicoes is not None:
+            codigos = codigos[posicoes]
+        alunos, somas = self._selecionar(questao, posicoes)
+
+        # Soma as colunas (escolas) de cada grupo: matriz alternativa x grupo
+        presentes = codigos >= 0
+        alunos_grupo = np.array([
+            np.bincount(codigos[presentes], weights=linha[presentes], minlength=len(grupos)) for linha in alunos
+        ])
+        somas_grupo = np.array([
+            np.bincount(codigos[presentes], weights=linha[presentes], minlength=len(grupos)) for linha in somas
+        ])
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = somas_grupo / alunos_grupo
+        tabela = pd.DataFrame({
+            'Resposta': np.repeat(self.rotulos(questao), len(grupos)),
+            dimensao: np.tile(np.asarray(grupos, dtype=object), alunos_grupo.shape[0]),
+            'Alunos': alunos_grupo.ravel().astype(np.int64),
+            'Score Médio': np.round(media.ravel(), 1),
+        })
+        return tabela[tabela['Alunos'] > 0].reset_index(drop=True)
+
+    def escolas_por_resposta(self, questao, posicoes=None):
+        """
+        Escolas agrupadas pela resposta predominante de seus alunos, com o
+        score médio das escolas de cada grupo
+        """
+        alunos, _ = self._selecionar(questao, posicoes)
+        escolas = self.escolas if posicoes is None else self.escolas.iloc[posicoes]
+        respondentes = alunos.sum(axis=0) > 0
+        predominante = alunos.argmax(axis=0)[respondentes]
+        scores = escolas['SCORE_FINAL'].to_numpy(dtype=float)[respondentes]
+
+        quantidade = np.bincount(predominante, minlength=alunos.shape[0])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = np.bincount(predominante, weights=scores, minlength=alunos.shape[0]) / quantidade
+        return pd.DataFrame({
+            'Resposta predominante': self.rotulos(questao),
+            'Escolas': quantidade,
+            'Score Médio das Escolas': np.round(media, 1),
+        })
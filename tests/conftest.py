@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos ficam na raiz do repositório (sem pacote)
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+import gerar_dados_sinteticos  # noqa: E402
+
+
+@pytest.fixture
+def diretorio_dados(tmp_path, monkeypatch):
+    """
+    Diretório de trabalho temporário com data-raw/RESULTADOS_2022_RN.csv (sem
+    CO_ESCOLA) e RESULTADOS_2024_RN.csv sintéticos, pequenos
+    """
+    monkeypatch.chdir(tmp_path)
+    for ano in (2022, 2024):
+        gerar_dados_sinteticos.gerar_arquivo(
+            os.path.join('data-raw', f'RESULTADOS_{ano}_RN.csv'), ano, 4000, fracao_sem_escola=0.05
+        )
+    return tmp_path
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import agregacoes
+
+
+def microdados_aleatorios(linhas=3000, escolas=120, semente=0):
+    """
+    Alunos com empates de score, scores ausentes e alunos sem escola
+    """
+    rng = np.random.default_rng(semente)
+    codigos = pd.array(rng.integers(1, escolas + 1, linhas), dtype='Int64')
+    codigos[rng.random(linhas) < 0.03] = pd.NA
+    scores = np.round(rng.normal(550, 60, linhas) / 10) * 10
+    scores[rng.random(linhas) < 0.05] = np.nan
+    return pd.DataFrame({'CO_ESCOLA': codigos, 'SCORE_FINAL': scores}, index=rng.permutation(linhas))
+
+
+def top_n_por_laco(df, n):
+    """
+    Implementação anterior: uma máscara e um `nlargest` por escola (sobre os
+    microdados preparados, que já não têm alunos sem Score Final)
+    """
+    df = df.dropna(subset=['SCORE_FINAL'])
+    partes = []
+    for codigo in df['CO_ESCOLA'].dropna().unique():
+        escola = df[df['CO_ESCOLA'] == codigo]
+        partes.append(escola.nlargest(n, 'SCORE_FINAL', keep='first'))
+    return pd.concat(partes)
+
+
+@pytest.mark.parametrize('n', [1, 3, 10, 1000])
+def test_selecionar_top_n_igual_ao_laco_por_escola(n):
+    df = microdados_aleatorios()
+    selecionados = agregacoes.selecionar_top_n(df, n)
+    esperado = top_n_por_laco(df, n)
+
+    # Mesmas linhas (inclusive nos empates), na ordem original do DataFrame
+    assert sorted(selecionados.index) == sorted(esperado.index)
+    assert selecionados.index.equals(df.index[df.index.isin(esperado.index)])
+
+
+def test_selecionar_top_n_rejeita_n_menor_que_um():
+    with pytest.raises(ValueError):
+        agregacoes.selecionar_top_n(microdados_aleatorios(), 0)
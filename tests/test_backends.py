@@ -0,0 +1,34 @@
+import os
+
+import pandas as pd
+import pytest
+
+import backends
+
+OUTROS = [nome for nome in backends.BACKENDS if nome != 'pandas']
+
+
+def comparar(resultado, referencia):
+    ordenar = lambda df: df.sort_index()[sorted(df.columns)]
+    pd.testing.assert_frame_equal(ordenar(resultado), ordenar(referencia), check_dtype=False)
+
+
+@pytest.mark.parametrize('ano', [2022, 2024])
+@pytest.mark.parametrize('nome', OUTROS)
+def test_estatisticas_escolas_iguais_ao_pandas(diretorio_dados, nome, ano):
+    pytest.importorskip(backends.MODULOS[nome])
+    dataset = os.path.join('data-cache', 'resultados')
+    referencia = backends.criar('pandas', diretorio_dataset=dataset).estatisticas_escolas(ano)
+    assert len(referencia) > 0
+    comparar(backends.criar(nome, diretorio_dataset=dataset).estatisticas_escolas(ano), referencia)
+
+
+@pytest.mark.parametrize('n', [1, 10])
+@pytest.mark.parametrize('ano', [2022, 2024])
+@pytest.mark.parametrize('nome', OUTROS)
+def test_estatisticas_top_n_iguais_ao_pandas(diretorio_dados, nome, ano, n):
+    pytest.importorskip(backends.MODULOS[nome])
+    dataset = os.path.join('data-cache', 'resultados')
+    referencia = backends.criar('pandas', diretorio_dataset=dataset).estatisticas_top_n(ano, n)
+    assert len(referencia) > 0
+    comparar(backends.criar(nome, diretorio_dataset=dataset).estatisticas_top_n(ano, n), referencia)
@@ -0,0 +1,116 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import filtrar_rn
+import gerar_dados_sinteticos
+
+ANO = 2024
+KB = 1024
+
+
+@pytest.fixture
+def nacional(tmp_path):
+    """
+    Arquivo nacional sintético com três UFs e linhas sem SG_UF_ESC
+    """
+    caminho = str(tmp_path / f'RESULTADOS_{ANO}.csv')
+    gerar_dados_sinteticos.gerar_arquivo(caminho, ANO, 3000, ufs=('RN', 'PB', 'CE'), fracao_sem_escola=0.05)
+    return caminho
+
+
+def ler_texto(caminho):
+    return pd.read_csv(caminho, sep=';', encoding='latin-1', dtype=str, keep_default_na=False)
+
+
+def saida(nacional):
+    return os.path.join(os.path.dirname(nacional), 'por_uf')
+
+
+def executar(nacional, ufs, refazer=False, tamanho_bloco=32 * KB):
+    return filtrar_rn.filtrar(
+        [nacional],
+        ufs=ufs,
+        saida=saida(nacional),
+        tamanho_bloco=tamanho_bloco,
+        processos=1,
+        coluna_uf=filtrar_rn.COLUNA_UF,
+        gerar_csv=True,
+        diretorio_csv=os.path.dirname(nacional),
+        refazer=refazer
+    )
+
+
+def csv_uf(nacional, uf):
+    return ler_texto(os.path.join(os.path.dirname(nacional), f'RESULTADOS_{ANO}_{uf}.csv'))
+
+
+def esperado(nacional, uf):
+    df = ler_texto(nacional)
+    return df[df[filtrar_rn.COLUNA_UF] == uf].reset_index(drop=True)
+
+
+def diretorio_ano(nacional):
+    return os.path.join(saida(nacional), f'ano={ANO}')
+
+
+def ler_json(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def test_filtra_a_uf_e_descarta_linhas_sem_uf(nacional):
+    assert executar(nacional, ['RN']) == []
+    pd.testing.assert_frame_equal(csv_uf(nacional, 'RN'), esperado(nacional, 'RN'))
+
+    # Nenhuma partição `uf=` vazia; as linhas sem UF ficam contadas nos marcadores
+    particoes = sorted(nome for nome in os.listdir(diretorio_ano(nacional)) if nome.startswith('uf='))
+    assert particoes == ['uf=RN']
+    marcadores = os.listdir(os.path.join(diretorio_ano(nacional), '_blocos'))
+    sem_uf = sum(ler_json(os.path.join(diretorio_ano(nacional), '_blocos', nome))['linhas_sem_uf']
+                 for nome in marcadores)
+    assert sem_uf == (ler_texto(nacional)[filtrar_rn.COLUNA_UF].str.strip() == '').sum()
+
+
+def test_retomada_com_outra_uf_extrai_so_a_que_falta(nacional, capsys):
+    executar(nacional, ['RN'])
+    assert executar(nacional, ['PB']) == []
+    pd.testing.assert_frame_equal(csv_uf(nacional, 'PB'), esperado(nacional, 'PB'))
+    pd.testing.assert_frame_equal(csv_uf(nacional, 'RN'), esperado(nacional, 'RN'))
+    assert ler_json(os.path.join(diretorio_ano(nacional), '_SUCESSO'))['ufs'] == ['PB', 'RN']
+
+    # Com as duas UFs gravadas, o ano inteiro é pulado
+    capsys.readouterr()
+    executar(nacional, ['RN', 'PB'])
+    assert "já concluído" in capsys.readouterr().out
+
+
+def test_retomada_refaz_so_os_blocos_sem_marcador(nacional, capsys):
+    executar(nacional, ['RN'])
+    os.remove(os.path.join(diretorio_ano(nacional), '_SUCESSO'))
+    blocos = os.path.join(diretorio_ano(nacional), '_blocos')
+    marcadores = sorted(os.listdir(blocos))
+    assert len(marcadores) > 1
+    os.remove(os.path.join(blocos, marcadores[0]))
+    plano = ler_json(filtrar_rn._plano(saida(nacional), ANO))
+
+    # Outro --tamanho-bloco não muda os intervalos do plano já gravado
+    capsys.readouterr()
+    assert executar(nacional, ['RN'], tamanho_bloco=64 * KB) == []
+    assert f"{len(marcadores)} blocos, {len(marcadores) - 1} já processados" in capsys.readouterr().out
+    assert ler_json(filtrar_rn._plano(saida(nacional), ANO)) == plano
+    pd.testing.assert_frame_equal(csv_uf(nacional, 'RN'), esperado(nacional, 'RN'))
+
+
+def test_arquivo_de_origem_alterado_e_recusado(nacional):
+    executar(nacional, ['RN'])
+
+    # Mesmo nome, outro conteúdo: as partições antigas não são misturadas
+    gerar_dados_sinteticos.gerar_arquivo(nacional, ANO, 2000, ufs=('RN', 'PB'), semente=1)
+    assert executar(nacional, ['RN']) == [ANO]
+    assert executar(nacional, ['PB']) == [ANO]
+
+    assert executar(nacional, ['RN'], refazer=True) == []
+    pd.testing.assert_frame_equal(csv_uf(nacional, 'RN'), esperado(nacional, 'RN'))
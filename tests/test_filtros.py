@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import filtros
+
+COLUNAS = ['CO_ESCOLA', 'DEPENDENCIA_NOME', 'Municipio']
+
+
+@pytest.fixture
+def escolas():
+    """
+    Tabela por escola indexada por CO_ESCOLA, como as do dashboard
+    """
+    rng = np.random.default_rng(0)
+    linhas = 500
+    return pd.DataFrame({
+        'CO_ESCOLA': np.arange(1000, 1000 + linhas),
+        'DEPENDENCIA_NOME': rng.choice(['Federal', 'Estadual', 'Municipal', 'Privada'], linhas),
+        'Municipio': rng.choice([f'MUNICÍPIO {i}' for i in range(30)], linhas),
+        'Participantes': rng.integers(1, 200, linhas),
+    }).set_index('CO_ESCOLA')
+
+
+def posicoes_por_mascara(df, selecao, minimo):
+    mascara = np.ones(len(df), dtype=bool)
+    for coluna, valores in selecao.items():
+        if valores:
+            serie = df.index.to_series() if coluna == df.index.name else df[coluna]
+            mascara &= serie.isin(valores).to_numpy()
+    if minimo is not None:
+        mascara &= (df['Participantes'] >= minimo).to_numpy()
+    return np.flatnonzero(mascara)
+
+
+SELECOES = [
+    ({}, None),
+    ({}, 50),
+    ({'DEPENDENCIA_NOME': ['Privada']}, None),
+    ({'DEPENDENCIA_NOME': ['Privada', 'Federal'], 'Municipio': ['MUNICÍPIO 3']}, 10),
+    ({'Municipio': ['MUNICÍPIO 1', 'MUNICÍPIO 2'], 'DEPENDENCIA_NOME': []}, 120),
+    ({'CO_ESCOLA': [1003, 1400, 99999], 'Municipio': None}, None),
+    ({'Municipio': ['INEXISTENTE']}, None),
+    ({'DEPENDENCIA_NOME': ['Estadual']}, 1000),
+]
+
+
+@pytest.mark.parametrize('selecao, minimo', SELECOES)
+def test_resolver_igual_a_mascara(escolas, selecao, minimo):
+    indice = filtros.IndiceFiltros(escolas, COLUNAS, limiar='Participantes')
+    posicoes = indice.resolver(selecao, minimo=minimo)
+    np.testing.assert_array_equal(posicoes, posicoes_por_mascara(escolas, selecao, minimo))
+
+
+def test_chave_igual_para_filtros_equivalentes(escolas):
+    indice = filtros.IndiceFiltros(escolas, COLUNAS, limiar='Participantes')
+    todas = indice.valores('DEPENDENCIA_NOME')
+    assert indice.chave({'DEPENDENCIA_NOME': todas}) == indice.chave({}) == indice.chave({'Municipio': None})
+    assert (indice.chave({'Municipio': ['MUNICÍPIO 2', 'MUNICÍPIO 1', 'MUNICÍPIO 2']})
+            == indice.chave({'Municipio': ['MUNICÍPIO 1', 'MUNICÍPIO 2']}))
+    # Um mínimo que não exclui nenhuma escola não muda o resultado nem a chave
+    assert indice.chave({}, minimo=1) == indice.chave({})
+    assert indice.chave({}, minimo=100) != indice.chave({})
@@ -0,0 +1,244 @@
+"""
+Trajetória das escolas entre os anos (Score Final, classificação e participantes)
+
+Guarda uma tabela longa, uma linha por escola e ano, em
+`data-cache/trajetorias/trajetorias.arrow`, com um `_manifesto.json` que
+registra a versão dos dados de cada ano incluído. A atualização é
+incremental: só os anos novos ou cujo CSV mudou são lidos (da tabela
+materializada por `materializar.py`, ou agregados na hora) e substituem suas
+linhas; os demais anos são mantidos como estão.
+
+As variações entre dois anos e as séries por escola (para os sparklines do
+dashboard) são derivadas da tabela longa na leitura.
+
+Os arquivos de 2022/2023 não trazem CO_ESCOLA, e os códigos substitutos
+(negativos) são atribuídos por ano. Na leitura, cada escola recebe uma chave
+comum a todos os anos (`identificar`): o CO_ESCOLA quando informado; sem ele,
+o código que o mesmo par (nome, município), sem acentos e maiúsculas, tem em
+outro ano, ou um código negativo derivado do par. Escolas que mudaram de nome
+entre os anos aparecem como escolas diferentes.
+
+Uso:
+    python trajetorias.py
+    python trajetorias.py --forcar
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import backends
+import busca
+import ingestao
+import materializar
+
+DIRETORIO_TRAJETORIAS = os.path.join(ingestao.DIRETORIO_CACHE, 'trajetorias')
+
+# Incrementar sempre que as colunas ou o cálculo das linhas mudarem
+VERSAO_TRAJETORIAS = 2
+
+COLUNAS = ['CO_ESCOLA', 'Ano', 'NOME_ESCOLA', 'Municipio', 'DEPENDENCIA_NOME',
+           'SCORE_FINAL', 'Classificacao', 'Participantes']
+
+# Métricas acompanhadas: coluna -> rótulo
+METRICAS = {
+    'SCORE_FINAL': 'Score Final',
+    'Classificacao': 'Classificação',
+    'Participantes': 'Participantes',
+}
+
+
+def _caminho(diretorio, nome):
+    return os.path.join(diretorio, nome)
+
+
+def ler_manifesto(diretorio=DIRETORIO_TRAJETORIAS):
+    try:
+        with open(_caminho(diretorio, '_manifesto.json'), encoding='utf-8') as arquivo:
+            manifesto = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+    if manifesto.get('versao_trajetorias') != VERSAO_TRAJETORIAS:
+        return None
+    return manifesto
+
+
+def _gravar(tabela, versoes, diretorio):
+    from pyarrow import feather
+
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = _caminho(diretorio, 'trajetorias.arrow')
+    feather.write_feather(tabela, caminho + '.tmp', compression='uncompressed')
+    os.replace(caminho + '.tmp', caminho)
+
+    # O manifesto só é gravado depois da tabela
+    manifesto = _caminho(diretorio, '_manifesto.json')
+    with open(manifesto + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'versao_trajetorias': VERSAO_TRAJETORIAS,
+            'anos': {str(ano): versao for ano, versao in sorted(versoes.items())},
+        }, arquivo, indent=2)
+    os.replace(manifesto + '.tmp', manifesto)
+
+
+def _ler_tabela(diretorio):
+    caminho = _caminho(diretorio, 'trajetorias.arrow')
+    if not os.path.exists(caminho):
+        return None
+    from pyarrow import feather
+    return feather.read_table(caminho, memory_map=True).to_pandas()
+
+
+def linhas_ano(ano, versao, backend=None):
+    """
+    Linhas de um ano: a tabela geral materializada (ou agregada pelo backend)
+    reduzida às colunas da trajetória
+    """
+    escolas = materializar.carregar_tabela(ano, versao, 'escolas')
+    if escolas is None:
+        backend = backend or backends.criar()
+        escolas = backend.estatisticas_escolas(ano, min_participantes=materializar.MIN_PARTICIPANTES)
+    linhas = escolas.reset_index().assign(Ano=ano)
+    return linhas[COLUNAS].astype({'CO_ESCOLA': np.int64, 'Ano': np.int64, 'Classificacao': np.int64,
+                                   'Participantes': np.int64})
+
+
+def atualizar(anos=None, diretorio=DIRETORIO_TRAJETORIAS, backend=None, forcar=False):
+    """
+    Atualiza a tabela de trajetórias com os anos disponíveis, recalculando só
+    os anos novos ou alterados. Retorna (tabela longa, anos recalculados).
+    """
+    anos = sorted(anos or ingestao.anos_disponiveis())
+    versoes = {ano: ingestao.preparar_ano(ano) for ano in anos}
+
+    manifesto = None if forcar else ler_manifesto(diretorio)
+    tabela = _ler_tabela(diretorio) if manifesto is not None else None
+    gravados = manifesto['anos'] if tabela is not None else {}
+
+    mantidos = [ano for ano in anos if gravados.get(str(ano)) == versoes[ano]]
+    recalcular = [ano for ano in anos if ano not in mantidos]
+    if not recalcular and len(gravados) == len(anos):
+        return tabela, []
+
+    partes = [tabela[tabela['Ano'].isin(mantidos)]] if mantidos else []
+    partes += [linhas_ano(ano, versoes[ano], backend) for ano in recalcular]
+    tabela = pd.concat(partes, ignore_index=True).sort_values(['CO_ESCOLA', 'Ano'], ignore_index=True)
+    _gravar(tabela, versoes, diretorio)
+    return tabela, recalcular
+
+
+def _codigo_par(par):
+    """
+    Código negativo estável de um par (nome, município) sem CO_ESCOLA
+    """
+    return -(int.from_bytes(hashlib.blake2b(par.encode('utf-8'), digest_size=7).digest(), 'big') + 1)
+
+
+def identificar(longa):
+    """
+    Tabela longa com CO_ESCOLA trocado pela chave da escola entre os anos.
+
+    Linhas com código do INEP o mantêm. As demais (códigos negativos, por
+    ano) recebem o código que o mesmo par (nome, município) normalizado tem
+    em algum ano, se ele for único, ou um código negativo derivado do par.
+    """
+    pares = (longa['NOME_ESCOLA'].astype(str).map(busca.normalizar) + '|'
+             + longa['Municipio'].astype(str).map(busca.normalizar))
+    com_codigo = longa['CO_ESCOLA'] > 0
+    por_par = longa.loc[com_codigo, 'CO_ESCOLA'].groupby(pares[com_codigo])
+    codigos_par = por_par.first()[por_par.nunique() == 1]
+
+    substitutos = pares[~com_codigo]
+    chaves = substitutos.map(codigos_par)
+    sem_par = chaves.isna()
+    chaves[sem_par] = substitutos[sem_par].map(_codigo_par)
+    longa = longa.copy()
+    longa.loc[~com_codigo, 'CO_ESCOLA'] = chaves.astype(np.int64)
+    # Ordem por ano; uma escola com e sem código no mesmo ano fica com a linha do código
+    ordem = np.lexsort((~com_codigo.to_numpy(), longa['Ano'].to_numpy()))
+    return longa.iloc[ordem].drop_duplicates(['CO_ESCOLA', 'Ano'])
+
+
+def variacoes(longa, ano_inicial, ano_final):
+    """
+    Uma linha por escola presente nos dois anos, com os valores de cada um, as
+    variações e a série do Score Final em todos os anos (para sparklines).
+
+    `Variacao_Classificacao` é positiva quando a escola subiu no ranking.
+    As escolas são casadas entre os anos por `identificar`; sem linhas em
+    algum dos dois anos, o resultado é vazio.
+    """
+    longa = identificar(longa)
+    anos = sorted(longa['Ano'].unique())
+    colunas = (['NOME_ESCOLA', 'Municipio', 'DEPENDENCIA_NOME']
+               + [f'{coluna}_{ano}' for coluna in METRICAS for ano in (ano_inicial, ano_final)]
+               + ['Variacao_Score', 'Variacao_Classificacao', 'Crescimento_Participantes', 'Trajetoria'])
+    if ano_inicial not in anos or ano_final not in anos:
+        return pd.DataFrame(columns=colunas, index=pd.Index([], name='CO_ESCOLA'))
+    largas = longa.pivot(index='CO_ESCOLA', columns='Ano', values=list(METRICAS))
+
+    # Nome, município e dependência do ano mais recente de cada escola
+    atuais = longa.drop_duplicates('CO_ESCOLA', keep='last').set_index('CO_ESCOLA')
+    tabela = atuais[['NOME_ESCOLA', 'Municipio', 'DEPENDENCIA_NOME']].copy()
+
+    for coluna in METRICAS:
+        tabela[f'{coluna}_{ano_inicial}'] = largas[(coluna, ano_inicial)]
+        tabela[f'{coluna}_{ano_final}'] = largas[(coluna, ano_final)]
+    tabela = tabela.dropna(subset=[f'SCORE_FINAL_{ano_inicial}', f'SCORE_FINAL_{ano_final}'])
+
+    tabela['Variacao_Score'] = (tabela[f'SCORE_FINAL_{ano_final}'] - tabela[f'SCORE_FINAL_{ano_inicial}']).round(1)
+    tabela['Variacao_Classificacao'] = (
+        tabela[f'Classificacao_{ano_inicial}'] - tabela[f'Classificacao_{ano_final}']
+    ).astype(np.int64)
+    tabela['Crescimento_Participantes'] = (
+        100 * (tabela[f'Participantes_{ano_final}'] / tabela[f'Participantes_{ano_inicial}'] - 1)
+    ).round(1)
+    for coluna in ('Classificacao', 'Participantes'):
+        for ano in (ano_inicial, ano_final):
+            tabela[f'{coluna}_{ano}'] = tabela[f'{coluna}_{ano}'].astype(np.int64)
+
+    # Série em todos os anos; anos sem a escola ficam como None (lacuna no gráfico)
+    scores = largas['SCORE_FINAL'].reindex(index=tabela.index, columns=anos).to_numpy()
+    tabela['Trajetoria'] = [[None if np.isnan(valor) else float(valor) for valor in linha] for linha in scores]
+    return tabela[colunas]
+
+
+def maiores_variacoes(tabela, coluna='Variacao_Score', n=10):
+    """
+    As n maiores altas e as n maiores quedas de uma coluna de variação
+    """
+    ordenada = tabela.sort_values([coluna, 'NOME_ESCOLA'], ascending=[False, True], kind='stable')
+    altas = ordenada[ordenada[coluna] > 0].head(n)
+    quedas = ordenada[ordenada[coluna] < 0].iloc[::-1].head(n)
+    return altas, quedas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--saida', default=DIRETORIO_TRAJETORIAS,
+                        help="Diretório da tabela de trajetórias")
+    parser.add_argument('--backend', choices=list(backends.BACKENDS),
+                        help="Motor das agregações dos anos sem tabela materializada")
+    parser.add_argument('--forcar', action='store_true',
+                        help="Recalcula todos os anos")
+    args = parser.parse_args()
+
+    if not ingestao.anos_disponiveis():
+        print("❌ Nenhum arquivo de resultados encontrado em data-raw/.", file=sys.stderr)
+        return 1
+    backend = backends.criar(args.backend)
+    tabela, recalculados = atualizar(diretorio=args.saida, backend=backend, forcar=args.forcar)
+    if recalculados:
+        print(f"💾 Trajetórias: anos {recalculados} recalculados, "
+              f"{tabela['CO_ESCOLA'].nunique():,} escolas em {tabela['Ano'].nunique()} anos")
+    else:
+        print("✅ Trajetórias atualizadas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+Validação dos arquivos RESULTADOS do RN
+
+Cada verificação é uma máscara booleana calculada sobre colunas inteiras
+(sem laço por linha): notas fora de 0-1000, Score Final diferente da média
+das notas, dependência administrativa fora de 1-4, inscrições duplicadas ou
+ausentes, códigos de escola com mais de um nome ou município e as linhas que
+o dashboard descarta (sem escola ou sem Score Final). O relatório guarda só a
+contagem e alguns exemplos de cada verificação.
+
+Um valor que não converte para o tipo da coluna (texto numa nota, por
+exemplo) impede a preparação do ano; nesse caso o arquivo é relido como
+texto, os valores inválidos contam como erro da coluna e as demais
+verificações rodam com eles como ausentes. Arquivos que nem o parse como
+texto consegue ler aparecem como erro de leitura, sem interromper os outros
+anos.
+
+O relatório de cada ano fica em `data-cache/validacao/AAAA.json` com a versão
+dos dados (prefixo do SHA-256 do CSV, a mesma de `ingestao.preparar_ano`):
+arquivos já validados não são relidos nas próximas execuções. O dashboard
+roda a validação em segundo plano e mostra o resumo na barra lateral.
+
+Uso:
+    python validar_dados_rn.py
+    python validar_dados_rn.py --anos 2024 --forcar
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import agregacoes
+import ingestao
+
+DIRETORIO_VALIDACAO = os.path.join(ingestao.DIRETORIO_CACHE, 'validacao')
+
+# Incrementar sempre que as verificações ou o formato do relatório mudarem
+VERSAO_VALIDACAO = 3
+
+NOTAS = ingestao.NOTAS_OBJETIVAS + ['NU_NOTA_REDACAO', 'SCORE_OBJETIVA', 'SCORE_FINAL']
+FAIXA_NOTAS = (0, 1000)
+DEPENDENCIAS_VALIDAS = [1, 2, 3, 4]
+
+# Os scores são arredondados em duas casas
+TOLERANCIA_SCORE = 0.01
+
+# Inscrições guardadas como exemplo de cada verificação
+EXEMPLOS = 3
+
+# Colunas numéricas do arquivo, conferidas antes da conversão de tipos
+COLUNAS_NUMERICAS = [coluna for coluna, tipo in ingestao.COLUNAS_CANONICAS.items() if tipo != 'string']
+
+# Gravidade: 'erro' para valores inválidos, 'aviso' para linhas descartadas pelo dashboard
+VERIFICACOES = {
+    **{f'tipo_{coluna}': (f"{coluna} com valor que não é número"
+                          + (" inteiro" if ingestao.COLUNAS_CANONICAS[coluna] == 'Int64' else ""), 'erro')
+       for coluna in COLUNAS_NUMERICAS},
+    'sem_escola': ("Sem nome de escola (descartada pelo dashboard)", 'aviso'),
+    'sem_score_final': ("Sem Score Final (descartada pelo dashboard)", 'aviso'),
+    **{f'faixa_{nota}': (f"{nota} fora de {FAIXA_NOTAS[0]}-{FAIXA_NOTAS[1]}", 'erro') for nota in NOTAS},
+    'score_objetiva_inconsistente': ("SCORE_OBJETIVA diferente da média das notas objetivas", 'erro'),
+    'score_final_inconsistente': ("SCORE_FINAL diferente da média das cinco notas", 'erro'),
+    'dependencia_invalida': ("TP_DEPENDENCIA_ADM_ESC fora de 1-4", 'erro'),
+    'inscricao_ausente': ("Sem número de inscrição", 'erro'),
+    'inscricao_duplicada': ("Número de inscrição repetido", 'erro'),
+    'escola_inconsistente': ("CO_ESCOLA com mais de um nome ou município", 'erro'),
+}
+
+
+def converter_texto(df):
+    """
+    Converte as colunas lidas como texto para os tipos canônicos; valores que
+    não convertem viram ausentes. Devolve o DataFrame completo (esquema de
+    `ingestao.completar_esquema`) e a máscara dos valores inválidos de cada
+    coluna numérica
+    """
+    invalidos = {}
+    for coluna, tipo in ingestao.COLUNAS_CANONICAS.items():
+        if coluna not in df.columns:
+            continue
+        if tipo == 'string':
+            df[coluna] = df[coluna].astype('string')
+            continue
+        numeros = pd.to_numeric(df[coluna].str.strip(), errors='coerce')
+        if tipo == 'Int64':
+            numeros = numeros.where(numeros % 1 == 0)
+        invalidos[coluna] = (df[coluna].notna() & numeros.isna()).to_numpy()
+        df[coluna] = numeros.astype(tipo)
+    return ingestao.completar_esquema(df), invalidos
+
+
+def mascaras(df, invalidos=None):
+    """
+    Máscara booleana (linhas com problema) de cada verificação, calculada
+    sobre as colunas inteiras (`invalidos`: valores que não converteram para
+    o tipo da coluna, quando o arquivo foi lido como texto)
+    """
+    invalidos = invalidos or {}
+    sem_problema = np.zeros(len(df), dtype=bool)
+    resultado = {
+        **{f'tipo_{coluna}': invalidos.get(coluna, sem_problema) for coluna in COLUNAS_NUMERICAS},
+        'sem_escola': df['NOME_ESCOLA'].isna().to_numpy(),
+        'sem_score_final': df['SCORE_FINAL'].isna().to_numpy(),
+    }
+
+    notas = {nota: df[nota].to_numpy(dtype=float, na_value=np.nan) for nota in NOTAS}
+    for nota, valores in notas.items():
+        # Comparações com NaN são falsas: notas ausentes não contam como fora da faixa
+        resultado[f'faixa_{nota}'] = (valores < FAIXA_NOTAS[0]) | (valores > FAIXA_NOTAS[1])
+
+    objetivas = np.column_stack([notas[nota] for nota in ingestao.NOTAS_OBJETIVAS])
+    todas = np.column_stack([objetivas, notas['NU_NOTA_REDACAO']])
+    for verificacao, score, componentes in (('score_objetiva_inconsistente', 'SCORE_OBJETIVA', objetivas),
+                                            ('score_final_inconsistente', 'SCORE_FINAL', todas)):
+        diferenca = np.abs(notas[score] - componentes.mean(axis=1))
+        # Só linhas com o score e todas as notas presentes (diferença NaN não conta)
+        resultado[verificacao] = diferenca > TOLERANCIA_SCORE + 1e-9
+
+    dependencia = df['TP_DEPENDENCIA_ADM_ESC']
+    resultado['dependencia_invalida'] = (dependencia.notna() & ~dependencia.isin(DEPENDENCIAS_VALIDAS)).to_numpy()
+
+    inscricao = df['NU_INSCRICAO']
+    resultado['inscricao_ausente'] = inscricao.isna().to_numpy()
+    resultado['inscricao_duplicada'] = (inscricao.notna() & inscricao.duplicated(keep=False)).to_numpy()
+
+    # Variantes distintas de (nome, município) por código de escola
+    escolas = df[['CO_ESCOLA', 'NOME_ESCOLA', 'NO_MUNICIPIO_ESC']]
+    variantes = escolas.dropna().drop_duplicates()
+    repetidos = variantes.loc[variantes['CO_ESCOLA'].duplicated(), 'CO_ESCOLA'].unique()
+    resultado['escola_inconsistente'] = df['CO_ESCOLA'].isin(repetidos).to_numpy()
+    return resultado
+
+
+def contar_escolas(df):
+    """
+    Escolas do arquivo; sem CO_ESCOLA, cada par (nome da escola, município)
+    conta como uma escola, como nas tabelas do dashboard
+    """
+    escolas = df.loc[df['CO_ESCOLA'].notna() | df['NOME_ESCOLA'].notna(),
+                     ['CO_ESCOLA', 'NOME_ESCOLA', 'NO_MUNICIPIO_ESC']]
+    return int(agregacoes.preencher_codigo_escola(escolas)['CO_ESCOLA'].nunique())
+
+
+def verificar(df, invalidos=None):
+    """
+    Relatório compacto das verificações: contagem de linhas e inscrições de
+    exemplo de cada uma
+    """
+    inscricoes = df['NU_INSCRICAO']
+    linhas = []
+    for verificacao, mascara in mascaras(df, invalidos).items():
+        descricao, gravidade = VERIFICACOES[verificacao]
+        posicoes = np.flatnonzero(mascara)
+        linhas.append({
+            'verificacao': verificacao,
+            'descricao': descricao,
+            'gravidade': gravidade,
+            'linhas': int(len(posicoes)),
+            'exemplos': [str(valor) for valor in inscricoes.iloc[posicoes[:EXEMPLOS]].fillna('(ausente)')],
+        })
+    return linhas
+
+
+def _caminho(ano, diretorio):
+    return os.path.join(diretorio, f'{ano}.json')
+
+
+def ler_relatorio(ano, diretorio=DIRETORIO_VALIDACAO):
+    try:
+        with open(_caminho(ano, diretorio), encoding='utf-8') as arquivo:
+            relatorio = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+    if relatorio.get('versao_validacao') != VERSAO_VALIDACAO:
+        return None
+    return relatorio
+
+
+def _gravar(relatorio, ano, diretorio):
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = _caminho(ano, diretorio)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def validar_ano(ano, diretorio=DIRETORIO_VALIDACAO, forcar=False):
+    """
+    Relatório de validação do ano e se ele foi calculado agora (False quando
+    o arquivo, pela versão dos dados, já tinha sido validado)
+    """
+    caminho = ingestao.ARQUIVOS_POR_ANO[ano]
+    try:
+        versao = ingestao.preparar_ano(ano)
+        convertido = True
+    except ValueError:
+        # Valor fora do tipo da coluna: a versão é a mesma que a preparação
+        # daria (prefixo do SHA-256 do CSV) e o arquivo é lido como texto
+        versao = ingestao.calcular_hash(caminho)[:12]
+        convertido = False
+    relatorio = None if forcar else ler_relatorio(ano, diretorio)
+    if relatorio is not None and relatorio.get('versao_dados') == versao:
+        return relatorio, False
+
+    if convertido:
+        df, invalidos = ingestao.carregar_ano(ano), None
+    else:
+        df, invalidos = converter_texto(ingestao.ler_csv_como_texto(caminho, ano))
+    relatorio = {
+        'versao_validacao': VERSAO_VALIDACAO,
+        'versao_dados': versao,
+        'ano': ano,
+        'fonte': ingestao.ARQUIVOS_POR_ANO[ano],
+        'linhas': len(df),
+        'escolas': contar_escolas(df),
+        'municipios': int(df['NO_MUNICIPIO_ESC'].nunique()),
+        'verificacoes': verificar(df, invalidos),
+    }
+    _gravar(relatorio, ano, diretorio)
+    return relatorio, True
+
+
+def problemas(relatorio):
+    """
+    Verificações com ocorrências, em tabela para exibição
+    """
+    tabela = pd.DataFrame(relatorio['verificacoes'], columns=['descricao', 'gravidade', 'linhas', 'exemplos'])
+    tabela = tabela[tabela['linhas'] > 0].copy()
+    tabela['percentual'] = (100 * tabela['linhas'] / max(relatorio['linhas'], 1)).round(2)
+    tabela['exemplos'] = tabela['exemplos'].str.join(', ')
+    return tabela.rename(columns={
+        'descricao': 'Verificação',
+        'gravidade': 'Gravidade',
+        'linhas': 'Linhas',
+        'percentual': '% das linhas',
+        'exemplos': 'Exemplos (inscrição)',
+    })[['Verificação', 'Gravidade', 'Linhas', '% das linhas', 'Exemplos (inscrição)']].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--anos', nargs='+', type=int,
+                        help="Anos a validar (padrão: todos os disponíveis)")
+    parser.add_argument('--saida', default=DIRETORIO_VALIDACAO,
+                        help="Diretório dos relatórios")
+    parser.add_argument('--forcar', action='store_true',
+                        help="Valida de novo mesmo os arquivos já validados")
+    args = parser.parse_args()
+
+    anos = args.anos or ingestao.anos_disponiveis()
+    if not anos:
+        print("❌ Nenhum arquivo de resultados encontrado em data-raw/.", file=sys.stderr)
+        return 1
+
+    erros = 0
+    for ano in anos:
+        try:
+            relatorio, validado_agora = validar_ano(ano, args.saida, args.forcar)
+        except (OSError, ValueError) as erro:
+            # Arquivo ilegível (colunas fora do lugar, arquivo ausente): erro
+            # deste ano, sem interromper os outros
+            print(f"\n❌ {ano}: não foi possível ler {ingestao.ARQUIVOS_POR_ANO[ano]}: {erro}", file=sys.stderr)
+            erros += 1
+            continue
+        origem = "validado agora" if validado_agora else "já validado"
+        print(f"\n📄 {ano}: {relatorio['linhas']:,} linhas, {relatorio['escolas']:,} escolas, "
+              f"{relatorio['municipios']} municípios (versão {relatorio['versao_dados']}, {origem})")
+        tabela = problemas(relatorio)
+        if tabela.empty:
+            print("✅ Nenhum problema encontrado")
+        else:
+            print(tabela.to_string(index=False))
+        erros += int((tabela['Gravidade'] == 'erro').sum())
+    return 1 if erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())